@@ -186,6 +186,16 @@ resource "azurerm_container_app" "main" {
         value = "False"
       }
 
+      env {
+        name  = "DB_STATEMENT_TIMEOUT_MS"
+        value = "30000"
+      }
+
+      env {
+        name  = "DB_IDLE_IN_TRANSACTION_TIMEOUT_MS"
+        value = "60000"
+      }
+
       env {
         name  = "ENVIRONMENT"
         value = "prod"
@@ -0,0 +1,42 @@
+from datetime import datetime
+
+from django.test import TestCase
+from django.utils.timezone import make_aware
+
+from webcaf.webcaf.admin import CustomConfigForm
+from webcaf.webcaf.models import Configuration
+
+
+class CustomConfigFormTest(TestCase):
+    def form_data(self, **overrides):
+        data = {
+            "name": "Period 54/55",
+            "current_assessment_period": "54/55",
+            "period_start": "2054-04-01T00:00",
+            "assessment_period_end": "2055-03-31T23:59",
+            "default_framework": "caf32",
+        }
+        data.update(overrides)
+        return data
+
+    def test_saves_the_period_columns_and_the_json(self):
+        form = CustomConfigForm(data=self.form_data())
+        self.assertTrue(form.is_valid(), form.errors)
+
+        config = form.save()
+
+        config.refresh_from_db()
+        self.assertEqual(config.period_start, make_aware(datetime(2054, 4, 1)))
+        self.assertEqual(config.period_end, make_aware(datetime(2055, 3, 31, 23, 59)))
+        self.assertEqual(config.get_assessment_period_end(), "31 March 2055 11:59PM")
+
+    def test_start_must_be_before_end(self):
+        form = CustomConfigForm(data=self.form_data(period_start="2055-04-01T00:00"))
+
+        self.assertFalse(form.is_valid())
+        self.assertIn("period_start", form.errors)
+
+    def test_new_configuration_form_has_no_initial_end(self):
+        form = CustomConfigForm(instance=Configuration())
+
+        self.assertIsNone(form.fields["assessment_period_end"].initial)
@@ -0,0 +1,78 @@
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from webcaf.webcaf.models import Assessment, Organisation, System
+from webcaf.webcaf.utils.changelist import estimated_count
+
+
+class LargeChangelistTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin_user = User.objects.create_superuser(username="admin@test.gov.uk", email="admin@test.gov.uk")
+        cls.organisations = [Organisation.objects.create(name=f"Organisation {i}") for i in range(3)]
+        for organisation in cls.organisations:
+            system = System.objects.create(name=f"System of {organisation.name}", organisation=organisation)
+            Assessment.objects.create(
+                system=system, status="draft", assessment_period="25/26", assessments_data={"A1.a": {}}
+            )
+
+    def setUp(self):
+        self.client.force_login(self.admin_user)
+        self.url = reverse("admin:webcaf_assessment_changelist")
+
+    def test_unfiltered_list_of_a_large_table_uses_the_estimate(self):
+        with patch("webcaf.webcaf.utils.changelist.estimated_count", return_value=1_000_000) as estimate:
+            response = self.client.get(self.url)
+
+        estimate.assert_called_once()
+        self.assertEqual(response.context["cl"].result_count, 1_000_000)
+
+    @override_settings(ADMIN_ESTIMATED_COUNT_THRESHOLD=0)
+    def test_filtered_list_is_counted_exactly(self):
+        with patch("webcaf.webcaf.utils.changelist.estimated_count", return_value=1_000_000) as estimate:
+            response = self.client.get(self.url, {"status": "draft"})
+
+        estimate.assert_not_called()
+        self.assertEqual(response.context["cl"].result_count, 3)
+
+    def test_estimate_is_read_from_the_table_statistics(self):
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE webcaf_organisation")
+
+        self.assertEqual(estimated_count(Organisation.objects.all()), 3)
+
+    def test_assessment_data_is_not_loaded(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+
+        self.assertEqual(len(response.context["cl"].result_list), 3)
+        [select] = [
+            query["sql"]
+            for query in queries
+            if 'FROM "webcaf_assessment"' in query["sql"] and "COUNT" not in query["sql"]
+        ]
+        self.assertNotIn("assessments_data", select)
+        self.assertIn('"webcaf_organisation"."name"', select)
+
+    def test_autocomplete_filter_on_organisation(self):
+        organisation = self.organisations[1]
+
+        response = self.client.get(self.url, {"system__organisation__id__exact": organisation.pk, "status": "draft"})
+
+        self.assertEqual([a.system.organisation for a in response.context["cl"].result_list], [organisation])
+        self.assertContains(response, 'class="autocomplete-filter"')
+        self.assertContains(response, f'<option value="{organisation.pk}" selected>{organisation}</option>', html=True)
+        # The status filter is kept when another organisation is chosen
+        self.assertContains(response, '<input type="hidden" name="status" value="draft">', html=True)
+        self.assertContains(response, "webcaf/js/admin_autocomplete_filter.js")
+
+    def test_autocomplete_filter_does_not_list_every_organisation(self):
+        response = self.client.get(self.url)
+
+        for organisation in self.organisations:
+            self.assertNotContains(response, f"system__organisation__id__exact={organisation.pk}")
@@ -0,0 +1,89 @@
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.locmem import LocMemCache
+
+
+class FakeCache(LocMemCache):
+    """
+    In memory cache for tests, records the keys read and written.
+    """
+
+    def __init__(self, name, params):
+        super().__init__(name, params)
+        self.reads: list[str] = []
+        self.writes: list[str] = []
+
+    def get(self, key, default=None, version=None):
+        self.reads.append(key)
+        return super().get(key, default, version)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.writes.append(key)
+        return super().set(key, value, timeout, version)
+
+
+# The Notify client reads the service id and secret from the end of the key
+FAKE_NOTIFY_API_KEY = f"test-{uuid.uuid4()}-{uuid.uuid4()}"
+
+
+class FakeNotifyServer:
+    """
+    GOV.UK Notify API on a local port, records the emails sent to it.
+
+    :param failures: Status codes returned, in order, before the emails are accepted.
+    :param delay: Seconds to wait before each response.
+    """
+
+    def __init__(self, failures: list[int] | None = None, delay: float = 0.0):
+        self.emails: list[dict] = []
+        self.failures = list(failures or [])
+        self.delay = delay
+        self.lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                time.sleep(server.delay)
+                with server.lock:
+                    if not self.headers.get("Authorization", "").startswith("Bearer "):
+                        status = 403
+                    elif server.failures:
+                        status = server.failures.pop(0)
+                    else:
+                        status = 201
+                        server.emails.append(body)
+                if status == 201:
+                    self.respond(status, {"id": str(uuid.uuid4()), "reference": body.get("reference")})
+                else:
+                    self.respond(status, {"status_code": status, "errors": [{"error": "Fake", "message": "Failed"}]})
+
+            def respond(self, status: int, data: dict):
+                content = json.dumps(data).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_port}"
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,148 @@
+from importlib import import_module
+
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from webcaf.webcaf.caf.util import IndicatorStatusChecker
+from webcaf.webcaf.models import Assessment, Organisation, System
+from webcaf.webcaf.utils.json_patch import apply_patch, make_patch
+
+compaction = import_module("webcaf.webcaf.migrations.0022_compact_historicalassessment")
+
+
+class TestJsonPatch(TestCase):
+    def test_patch_round_trip(self):
+        source = {"A1.a": {"indicators": {"a": True, "b": False}}, "A1.b": {}, "x/y": 1}
+        target = {"A1.a": {"indicators": {"a": False, "c": "text"}}, "A2.a": [1, 2], "x/y": 1.0}
+
+        patch = make_patch(source, target)
+
+        self.assertEqual(apply_patch(source, patch), target)
+        self.assertEqual(source["A1.a"]["indicators"], {"a": True, "b": False})
+
+    def test_identical_documents_give_an_empty_patch(self):
+        self.assertEqual(make_patch({"a": {"b": 1}}, {"a": {"b": 1}}), [])
+
+    def test_invalid_path_raises(self):
+        with self.assertRaises(ValueError):
+            apply_patch({}, [{"op": "replace", "path": "/missing", "value": 1}])
+
+
+@override_settings(HISTORY_CHECKPOINT_INTERVAL=3)
+class TestDeltaHistory(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        organisation = Organisation.objects.create(name="History organisation")
+        cls.system = System.objects.create(name="History system", organisation=organisation)
+
+    def create_assessment_with_edits(self, edits):
+        """
+        Creates an assessment and saves it once for each edit, returning the expected
+        answers after every save.
+        """
+        assessment = Assessment.objects.create(system=self.system, status="draft", assessment_period="25/26")
+        versions = [{}]
+        for i in range(edits):
+            assessment.assessments_data[f"A{i % 4}.a"] = {"confirmation": {"confirm_outcome_status": f"status {i}"}}
+            assessment.save()
+            versions.append(dict(assessment.assessments_data))
+        return assessment, versions
+
+    def test_checkpoint_is_stored_every_interval(self):
+        assessment, _ = self.create_assessment_with_edits(5)
+
+        records = assessment.history.order_by("history_id")
+
+        self.assertEqual([record.history_delta_depth for record in records], [0, 1, 2, 0, 1, 2])
+        self.assertEqual([record.is_checkpoint for record in records], [True, False, False] * 2)
+
+    def test_every_version_is_rebuilt(self):
+        assessment, versions = self.create_assessment_with_edits(7)
+        history_model = Assessment.history.model
+
+        records = list(assessment.history.order_by("history_id"))
+
+        self.assertEqual([history_model.rebuild(assessment.id, r.history_id) for r in records], versions)
+        self.assertEqual([data for _, data in history_model.with_rebuilt_data(records)], versions)
+
+    def test_rebuild_as_of(self):
+        assessment, versions = self.create_assessment_with_edits(4)
+        record = assessment.history.order_by("history_id")[3]
+
+        self.assertEqual(assessment.get_assessments_data_as_of(record.history_date), versions[3])
+        self.assertEqual(assessment.get_assessments_data_as_of(timezone.now()), versions[-1])
+
+    def test_historical_instance_has_full_data(self):
+        assessment, versions = self.create_assessment_with_edits(3)
+        record = assessment.history.order_by("history_id")[3]
+
+        self.assertEqual(record.instance.assessments_data, versions[3])
+        self.assertEqual(assessment.history.as_of(record.history_date).assessments_data, versions[3])
+
+    def test_status_change_is_found_in_patched_history(self):
+        assessment, _ = self.create_assessment_with_edits(6)
+
+        changed = IndicatorStatusChecker.get_when_the_status_changed(assessment, "A1.a", "status 5")
+
+        self.assertEqual(changed, assessment.history.order_by("-history_id").first())
+
+    def test_compact_and_expand_existing_history(self):
+        with override_settings(HISTORY_CHECKPOINT_INTERVAL=1):
+            assessment, versions = self.create_assessment_with_edits(5)
+        history_model = Assessment.history.model
+        self.assertFalse(history_model.objects.filter(history_delta_base__isnull=False).exists())
+
+        compaction.compact_assessment_history(apps, None)
+        compaction.compact_assessment_history(apps, None)
+        records = list(assessment.history.order_by("history_id"))
+        self.assertEqual([record.history_delta_depth for record in records], [0, 1, 2, 0, 1, 2])
+        self.assertEqual([history_model.rebuild(assessment.id, r.history_id) for r in records], versions)
+
+        compaction.expand_assessment_history(apps, None)
+        records = assessment.history.order_by("history_id")
+        self.assertEqual([record.history_delta_depth for record in records], [0] * 6)
+        self.assertEqual([record.assessments_data for record in records], versions)
+
+    def test_save_diffs_against_the_cached_previous_version(self):
+        assessment, _ = self.create_assessment_with_edits(0)
+        assessment.assessments_data["B1.a"] = {}
+
+        with self.assertNumQueries(3):
+            assessment.save()
+
+        # Without the cached version the base is rebuilt from the table
+        cache.clear()
+        assessment.assessments_data["B2.a"] = {}
+        with self.assertNumQueries(5):
+            assessment.save()
+        latest = assessment.history.order_by("-history_id").first()
+        self.assertEqual(latest.history_delta_depth, 2)
+        self.assertEqual(latest.get_delta_field_data(), assessment.assessments_data)
+
+    def test_diff_compares_the_answers_not_the_patches(self):
+        assessment, versions = self.create_assessment_with_edits(2)
+        older, newer = assessment.history.order_by("history_id")[1:3]
+
+        delta = newer.diff_against(older)
+
+        self.assertEqual(delta.changed_fields, ["assessments_data"])
+        self.assertEqual(delta.changes[0].old, versions[1])
+        self.assertEqual(delta.changes[0].new, versions[2])
+        self.assertEqual(newer.diff_against(older, excluded_fields=["assessments_data"]).changes, [])
+
+    def test_admin_history_page_shows_the_changed_answers(self):
+        assessment, _ = self.create_assessment_with_edits(4)
+        admin_user = User.objects.create_superuser(username="history-admin", email="history-admin@example.gov.uk")
+        self.client.force_login(admin_user)
+
+        response = self.client.get(reverse("admin:webcaf_assessment_history", args=[assessment.id]))
+
+        records = response.context["page_obj"].object_list
+        changes = [record.history_delta_changes for record in records[:-1]]
+        self.assertTrue(all(change[0]["field"] == "Assessments data" for change in changes))
+        self.assertNotContains(response, "&quot;op&quot;")
+        self.assertContains(response, "status 3")
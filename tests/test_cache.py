@@ -0,0 +1,150 @@
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from webcaf.webcaf import cache
+from webcaf.webcaf.models import (
+    Assessment,
+    Configuration,
+    Organisation,
+    System,
+    UserProfile,
+)
+
+FAKE_CACHES = {"default": {"BACKEND": "tests.fakes.FakeCache", "LOCATION": "test-cache"}}
+
+
+@override_settings(CACHES=FAKE_CACHES)
+class ApplicationCacheTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.organisation = Organisation.objects.create(name="Cache organisation")
+        cls.system = System.objects.create(name="Cache system", organisation=cls.organisation)
+
+    def setUp(self):
+        caches["default"].clear()
+        cache.reset_metrics()
+
+    def test_values_are_computed_once(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return {"answer": 42}
+
+        for _ in range(3):
+            self.assertEqual(cache.get_or_set("value", compute, organisation=1), {"answer": 42})
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(cache.cache_metrics()["value"], {"hits": 2, "misses": 1})
+
+    def test_keys_are_namespaced_by_scope(self):
+        self.assertNotEqual(cache.make_key("value", organisation=1), cache.make_key("value", organisation=2))
+        self.assertNotEqual(
+            cache.make_key("value", framework="caf32", assessment=1),
+            cache.make_key("value", framework="caf40", assessment=1),
+        )
+        self.assertEqual(
+            cache.make_key("value", framework="caf32", assessment=1),
+            cache.make_key("value", assessment=1, framework="caf32"),
+        )
+
+    def test_invalidating_a_scope_only_drops_its_entries(self):
+        cache.get_or_set("value", lambda: 1, organisation=1)
+        cache.get_or_set("value", lambda: 1, organisation=2)
+
+        cache.invalidate(organisation=1)
+
+        self.assertEqual(cache.get_or_set("value", lambda: 2, organisation=1), 2)
+        self.assertEqual(cache.get_or_set("value", lambda: 2, organisation=2), 1)
+
+    def test_new_version_is_a_miss(self):
+        cache.get_or_set("value", lambda: 1, version=1, assessment=1)
+
+        self.assertEqual(cache.get_or_set("value", lambda: 2, version=2, assessment=1), 2)
+
+    def test_evicted_generation_does_not_revive_old_entries(self):
+        key = cache.make_key("value", organisation=1)
+        caches["default"].delete("generation:organisation:1")
+
+        self.assertNotEqual(cache.make_key("value", organisation=1), key)
+
+    def test_fake_cache_records_reads_and_writes(self):
+        cache.get_or_set("value", lambda: 1, organisation=1)
+
+        key = cache.make_key("value", organisation=1)
+        self.assertIn(key, caches["default"].reads)
+        self.assertIn(key, caches["default"].writes)
+
+    def test_saving_a_system_invalidates_its_organisation(self):
+        key = cache.make_key("value", organisation=self.organisation.id)
+
+        self.system.save()
+
+        self.assertNotEqual(cache.make_key("value", organisation=self.organisation.id), key)
+
+    def test_saving_an_assessment_invalidates_the_assessment_and_organisation(self):
+        assessment = Assessment.objects.create(system=self.system, status="draft", assessment_period="25/26")
+        assessment_key = cache.make_key("value", assessment=assessment.id)
+        organisation_key = cache.make_key("value", organisation=self.organisation.id)
+
+        assessment.save()
+
+        self.assertNotEqual(cache.make_key("value", assessment=assessment.id), assessment_key)
+        self.assertNotEqual(cache.make_key("value", organisation=self.organisation.id), organisation_key)
+
+    def test_saving_an_assessment_reads_only_the_organisation_of_its_system(self):
+        assessment = Assessment.objects.create(system=self.system, status="draft", assessment_period="25/26")
+        assessment = Assessment.objects.get(id=assessment.id)
+
+        with CaptureQueriesContext(connection) as queries:
+            assessment.save()
+
+        # The update, the previous history record, the history insert and the organisation of the system
+        self.assertEqual(len(queries), 4)
+        [system_query] = [query["sql"] for query in queries if 'FROM "webcaf_system"' in query["sql"]]
+        self.assertIn('SELECT "webcaf_system"."organisation_id" FROM', system_query)
+        self.assertNotIn('"webcaf_system"."name"', system_query)
+
+    def test_saving_an_assessment_with_its_system_loaded_does_not_query_the_system(self):
+        assessment = Assessment.objects.create(system=self.system, status="draft", assessment_period="25/26")
+        organisation_key = cache.make_key("value", organisation=self.organisation.id)
+        assessment = Assessment.objects.select_related("system").get(id=assessment.id)
+
+        with CaptureQueriesContext(connection) as queries:
+            assessment.save()
+
+        self.assertEqual(len(queries), 3)
+        self.assertFalse([query for query in queries if 'FROM "webcaf_system"' in query["sql"]])
+        self.assertNotEqual(cache.make_key("value", organisation=self.organisation.id), organisation_key)
+
+    def test_saving_a_user_profile_invalidates_the_profile_and_organisation(self):
+        user = User.objects.create_user(username="cache-user", email="cache-user@example.gov.uk")
+        profile = UserProfile.objects.create(user=user, organisation=self.organisation, role="organisation_user")
+        profile_id = profile.id
+        profile_key = cache.make_key("value", user_profile=profile_id)
+        organisation_key = cache.make_key("value", organisation=self.organisation.id)
+
+        profile.delete()
+
+        self.assertNotEqual(cache.make_key("value", user_profile=profile_id), profile_key)
+        self.assertNotEqual(cache.make_key("value", organisation=self.organisation.id), organisation_key)
+
+    def test_saving_a_configuration_invalidates_the_configuration_scope(self):
+        key = cache.make_key("value", configuration="all")
+
+        Configuration.objects.get(name="default").save()
+
+        self.assertNotEqual(cache.make_key("value", configuration="all"), key)
+
+    def test_cached_completion_does_not_load_the_answers(self):
+        assessment = Assessment.objects.create(system=self.system, status="draft", assessment_period="25/26")
+        deferred = Assessment.objects.defer("assessments_data").get(id=assessment.id)
+        self.assertFalse(deferred.is_complete_cached())
+
+        deferred = Assessment.objects.defer("assessments_data").get(id=assessment.id)
+        with self.assertNumQueries(0):
+            self.assertFalse(deferred.is_complete_cached())
+        self.assertEqual(cache.cache_metrics()["assessment_complete"], {"hits": 1, "misses": 1})
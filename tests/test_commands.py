@@ -1,11 +1,29 @@
+import gzip
 import importlib
+import json
 import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
 
 from django.contrib.auth.models import User
-from django.core.management import call_command
-from django.test import TestCase
+from django.contrib.sessions.models import Session
+from django.core.management import CommandError, call_command
+from django.test import LiveServerTestCase, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
 
-from webcaf.webcaf.models import Organisation, System, UserProfile
+from webcaf.webcaf.management.commands import load_test
+from webcaf.webcaf.models import (
+    ArchivedAssessment,
+    Assessment,
+    Configuration,
+    GovNotifyEmailDevice,
+    NotifyEmail,
+    Organisation,
+    System,
+    UserProfile,
+)
+from webcaf.webcaf.utils.references import generate_reference
 
 
 class AddOrganisationsCommandTest(TestCase):
@@ -23,11 +41,47 @@ class AddOrganisationsCommandTest(TestCase):
         if self._orig_csv_path is not None:
             cmd_mod.CSV_PATH = self._orig_csv_path
 
-    def test_does_nothing_if_table_not_empty(self):
+    def test_keeps_existing_organisations(self):
         Organisation.objects.create(pk=999, name="Dummy Org", organisation_type="other")
-        call_command("add_organisations")
-        self.assertEqual(Organisation.objects.count(), 1)
-        self.assertTrue(Organisation.objects.filter(pk=999).exists())
+        call_command("add_organisations", stdout=StringIO())
+        self.assertEqual(Organisation.objects.count(), 6)
+        self.assertTrue(Organisation.objects.filter(pk=999, name="Dummy Org").exists())
+
+    def test_running_again_only_writes_the_changes(self):
+        call_command("add_organisations", stdout=StringIO())
+        Organisation.objects.filter(pk=60).update(name="The British Library", organisation_type=None)
+        Organisation.objects.filter(pk=1).update(contact_name="Alice")
+
+        stdout = StringIO()
+        with self.assertNumQueries(7):
+            call_command("add_organisations", stdout=stdout)
+
+        self.assertIn("5 organisations", stdout.getvalue())
+        self.assertIn("1 updated, 4 unchanged", stdout.getvalue())
+        british_library = Organisation.objects.get(pk=60)
+        self.assertEqual(british_library.name, "British Library")
+        self.assertEqual(british_library.organisation_type, "agency-or-other-public-body")
+        self.assertEqual(british_library.history.first().history_type, "~")
+        self.assertEqual(Organisation.objects.get(pk=1).contact_name, "Alice")
+
+    def test_name_used_by_another_organisation_is_skipped(self):
+        Organisation.objects.create(name="British Library")
+        stdout = StringIO()
+        call_command("add_organisations", stdout=stdout)
+        self.assertIn("4 created, 0 updated, 0 unchanged, 1 skipped", stdout.getvalue())
+        self.assertFalse(Organisation.objects.filter(pk=60).exists())
+
+    def test_references_and_sequence_are_set(self):
+        call_command("add_organisations", batch_size=2, stdout=StringIO())
+        for organisation in Organisation.objects.all():
+            self.assertEqual(organisation.reference, generate_reference(organisation.pk, prime_set="organisation"))
+            self.assertEqual(organisation.history.count(), 1)
+        self.assertGreater(Organisation.objects.create(name="New Org").pk, 212)
+
+    def test_running_again_without_changes_writes_nothing(self):
+        call_command("add_organisations", stdout=StringIO())
+        with self.assertNumQueries(3):
+            call_command("add_organisations", stdout=StringIO())
 
     def test_adds_organisations_if_table_empty(self):
         self.assertEqual(Organisation.objects.count(), 0)
@@ -125,3 +179,224 @@ class TestAddLocalUsers(TestCase):
 
         for system in systems:
             self.assertEqual(system.organisation, org)
+
+
+class ArchiveAssessmentPeriodCommandTest(TestCase):
+    def setUp(self):
+        organisation = Organisation.objects.create(name="Archive organisation")
+        self.system = System.objects.create(name="Archive system", organisation=organisation)
+        Configuration.objects.create(
+            name="24/25",
+            config_data={"current_assessment_period": "24/25", "assessment_period_end": "31 March 2025 11:59pm"},
+        )
+        Configuration.objects.create(
+            name="25/26",
+            config_data={"current_assessment_period": "25/26", "assessment_period_end": "31 March 2099 11:59pm"},
+        )
+        self.closed = Assessment.objects.create(
+            system=self.system, status="submitted", assessment_period="24/25", assessments_data={"A1.a": {}}
+        )
+        self.closed.assessments_data["A1.b"] = {"confirmation": {"confirm_outcome_status": "Achieved"}}
+        self.closed.save()
+        self.current = Assessment.objects.create(system=self.system, status="draft", assessment_period="25/26")
+
+    def test_archives_closed_period_with_history(self):
+        call_command("archive_assessment_period", "24/25", batch_size=1, stdout=StringIO())
+
+        self.assertQuerySetEqual(Assessment.objects.all(), [self.current])
+        self.assertFalse(Assessment.history.filter(id=self.closed.id).exists())
+        archived = ArchivedAssessment.objects.get()
+        self.assertEqual(archived.reference, self.closed.reference)
+        self.assertEqual(archived.get_assessment().assessments_data, self.closed.assessments_data)
+
+    def test_restore_puts_back_assessment_and_history(self):
+        history = list(self.closed.history.values_list("history_id", "assessments_data"))
+        call_command("archive_assessment_period", "24/25", stdout=StringIO())
+
+        call_command("archive_assessment_period", "24/25", restore=True, stdout=StringIO())
+
+        self.assertFalse(ArchivedAssessment.objects.exists())
+        restored = Assessment.objects.get(id=self.closed.id)
+        self.assertEqual(restored.assessments_data, self.closed.assessments_data)
+        self.assertEqual(list(restored.history.values_list("history_id", "assessments_data")), history)
+
+    def test_refuses_current_and_open_periods(self):
+        current_period = Configuration.objects.get_default_config().get_current_assessment_period()
+        with self.assertRaisesMessage(CommandError, f"{current_period} is the current assessment period"):
+            call_command("archive_assessment_period", current_period)
+        with self.assertRaisesMessage(CommandError, "25/26 has not ended yet"):
+            call_command("archive_assessment_period", "25/26")
+        with self.assertRaisesMessage(CommandError, "No configuration found for 23/24"):
+            call_command("archive_assessment_period", "23/24")
+        self.assertEqual(Assessment.objects.count(), 2)
+
+    def test_export_writes_gzipped_json_lines(self):
+        with tempfile.TemporaryDirectory() as export_dir:
+            call_command("archive_assessment_period", "24/25", export_dir=export_dir, stdout=StringIO())
+
+            with gzip.open(os.path.join(export_dir, "assessments-24-25.jsonl.gz"), "rt") as export_file:
+                rows = [json.loads(line) for line in export_file]
+        self.assertEqual([row["id"] for row in rows], [self.closed.id])
+        self.assertEqual(rows[0]["records"][0]["fields"]["assessments_data"], self.closed.assessments_data)
+
+
+class CleanupExpiredDataCommandTest(TestCase):
+    def setUp(self):
+        now = timezone.now()
+        self.user = User.objects.create_user(username="cleanup", email="cleanup@example.gov.uk")
+        for i in range(5):
+            Session.objects.create(session_key=f"expired{i}", session_data="", expire_date=now - timedelta(minutes=1))
+        self.live_session = Session.objects.create(
+            session_key="live", session_data="", expire_date=now + timedelta(hours=1)
+        )
+        self.device = GovNotifyEmailDevice.objects.create(
+            user=self.user, email=self.user.email, token="123456", valid_until=now - timedelta(minutes=1)
+        )
+        self.pending_device = GovNotifyEmailDevice.objects.create(
+            user=User.objects.create_user(username="pending", email="pending@example.gov.uk"),
+            email="pending@example.gov.uk",
+            token="654321",
+            valid_until=now + timedelta(minutes=5),
+        )
+        self.old_email_device = GovNotifyEmailDevice.objects.create(user=self.user, email="old@example.gov.uk")
+        for days in (8, 9, 1):
+            NotifyEmail.objects.create(
+                email_addresses=[self.user.email], template_id="otp", status="sent", sent_at=now - timedelta(days=days)
+            )
+        self.failed_email = NotifyEmail.objects.create(
+            email_addresses=[self.user.email], template_id="otp", status="failed"
+        )
+
+    def cleanup(self, **options):
+        stdout = StringIO()
+        call_command("cleanup_expired_data", stdout=stdout, stderr=StringIO(), **options)
+        return json.loads(stdout.getvalue())
+
+    def test_removes_expired_rows_in_batches(self):
+        report = self.cleanup(batch_size=2)
+
+        self.assertEqual(
+            report,
+            {
+                "expired_sessions": 5,
+                "expired_otp_challenges": 1,
+                "orphaned_otp_devices": 1,
+                "sent_notify_emails": 2,
+                "completed": True,
+            },
+        )
+        self.assertQuerySetEqual(Session.objects.all(), [self.live_session])
+        self.device.refresh_from_db()
+        self.assertIsNone(self.device.token)
+        self.pending_device.refresh_from_db()
+        self.assertEqual(self.pending_device.token, "654321")
+        self.assertFalse(GovNotifyEmailDevice.objects.filter(id=self.old_email_device.id).exists())
+        self.assertEqual(NotifyEmail.objects.filter(status="sent").count(), 1)
+        self.assertTrue(NotifyEmail.objects.filter(id=self.failed_email.id).exists())
+
+    def test_stops_when_the_time_budget_is_used(self):
+        report = self.cleanup(time_budget=0)
+
+        self.assertEqual(report["expired_sessions"], 0)
+        self.assertFalse(report["completed"])
+        self.assertEqual(Session.objects.count(), 6)
+
+
+class BenchmarkFunctionsCommandTest(SimpleTestCase):
+    def benchmark(self, **options) -> str:
+        stdout = StringIO()
+        call_command("benchmark_functions", repeat=1, min_time=0, sizes=[100], stdout=stdout, **options)
+        return stdout.getvalue()
+
+    def test_saves_a_baseline_and_compares_with_it(self):
+        with tempfile.TemporaryDirectory() as directory:
+            baseline_path = os.path.join(directory, "baseline.json")
+            report = json.loads(self.benchmark(output=baseline_path))
+            self.assertIn("Assessment.is_complete[100%]", report["results"])
+            self.assertIn("mask_email[one line]", report["results"])
+
+            with open(baseline_path) as baseline_file:
+                baseline = json.load(baseline_file)
+            baseline["results"]["mask_email[one line]"]["min_us"] = 0.001
+            with open(baseline_path, "w") as baseline_file:
+                json.dump(baseline, baseline_file)
+
+            comparison = self.benchmark(compare=baseline_path, filter="mask_email")
+            self.assertRegex(comparison, r"mask_email\[one line\] .* slower")
+            self.assertRegex(comparison, r"Assessment.is_complete\[100%\] .* not run")
+            with self.assertRaisesMessage(CommandError, "mask_email[one line]"):
+                self.benchmark(compare=baseline_path, filter="mask_email", fail_on_regression=True)
+
+
+@override_settings(HISTORY_CHECKPOINT_INTERVAL=2)
+class GenerateDatasetCommandTest(TestCase):
+    def generate(self) -> dict:
+        stdout = StringIO()
+        call_command(
+            "generate_dataset",
+            organisations=4,
+            systems=6,
+            assessments=20,
+            users=6,
+            advisors=1,
+            batch_size=7,
+            stdout=stdout,
+        )
+        return json.loads(stdout.getvalue().splitlines()[-1])
+
+    def generated_assessments(self):
+        return Assessment.objects.filter(system__name__startswith="Synthetic system").order_by(
+            "system__name", "assessment_period", "status"
+        )
+
+    def test_creates_the_dataset_with_references_and_history(self):
+        report = self.generate()
+
+        self.assertEqual(report["assessments"], 20)
+        self.assertEqual(report["assessment_history_records"], 60)
+        self.assertEqual(UserProfile.objects.filter(user__username__startswith="synthetic-user-").count(), 7)
+        self.assertTrue(Organisation.objects.filter(name__startswith="Synthetic", parent_organisation__isnull=False))
+        for assessment in self.generated_assessments():
+            self.assertEqual(assessment.reference, generate_reference(assessment.id, prime_set="assessment"))
+            records = list(assessment.history.order_by("history_id"))
+            self.assertEqual([record.history_delta_depth for record in records], [0, 1, 0])
+            self.assertEqual(records[1].get_delta_field_data(), records[1].history_object.assessments_data)
+            self.assertEqual(records[-1].get_delta_field_data(), assessment.assessments_data)
+            if assessment.status == "submitted":
+                self.assertTrue(assessment.is_complete())
+
+    def test_the_same_seed_gives_the_same_data(self):
+        self.generate()
+        first = list(self.generated_assessments().values_list("system__name", "assessment_period", "assessments_data"))
+
+        call_command("generate_dataset", delete=True, stdout=StringIO())
+        self.assertFalse(self.generated_assessments().exists())
+        self.assertFalse(Organisation.history.filter(name__startswith="Synthetic organisation").exists())
+
+        self.generate()
+        second = list(self.generated_assessments().values_list("system__name", "assessment_period", "assessments_data"))
+        self.assertEqual(first, second)
+
+    def test_refuses_to_add_to_existing_data(self):
+        self.generate()
+
+        with self.assertRaisesMessage(CommandError, "--delete first"):
+            self.generate()
+
+
+class LoadTestCommandTest(LiveServerTestCase):
+    # Keep the configuration created by the migrations for the test cases that follow
+    serialized_rollback = True
+
+    def test_lead_completes_and_submits_an_assessment(self):
+        stdout = StringIO()
+        call_command("load_test", base_url=self.live_server_url, leads=1, advisors=0, stdout=stdout, stderr=StringIO())
+        report = json.loads(stdout.getvalue())
+
+        self.assertEqual(report["journeys"], {"completed": 1, "failed": 0})
+        self.assertEqual(report["error_rate"], 0.0)
+        self.assertEqual(report["urls"]["POST caf32_confirmation"]["requests"], len(load_test.Command.build_answers()))
+        self.assertEqual(Assessment.objects.get(system__organisation__name__startswith="Load test").status, "submitted")
+
+        call_command("load_test", cleanup=True, stdout=StringIO())
+        self.assertFalse(User.objects.filter(username__startswith="loadtest-").exists())
@@ -2,9 +2,14 @@ from datetime import datetime, timedelta
 
 from django.test import TestCase
 from django.utils import timezone
+from django.utils.timezone import make_aware
 from freezegun import freeze_time
 
-from webcaf.webcaf.models import Configuration
+from webcaf.webcaf.models import (
+    Configuration,
+    ConfigurationManager,
+    ConfigurationVersion,
+)
 
 
 class ConfigurationModelTest(TestCase):
@@ -68,6 +73,10 @@ class ConfigurationManagerTest(TestCase):
     Set the current time to 2055-03-15 12:00:00. So, it will not conflict with the other tests or existing data.
     """
 
+    def setUp(self):
+        # The cached default configuration may have been loaded by a test that was rolled back
+        ConfigurationManager.clear_cache()
+
     def test_get_default_config_returns_earliest_future_config(self):
         """Test that get_default_config returns the config with the earliest future end date."""
         now = timezone.now()
@@ -178,3 +187,95 @@ class ConfigurationManagerTest(TestCase):
         # Should return the config as it's technically in the future
         self.assertIsNotNone(result)
         self.assertEqual(result.name, "config_now")
+
+
+@freeze_time("2055-03-15 12:00:00")
+class DefaultConfigurationCacheTest(TestCase):
+    """Tests for the process-local cache behind get_default_config."""
+
+    def setUp(self):
+        ConfigurationManager.clear_cache()
+        self.config = Configuration.objects.create(
+            name="config_cached", config_data={"assessment_period_end": "31 March 2055 11:59pm"}
+        )
+
+    def test_cached_config_runs_no_queries(self):
+        Configuration.objects.get_default_config()
+
+        with self.assertNumQueries(0):
+            result = Configuration.objects.get_default_config()
+
+        self.assertEqual(result, self.config)
+
+    def test_cached_config_checks_the_version_after_the_interval(self):
+        Configuration.objects.get_default_config()
+
+        with freeze_time("2055-03-15 12:00:06"), self.assertNumQueries(1):
+            result = Configuration.objects.get_default_config()
+
+        self.assertEqual(result, self.config)
+
+    def test_saving_a_configuration_invalidates_the_cache(self):
+        Configuration.objects.get_default_config()
+
+        Configuration.objects.create(
+            name="config_sooner", config_data={"assessment_period_end": "20 March 2055 11:59pm"}
+        )
+
+        self.assertEqual(Configuration.objects.get_default_config().name, "config_sooner")
+
+    def test_change_in_another_worker_invalidates_the_cache(self):
+        Configuration.objects.get_default_config()
+
+        # Another worker saving a configuration only changes the version seen here
+        Configuration.objects.filter(pk=self.config.pk).update(
+            config_data={"assessment_period_end": "01 March 2055 11:59pm"},
+            period_end=make_aware(datetime(2055, 3, 1, 23, 59)),
+        )
+        ConfigurationVersion.increment()
+
+        # Only seen once the version is checked again
+        self.assertEqual(Configuration.objects.get_default_config(), self.config)
+        with freeze_time("2055-03-15 12:00:06"):
+            self.assertIsNone(Configuration.objects.get_default_config())
+
+    def test_cache_expires_at_the_end_of_the_period(self):
+        Configuration.objects.get_default_config()
+        Configuration.objects.filter(pk=self.config.pk).update(
+            config_data={"assessment_period_end": "31 March 2056 11:59pm"},
+            period_end=make_aware(datetime(2056, 3, 31, 23, 59)),
+        )
+
+        with freeze_time("2055-03-31 23:58:59"):
+            self.assertEqual(Configuration.objects.get_default_config().get_submission_due_date().year, 2055)
+        with freeze_time("2055-04-01 00:00:01"):
+            self.assertEqual(Configuration.objects.get_default_config().get_submission_due_date().year, 2056)
+
+
+@freeze_time("2055-03-15 12:00:00")
+class ConfigurationPeriodTest(TestCase):
+    """Tests for the typed period columns used to find the default configuration."""
+
+    def setUp(self):
+        ConfigurationManager.clear_cache()
+
+    def test_period_end_is_copied_from_the_json(self):
+        config = Configuration.objects.create(
+            name="config_period", config_data={"assessment_period_end": "31 March 2055 11:59pm"}
+        )
+
+        self.assertEqual(config.period_end, config.get_submission_due_date())
+
+    def test_configuration_that_has_not_started_is_not_the_default(self):
+        Configuration.objects.create(
+            name="config_current", config_data={"assessment_period_end": "31 March 2056 11:59pm"}
+        )
+        Configuration.objects.create(
+            name="config_next",
+            config_data={"assessment_period_end": "31 March 2055 11:59pm"},
+            period_start=timezone.now() + timedelta(days=1),
+        )
+
+        self.assertEqual(Configuration.objects.get_default_config().name, "config_current")
+        with freeze_time("2055-03-16 12:00:00"):
+            self.assertEqual(Configuration.objects.get_default_config().name, "config_next")
@@ -0,0 +1,58 @@
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from webcaf.webcaf import cache
+
+FAKE_CACHES = {"default": {"BACKEND": "tests.fakes.FakeCache", "LOCATION": "fast-path"}}
+
+
+@override_settings(CACHES=FAKE_CACHES)
+class FastPathMiddlewareTest(TestCase):
+    def setUp(self):
+        caches["default"].clear()
+        cache.reset_metrics()
+
+    def test_health_check_does_not_touch_the_database(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/health/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b"OK")
+        self.assertEqual(len(queries), 0)
+
+    def test_missing_static_file_is_not_found(self):
+        response = self.client.get("/assets/missing.css")
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_public_page_is_served_from_the_cache_with_a_fresh_nonce(self):
+        first = self.client.get("/public/help/")
+        second = self.client.get("/public/help/")
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(cache.cache_metrics()["public_page"], {"hits": 1, "misses": 1})
+        first_nonce = str(first.wsgi_request.csp_nonce)
+        second_nonce = str(second.wsgi_request.csp_nonce)
+        self.assertNotEqual(first_nonce, second_nonce)
+        self.assertIn(f'nonce="{second_nonce}"', second.content.decode())
+        self.assertNotIn(first_nonce, second.content.decode())
+        self.assertIn(f"'nonce-{second_nonce}'", second["Content-Security-Policy"])
+        self.assertEqual(first.content.decode().replace(first_nonce, second_nonce), second.content.decode())
+
+    def test_public_page_is_not_cached_for_a_signed_in_user(self):
+        self.client.force_login(User.objects.create_user(username="fast-path", email="fast-path@example.gov.uk"))
+
+        self.client.get("/public/help/")
+        response = self.client.get("/public/help/")
+
+        self.assertNotIn("public_page", cache.cache_metrics())
+        self.assertContains(response, "Logout")
+
+    def test_query_strings_are_not_cached(self):
+        self.client.get("/public/help/?page=1")
+
+        self.assertNotIn("public_page", cache.cache_metrics())
@@ -1,7 +1,11 @@
 import string
 import unittest
 
-from webcaf.webcaf.utils.references import generate_reference
+from webcaf.webcaf.utils.references import (
+    decode_reference,
+    generate_reference,
+    reference_ids,
+)
 
 
 class TestGenerateReferences(unittest.TestCase):
@@ -76,3 +80,31 @@ class TestGenerateReferences(unittest.TestCase):
         self.assertEqual(ref_1, "CH7L1")
         self.assertEqual(ref_2, "KLL32")
         self.assertEqual(ref_3, "1WNW1")
+
+    def test_decode_reference_returns_the_primary_key(self):
+        for prime_set in ["default", "system", "organisation", "assessment"]:
+            for pk in [0, 1, 999, 123456, 2699999]:
+                self.assertEqual(decode_reference(generate_reference(pk, prime_set=prime_set), prime_set=prime_set), pk)
+        self.assertEqual(decode_reference("ZBV31"), 0)
+        self.assertEqual(decode_reference("16SMQ"), 10000004)
+        char_set = string.digits + string.ascii_uppercase
+        self.assertEqual(decode_reference("5T83", num_chars=4, char_set=char_set), 0)
+
+    def test_every_primary_key_of_a_reference_is_returned(self):
+        """
+        The first assessment prime shares a factor of 9 with the number of references, so
+        nine primary keys give each reference.
+        """
+        reference = generate_reference(5, prime_set="assessment")
+        ids = reference_ids(reference, prime_set="assessment")
+        self.assertEqual(ids, [5 + 2700000 * i for i in range(9)])
+        self.assertTrue(all(generate_reference(pk, prime_set="assessment") == reference for pk in ids))
+        self.assertEqual(reference_ids(generate_reference(5, prime_set="system"), prime_set="system"), [5])
+
+    def test_decode_reference_rejects_other_strings(self):
+        for reference in ["", "ZBV3", "ZBV311", "ZBA31", "zbv31", "ORG001"]:
+            with self.assertRaises(ValueError):
+                decode_reference(reference)
+        # Only a ninth of the references are generated by the assessment primes
+        with self.assertRaises(ValueError):
+            reference_ids("ZBV31", prime_set="assessment")
@@ -0,0 +1,134 @@
+import json
+import logging
+import queue
+from io import StringIO
+
+import sentry_sdk
+from django.test import SimpleTestCase
+from sentry_sdk.transport import Transport
+
+from webcaf.logging_filters import MaskEmailFilter, RequestLogFilter
+from webcaf.logging_handlers import BackgroundQueueHandler, JsonFormatter
+from webcaf.middleware import log_context
+from webcaf.webcaf.utils.email import mask_sentry_event
+
+
+class LoggingPipelineTest(SimpleTestCase):
+    def setUp(self):
+        self.stream = StringIO()
+        self.target = logging.StreamHandler(self.stream)
+        self.target.set_name("test-logging-pipeline-target")
+        self.target.setFormatter(JsonFormatter())
+        # dictConfig registers the handlers by name, this does the same for the test handler
+        logging._handlers[self.target.name] = self.target
+        self.addCleanup(logging._handlers.pop, self.target.name, None)
+
+        self.handler = BackgroundQueueHandler(handlers=[self.target.name])
+        self.handler.addFilter(RequestLogFilter())
+        self.handler.addFilter(MaskEmailFilter())
+        self.addCleanup(self.handler.close)
+
+        self.logger = logging.getLogger("tests.logging_pipeline")
+        self.logger.propagate = False
+        self.logger.setLevel(logging.INFO)
+        self.logger.addHandler(self.handler)
+        self.addCleanup(self.logger.removeHandler, self.handler)
+        self.addCleanup(setattr, self.logger, "propagate", True)
+
+    def written(self) -> list[dict]:
+        self.handler.stop()
+        return [json.loads(line) for line in self.stream.getvalue().splitlines()]
+
+    def test_records_are_written_by_the_listener_as_json(self):
+        token = log_context.set({"user_id": 7, "session_id": "abc123"})
+        self.addCleanup(log_context.reset, token)
+
+        self.logger.info("Assessment %s submitted", 12)
+
+        [entry] = self.written()
+        self.assertEqual(entry["message"], "Assessment 12 submitted")
+        self.assertEqual(entry["level"], "INFO")
+        self.assertEqual(entry["logger"], "tests.logging_pipeline")
+        self.assertEqual(entry["user_id"], 7)
+        self.assertEqual(entry["session_id"], "abc123")
+
+    def test_emails_are_masked_in_arguments_and_exceptions(self):
+        try:
+            raise ValueError("No user for someone@example.gov.uk")
+        except ValueError:
+            self.logger.exception("Failed to send OTP to %s", "someone@example.gov.uk")
+
+        [entry] = self.written()
+        self.assertEqual(entry["message"], "Failed to send OTP to so***@example.gov.uk")
+        self.assertIn("No user for so***@example.gov.uk", entry["exception"])
+        self.assertNotIn("someone@", json.dumps(entry))
+
+    def test_emails_are_masked_in_extra_fields(self):
+        class Recipient:
+            def __str__(self):
+                return "recipient@example.gov.uk"
+
+        self.logger.info(
+            "OTP sent",
+            extra={"email": "a@b.com", "recipients": ["someone@example.gov.uk"], "recipient": Recipient()},
+        )
+
+        [entry] = self.written()
+        self.assertEqual(entry["email"], "a***@b.com")
+        self.assertEqual(entry["recipients"], ["so***@example.gov.uk"])
+        self.assertEqual(entry["recipient"], "re***@example.gov.uk")
+
+    def test_disabled_levels_are_not_formatted(self):
+        class Unformattable:
+            def __str__(self):
+                raise AssertionError("A disabled record was formatted")
+
+        self.logger.debug("Not written %s", Unformattable())
+
+        self.assertEqual(self.written(), [])
+
+    def test_records_are_dropped_when_the_queue_is_full(self):
+        self.handler.start()
+        # The listener keeps reading the queue it was started with
+        self.handler.queue = queue.Queue(maxsize=1)
+
+        self.logger.info("first")
+        self.logger.info("second")
+
+        self.assertEqual(self.handler.dropped, 1)
+
+
+class CapturingTransport(Transport):
+    def __init__(self):
+        super().__init__()
+        self.envelopes: list[bytes] = []
+
+    def capture_envelope(self, envelope):
+        self.envelopes.append(envelope.serialize())
+
+
+class SentryMaskingTest(SimpleTestCase):
+    def setUp(self):
+        self.transport = CapturingTransport()
+        sentry_sdk.init(
+            dsn="https://public@sentry.example.invalid/1",
+            transport=self.transport,
+            before_send=mask_sentry_event,
+            before_breadcrumb=mask_sentry_event,
+        )
+        # Back to a client that sends nothing
+        self.addCleanup(sentry_sdk.init)
+        self.logger = logging.getLogger("tests.sentry_masking")
+
+    def test_emails_are_masked_in_events_and_breadcrumbs(self):
+        self.logger.info("Created user %s %s", 7, "someone@example.gov.uk")
+        try:
+            raise ValueError("No device for someone@example.gov.uk")
+        except ValueError:
+            self.logger.exception("Failed to send OTP to %s", "someone@example.gov.uk")
+        sentry_sdk.flush()
+
+        [envelope] = self.transport.envelopes
+        self.assertIn(b"Created user 7 so***@example.gov.uk", envelope)
+        self.assertIn(b"No device for so***@example.gov.uk", envelope)
+        self.assertNotIn(b"someone@", envelope)
@@ -0,0 +1,35 @@
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from webcaf.webcaf.metrics import collect_metrics, register_collector
+
+
+class MetricsEndpointTest(TestCase):
+    @override_settings(METRICS_TOKEN="")
+    def test_endpoint_is_disabled_without_a_token(self):
+        response = self.client.get(reverse("internal-metrics"))
+
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(METRICS_TOKEN="metrics-token")  # pragma: allowlist secret
+    def test_wrong_token_is_refused(self):
+        response = self.client.get(reverse("internal-metrics"), headers={"Authorization": "Bearer wrong"})
+
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(METRICS_TOKEN="metrics-token")  # pragma: allowlist secret
+    def test_returns_pool_metrics_without_login(self):
+        response = self.client.get(reverse("internal-metrics"), headers={"Authorization": "Bearer metrics-token"})
+
+        self.assertEqual(response.status_code, 200)
+        pools = response.json()["database_pools"]
+        if connection.pool is not None:
+            self.assertEqual(set(pools), {"default"})
+            self.assertGreaterEqual(pools["default"]["checkouts"], 1)
+            self.assertIn("saturation", pools["default"])
+
+    def test_registered_collectors_are_included(self):
+        register_collector("test_section", lambda: {"value": 1})
+
+        self.assertEqual(collect_metrics()["test_section"], {"value": 1})
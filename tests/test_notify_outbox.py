@@ -0,0 +1,162 @@
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from tests.fakes import FAKE_NOTIFY_API_KEY, FakeNotifyServer
+from webcaf.webcaf.metrics import collect_metrics
+from webcaf.webcaf.models import GovNotifyEmailDevice, NotifyEmail
+from webcaf.webcaf.notification import queue_notify_email, send_due_emails
+
+
+class NotifyOutboxTest(TestCase):
+    def setUp(self):
+        self.server = FakeNotifyServer().__enter__()
+        self.addCleanup(self.server.__exit__)
+        settings_override = override_settings(
+            NOTIFY_API_KEY=FAKE_NOTIFY_API_KEY,
+            NOTIFY_BASE_URL=self.server.url,
+            NOTIFY_RETRY_DELAY=60,
+            NOTIFY_WORKER_ENABLED=True,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def queue(self, **kwargs) -> NotifyEmail:
+        return queue_notify_email(["alice@example.gov.uk"], {"first_name": "Alice"}, "template", **kwargs)
+
+    def test_email_is_not_queued_when_the_transaction_rolls_back(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            self.queue()
+            raise RuntimeError()
+
+        self.assertFalse(NotifyEmail.objects.exists())
+
+    def test_worker_sends_the_due_emails(self):
+        emails = [self.queue() for _ in range(3)]
+        not_due = self.queue()
+        NotifyEmail.objects.filter(id=not_due.id).update(next_attempt_at=timezone.now() + timedelta(minutes=1))
+
+        stdout = StringIO()
+        # Closing the connection would end the test's transaction
+        with patch("webcaf.webcaf.management.commands.send_notify_emails.close_old_connections"):
+            call_command("send_notify_emails", once=True, batch_size=2, concurrency=2, stdout=stdout)
+
+        self.assertIn('"sent": 3', stdout.getvalue())
+        self.assertCountEqual([email["reference"] for email in self.server.emails], [f"webcaf-{e.id}" for e in emails])
+        self.assertEqual(self.server.emails[0]["email_address"], "alice@example.gov.uk")
+        self.assertEqual(self.server.emails[0]["personalisation"], {"first_name": "Alice"})
+        for email in NotifyEmail.objects.filter(id__in=[e.id for e in emails]):
+            self.assertEqual(email.status, "sent")
+            self.assertEqual(email.attempts, 1)
+            self.assertEqual(email.personalisation, {})
+            self.assertIsNotNone(email.notification_id)
+        self.assertEqual(NotifyEmail.objects.get(id=not_due.id).status, "pending")
+
+    def test_server_errors_are_retried_later(self):
+        self.server.failures = [500]
+        email = self.queue()
+
+        self.assertEqual(send_due_emails(), {"claimed": 1, "sent": 0, "retried": 1, "failed": 0})
+        email.refresh_from_db()
+        self.assertEqual(email.status, "pending")
+        self.assertEqual(email.attempts, 1)
+        self.assertIn("500", email.last_error)
+        self.assertGreater(email.next_attempt_at, timezone.now() + timedelta(seconds=40))
+
+        NotifyEmail.objects.filter(id=email.id).update(next_attempt_at=timezone.now())
+        self.assertEqual(send_due_emails()["sent"], 1)
+        self.assertEqual(len(self.server.emails), 1)
+
+    def test_rejected_emails_fail_without_retrying(self):
+        self.server.failures = [400]
+        email = self.queue()
+
+        self.assertEqual(send_due_emails()["failed"], 1)
+        email.refresh_from_db()
+        self.assertEqual(email.status, "failed")
+        self.assertEqual(email.personalisation, {"first_name": "Alice"})
+
+    @override_settings(NOTIFY_MAX_ATTEMPTS=2)
+    def test_emails_fail_after_the_maximum_attempts(self):
+        self.server.failures = [503, 429]
+        email = self.queue()
+
+        self.assertEqual(send_due_emails()["retried"], 1)
+        NotifyEmail.objects.filter(id=email.id).update(next_attempt_at=timezone.now())
+        self.assertEqual(send_due_emails()["failed"], 1)
+        self.assertEqual(NotifyEmail.objects.get(id=email.id).attempts, 2)
+
+    def test_expired_emails_are_not_sent(self):
+        email = self.queue(expires_at=timezone.now() - timedelta(seconds=1))
+
+        self.assertEqual(send_due_emails()["failed"], 1)
+        self.assertEqual(self.server.emails, [])
+        self.assertIn("Expired", NotifyEmail.objects.get(id=email.id).last_error)
+
+    @override_settings(NOTIFY_WORKER_ENABLED=False)
+    def test_emails_are_sent_on_commit_without_the_worker(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            email = self.queue()
+            self.assertEqual(self.server.emails, [])
+
+        self.assertEqual(len(self.server.emails), 1)
+        self.assertEqual(NotifyEmail.objects.get(id=email.id).status, "sent")
+
+    @override_settings(NOTIFY_WORKER_ENABLED=False)
+    def test_server_errors_fail_without_the_worker(self):
+        self.server.failures = [500]
+        with self.captureOnCommitCallbacks(execute=True):
+            email = self.queue()
+
+        email.refresh_from_db()
+        self.assertEqual(email.status, "failed")
+        self.assertIn("500", email.last_error)
+
+    @override_settings(NOTIFY_WORKER_ENABLED=False)
+    def test_admin_retry_sends_failed_emails_without_the_worker(self):
+        admin_user = User.objects.create_superuser(username="admin@example.gov.uk", email="admin@example.gov.uk")
+        self.client.force_login(admin_user)
+        email = NotifyEmail.objects.create(
+            email_addresses=["alice@example.gov.uk"], template_id="template", status="failed", attempts=5
+        )
+
+        self.client.post(
+            reverse("admin:webcaf_notifyemail_changelist"),
+            {"action": "retry", "_selected_action": [email.id]},
+        )
+
+        self.assertEqual(len(self.server.emails), 1)
+        self.assertEqual(NotifyEmail.objects.get(id=email.id).status, "sent")
+
+    def test_metrics_report_the_outbox(self):
+        self.queue()
+        NotifyEmail.objects.create(email_addresses=[], template_id="template", status="failed")
+
+        outbox = collect_metrics()["notify_outbox"]
+
+        self.assertEqual(outbox["pending"], 1)
+        self.assertEqual(outbox["failed"], 1)
+        self.assertGreaterEqual(outbox["oldest_pending_seconds"], 0)
+
+    @override_settings(SSO_MODE="external", NOTIFY_OTP_TEMPLATE_ID="otp-template")
+    def test_otp_challenge_queues_an_email_until_the_token_expires(self):
+        user = User.objects.create_user(username="otp", email="otp@example.gov.uk", first_name="Otto")
+        device = GovNotifyEmailDevice.objects.create(user=user, email=user.email)
+
+        with patch("webcaf.webcaf.notification.get_notify_client") as get_notify_client:
+            device.generate_challenge()
+        get_notify_client.assert_not_called()
+
+        email = NotifyEmail.objects.get()
+        device.refresh_from_db()
+        self.assertEqual(email.email_addresses, [user.email])
+        self.assertEqual(email.template_id, "otp-template")
+        self.assertEqual(email.personalisation["token"].strip(), device.token)
+        self.assertEqual(email.expires_at, device.valid_until)
@@ -0,0 +1,89 @@
+import json
+import uuid
+from io import StringIO
+
+from cryptography.hazmat.primitives.asymmetric import rsa
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase, override_settings
+
+from webcaf.auth import OIDCBackend, get_oidc_session
+from webcaf.webcaf.cache import get_cache
+from webcaf.webcaf.management.commands.benchmark_login import StubOIDCProvider
+
+CLAIMS = {
+    "sub": "alice",
+    "email": "alice@example.gov.uk",
+    "given_name": "Alice",
+    "family_name": "Smith",
+}
+
+
+class OIDCBackendTest(TestCase):
+    def setUp(self):
+        self.provider = StubOIDCProvider(dict(CLAIMS)).__enter__()
+        self.addCleanup(self.provider.__exit__)
+        settings_override = override_settings(**self.provider.settings(), OIDC_JWKS_CACHE_TIMEOUT=3600)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        get_cache().clear()
+
+    def login(self):
+        code = uuid.uuid4().hex
+        request = RequestFactory().get("/oidc/callback/", {"code": code, "state": "state"})
+        request.session = SessionStore()
+        return OIDCBackend().authenticate(request, nonce=code)
+
+    def test_logins_reuse_the_connection_and_the_keys(self):
+        first = self.login()
+        second = self.login()
+
+        self.assertEqual(first, second)
+        self.assertEqual(first.email, "alice@example.gov.uk")
+        self.assertEqual(self.provider.connections, 1)
+        self.assertEqual(self.provider.requests, {"/token": 2, "/userinfo": 2, "/keys": 1})
+
+    def test_keys_are_fetched_again_when_rotated(self):
+        self.login()
+        self.provider.key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        self.provider.kid = uuid.uuid4().hex
+
+        self.assertIsNotNone(self.login())
+        self.assertEqual(self.provider.requests["/keys"], 2)
+
+    @override_settings(OIDC_JWKS_CACHE_TIMEOUT=0)
+    def test_keys_are_fetched_on_every_login_without_the_cache(self):
+        self.login()
+        self.login()
+
+        self.assertEqual(self.provider.requests["/keys"], 2)
+
+    def test_user_is_only_saved_when_a_claim_changes(self):
+        user = self.login()
+        backend = OIDCBackend()
+
+        with self.assertNumQueries(0):
+            backend.update_user(user, CLAIMS)
+        with self.assertNumQueries(1):
+            backend.update_user(user, {**CLAIMS, "family_name": "Jones"})
+        self.assertEqual(User.objects.get(pk=user.pk).last_name, "Jones")
+
+    def test_session_retries_idempotent_requests(self):
+        retry = get_oidc_session().get_adapter(self.provider.url).max_retries
+
+        self.assertEqual(retry.total, 2)
+        self.assertTrue(retry.is_retry("GET", 503))
+        self.assertFalse(retry.is_retry("POST", 503))
+
+
+class BenchmarkLoginCommandTest(TestCase):
+    def test_reports_both_runs(self):
+        stdout = StringIO()
+        call_command("benchmark_login", logins=3, stdout=stdout)
+
+        results = json.loads(stdout.getvalue())
+        self.assertEqual(results["connection_per_request"]["connections_per_login"], 3.0)
+        self.assertLess(results["pooled"]["connections_per_login"], 1.0)
+        self.assertEqual(results["pooled"]["requests_per_login"]["/keys"], 0.33)
+        self.assertFalse(User.objects.filter(email=CLAIMS["email"]).exists())
@@ -0,0 +1,202 @@
+import csv
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest.mock import patch
+
+from django.contrib.admin.sites import AdminSite
+from django.contrib.auth.models import User
+from django.contrib.messages import get_messages
+from django.core.files.uploadedfile import InMemoryUploadedFile
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+
+from tests.admin.test_organisation_admin import add_middleware
+from webcaf.webcaf.admin import OrganisationAdmin, OrganisationImportAdmin
+from webcaf.webcaf.models import Organisation, OrganisationImport, UserProfile
+from webcaf.webcaf.organisation_import import (
+    CSV_HEADERS,
+    MAX_ATTEMPTS,
+    OrganisationImporter,
+    claim_import,
+    read_csv,
+    run_import,
+)
+
+
+def make_csv(rows: list[dict]) -> str:
+    buffer = StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CSV_HEADERS, restval="")
+    writer.writeheader()
+    writer.writerows(rows)
+    return buffer.getvalue()
+
+
+def department_rows(count: int) -> list[dict]:
+    rows = [
+        {"Organisation": "Department", "Lead Government Department": "Department", "Type": "Ministerial department"}
+    ]
+    for i in range(count - 1):
+        rows.append(
+            {
+                "Organisation": f"Agency {i}",
+                "Lead Government Department": "Department",
+                "Type": "Executive agency",
+                "Email1": f"advisor{i}@example.gov.uk",
+                "Email2": "lead@example.gov.uk",
+            }
+        )
+    return rows
+
+
+class OrganisationImporterTest(TestCase):
+    def test_queries_do_not_grow_with_the_rows(self):
+        with self.assertNumQueries(11):
+            summary = OrganisationImporter(read_csv(make_csv(department_rows(50)))).run()
+
+        self.assertEqual(summary.rows, 50)
+        self.assertEqual(summary.organisations_created, 50)
+        self.assertEqual(summary.users_created, 50)
+        self.assertEqual(summary.profiles_created, 98)
+        department = Organisation.objects.get(name="Department")
+        self.assertIsNone(department.parent_organisation)
+        self.assertEqual(department.sub_organisations.count(), 49)
+        agency = Organisation.objects.get(name="Agency 3")
+        self.assertEqual(agency.organisation_type, "executive-agency")
+        self.assertRegex(agency.reference, r"^[A-Z0-9]+$")
+        self.assertEqual(agency.history.count(), 1)
+        self.assertFalse(User.objects.get(email="lead@example.gov.uk").has_usable_password())
+
+    def test_importing_the_same_file_again_changes_nothing(self):
+        rows = read_csv(make_csv(department_rows(10)))
+        OrganisationImporter(rows).run()
+
+        summary = OrganisationImporter(rows).run()
+
+        self.assertEqual(summary.organisations_created, 0)
+        self.assertEqual(summary.users_created, 0)
+        self.assertEqual(summary.profiles_created, 0)
+        self.assertEqual(summary.profiles_existing, 18)
+        self.assertEqual(summary.parents_changed, 0)
+        self.assertEqual(Organisation.objects.count(), 10)
+
+    def test_parent_of_an_existing_organisation_is_changed(self):
+        agency = Organisation.objects.create(name="Agency 0")
+
+        summary = OrganisationImporter(read_csv(make_csv(department_rows(2)))).run()
+
+        agency.refresh_from_db()
+        self.assertEqual(summary.parents_changed, 1)
+        self.assertEqual(agency.parent_organisation.name, "Department")
+        self.assertEqual(agency.history.first().history_type, "~")
+
+
+@override_settings(ORGANISATION_IMPORT_INLINE_ROWS=5)
+class OrganisationImportJobTest(TestCase):
+    def setUp(self):
+        self.superuser = User.objects.create_superuser(
+            username="admin@test.gov.uk", email="admin@test.gov.uk", password="testpass123"  # pragma: allowlist secret
+        )
+
+    def upload(self, rows: list[dict]):
+        content = make_csv(rows).encode("utf-8")
+        csv_file = InMemoryUploadedFile(BytesIO(content), "file", "orgs.csv", "text/csv", len(content), None)
+        request = RequestFactory().post("/admin/webcaf/organisation/import-org-csv/", {"csv_file": csv_file})
+        request.user = self.superuser
+        request = add_middleware(request)
+        return request, OrganisationAdmin(Organisation, AdminSite()).import_csv(request)
+
+    def test_large_file_is_queued(self):
+        request, response = self.upload(department_rows(20))
+
+        job = OrganisationImport.objects.get()
+        self.assertEqual(response.url, f"/admin/webcaf/organisationimport/{job.pk}/change/")
+        self.assertEqual(job.status, "queued")
+        self.assertEqual(job.total_rows, 20)
+        self.assertEqual(job.created_by, self.superuser)
+        self.assertIn("20 Organisations queued for import", [str(m) for m in get_messages(request)][0])
+        self.assertFalse(Organisation.objects.exists())
+
+    def test_small_file_is_imported_during_the_request(self):
+        request, _ = self.upload(department_rows(5))
+
+        self.assertFalse(OrganisationImport.objects.exists())
+        self.assertEqual(Organisation.objects.count(), 5)
+        self.assertIn("✅ Imported 5 Organisations.", [str(m) for m in get_messages(request)])
+
+    def test_command_runs_the_queued_imports(self):
+        self.upload(department_rows(20))
+
+        stdout = StringIO()
+        # Closing the connection would end the test's transaction
+        with patch("webcaf.webcaf.management.commands.process_organisation_imports.close_old_connections"):
+            call_command("process_organisation_imports", once=True, stdout=stdout)
+
+        self.assertIn('"completed": 1', stdout.getvalue())
+        job = OrganisationImport.objects.get()
+        self.assertEqual(job.status, "completed")
+        self.assertEqual(job.processed_rows, 20)
+        self.assertEqual(job.summary["organisations_created"], 20)
+        self.assertEqual(job.csv_data, "")
+        self.assertIsNotNone(job.finished_on)
+        self.assertEqual(UserProfile.objects.filter(role="cyber_advisor").count(), 38)
+
+    def test_failed_import_changes_nothing(self):
+        self.upload(department_rows(20))
+        job = claim_import()
+
+        with patch.object(OrganisationImporter, "new_profiles", side_effect=RuntimeError("Database unavailable")):
+            job = run_import(job)
+
+        self.assertEqual(job.status, "failed")
+        self.assertEqual(job.error, "Database unavailable")
+        self.assertFalse(Organisation.objects.exists())
+        self.assertIsNone(claim_import())
+
+    def make_stale(self, job: OrganisationImport):
+        OrganisationImport.objects.filter(pk=job.pk).update(started_on=timezone.now() - timedelta(hours=2))
+
+    def test_running_import_is_not_taken_by_another_worker(self):
+        self.upload(department_rows(20))
+        claim_import()
+
+        self.assertIsNone(claim_import())
+
+    def test_import_of_a_stopped_worker_is_run_again(self):
+        self.upload(department_rows(20))
+        self.make_stale(claim_import())
+
+        job = claim_import()
+
+        self.assertEqual(job.attempts, 2)
+        self.assertEqual(run_import(job).status, "completed")
+        self.assertEqual(Organisation.objects.count(), 20)
+
+    def test_import_taken_by_another_worker_is_rolled_back(self):
+        self.upload(department_rows(20))
+        first = claim_import()
+        self.make_stale(first)
+        second = claim_import()
+
+        self.assertEqual(run_import(first).status, "running")
+        self.assertFalse(Organisation.objects.exists())
+        self.assertEqual(run_import(second).status, "completed")
+        self.assertEqual(Organisation.objects.count(), 20)
+
+    def test_import_that_never_finishes_is_failed(self):
+        self.upload(department_rows(20))
+        for _ in range(MAX_ATTEMPTS):
+            self.make_stale(claim_import())
+
+        self.assertIsNone(claim_import())
+        job = OrganisationImport.objects.get()
+        self.assertEqual(job.status, "failed")
+        self.assertIn("did not finish", job.error)
+
+    def test_progress_shows_the_rows_read(self):
+        job = OrganisationImport(status="running", total_rows=20, processed_rows=10)
+        admin = OrganisationImportAdmin(OrganisationImport, AdminSite())
+
+        self.assertEqual(admin.progress(job), "10 of 20")
+        job.processed_rows = 20
+        self.assertEqual(admin.progress(job), "20 of 20, saving the changes")
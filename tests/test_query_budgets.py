@@ -0,0 +1,144 @@
+"""
+Maximum number of queries for the key pages, with a dataset of several organisations,
+systems and assessments, so a change that adds a query per row fails here.
+
+When a change needs more queries on purpose, raise the budget in ``QUERY_BUDGETS``
+in the same commit and say why in its message.
+"""
+
+import json
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from tests.test_views.base_view_test import BaseViewTest
+from webcaf.webcaf.models import Assessment, UserProfile
+from webcaf.webcaf.utils.timing import fingerprint
+
+COMPLETED_ASSESSMENT_DATA = Path(__file__).parent.parent / "features" / "data" / "alice_completed_assessment.json"
+
+QUERY_BUDGETS = {
+    "my-account": 11,
+    "edit-draft-assessment": 16,
+    "indicators-get": 12,
+    "indicators-post": 22,
+    "confirmation-get": 15,
+    "confirmation-post": 26,
+    "objective": 9,
+    "view-submitted-assessments": 7,
+    "view-submitted-assessment": 6,
+    "admin-organisation-changelist": 5,
+    "admin-system-changelist": 5,
+    "admin-assessment-changelist": 5,
+    "admin-userprofile-changelist": 5,
+}
+
+INDICATORS_FORM = {
+    "achieved_A1.a.5": True,
+    "achieved_A1.a.6": True,
+    "achieved_A1.a.7": True,
+    "achieved_A1.a.8": True,
+    "achieved_A1.a.5_comment": "Evidence",
+}
+
+
+class QueryBudgetTest(BaseViewTest):
+    @classmethod
+    def setUpTestData(cls):
+        BaseViewTest.setUpTestData()
+        completed_data = json.loads(COMPLETED_ASSESSMENT_DATA.read_text())
+        cls.lead_user = cls.org_map[cls.organisation_name]["users"]["organisation_lead"]
+        cls.lead_profile = UserProfile.objects.get(user=cls.lead_user, role="organisation_lead")
+        # Submitted assessments for every system, so list pages have rows for every organisation
+        for org in cls.org_map.values():
+            for system in org["systems"].values():
+                for period in ["23/24", "24/25"]:
+                    assessment = Assessment.objects.create(
+                        system=system,
+                        status="draft",
+                        assessment_period=period,
+                        framework="caf32",
+                        caf_profile="baseline",
+                        last_updated_by=cls.lead_user,
+                        assessments_data=completed_data,
+                    )
+                    assessment.status = "submitted"
+                    assessment.save()
+        cls.submitted = Assessment.objects.filter(system=cls.test_system, status="submitted").first()
+        cls.draft = Assessment.objects.create(
+            system=cls.test_system,
+            status="draft",
+            assessment_period="25/26",
+            review_type="peer_review",
+            framework="caf32",
+            caf_profile="baseline",
+            last_updated_by=cls.lead_user,
+            assessments_data={"A1.a": {"indicators": INDICATORS_FORM}},
+        )
+        cls.admin_user = User.objects.create_superuser(username="budget-admin", email="budget-admin@example.gov.uk")
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.lead_user)
+        session = self.client.session
+        session["current_profile_id"] = self.lead_profile.id
+        session["draft_assessment"] = {"assessment_id": self.draft.id}
+        session.save()
+
+    def assertWithinBudget(self, name: str, method: str, url: str, data: dict | None = None):
+        # The first request records the session activity, keep that write out of the count
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(url, data=data or {})
+        self.assertLess(response.status_code, 400, f"{name} returned {response.status_code}")
+        budget = QUERY_BUDGETS[name]
+        self.assertLessEqual(
+            len(queries),
+            budget,
+            f"{name} ran {len(queries)} queries, the budget is {budget}:\n"
+            + "\n".join(fingerprint(query["sql"]) for query in queries),
+        )
+        # The default configuration, and the version check behind it, are cached in the process
+        self.assertFalse([query["sql"] for query in queries if '"webcaf_configuration' in query["sql"]])
+
+    def test_my_account(self):
+        self.assertWithinBudget("my-account", "get", reverse("my-account"))
+
+    def test_edit_draft_assessment(self):
+        self.assertWithinBudget(
+            "edit-draft-assessment", "get", reverse("edit-draft-assessment", kwargs={"assessment_id": self.draft.id})
+        )
+
+    def test_indicators(self):
+        self.assertWithinBudget("indicators-get", "get", reverse("caf32_indicators_A1.a"))
+        self.assertWithinBudget("indicators-post", "post", reverse("caf32_indicators_A1.a"), INDICATORS_FORM)
+
+    def test_confirmation(self):
+        self.assertWithinBudget("confirmation-get", "get", reverse("caf32_confirmation_A1.a"))
+        self.assertWithinBudget(
+            "confirmation-post",
+            "post",
+            reverse("caf32_confirmation_A1.a"),
+            {"confirm_outcome": "confirm", "confirm_outcome_confirm_comment": "Summary"},
+        )
+
+    def test_objective(self):
+        self.assertWithinBudget("objective", "get", reverse("caf32_objective_A"))
+
+    def test_submitted_assessments(self):
+        self.assertWithinBudget("view-submitted-assessments", "get", reverse("view-submitted-assessments"))
+        self.assertWithinBudget(
+            "view-submitted-assessment",
+            "get",
+            reverse("view-submitted-assessment", kwargs={"assessment_id": self.submitted.id}),
+        )
+
+    def test_admin_changelists(self):
+        self.client.force_login(self.admin_user)
+        for model in ["organisation", "system", "assessment", "userprofile"]:
+            with self.subTest(model=model):
+                self.assertWithinBudget(f"admin-{model}-changelist", "get", reverse(f"admin:webcaf_{model}_changelist"))
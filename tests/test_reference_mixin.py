@@ -1,9 +1,14 @@
 from unittest.mock import patch
 
-from django.db import models
-from django.test import TestCase
+from django.contrib.admin.sites import AdminSite
+from django.db import connection, models
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
 
-from webcaf.webcaf.models import ReferenceGeneratorMixin
+from webcaf.webcaf.admin import OrganisationAdmin
+from webcaf.webcaf.checks import check_references
+from webcaf.webcaf.models import Organisation, ReferenceGeneratorMixin, System
+from webcaf.webcaf.utils.references import generate_reference
 
 
 class DummyModel(ReferenceGeneratorMixin, models.Model):
@@ -57,3 +62,92 @@ class ReferenceGeneratorMixinTest(TestCase):
         obj.__class__.__name__ = "Blah"
         obj.save()
         self.mock_generate.assert_called_with(42, prime_set="blah")
+
+
+class ReferenceAllocationTest(TestCase):
+    def test_new_row_is_written_once(self):
+        with CaptureQueriesContext(connection) as queries:
+            organisation = Organisation.objects.create(name="Organisation")
+
+        self.assertEqual(organisation.reference, generate_reference(organisation.pk, prime_set="organisation"))
+        self.assertEqual(organisation.history.get().reference, organisation.reference)
+        writes = [query["sql"] for query in queries if not query["sql"].startswith("SELECT")]
+        self.assertEqual(len(writes), 2)
+        self.assertTrue(all(sql.startswith("INSERT") for sql in writes))
+
+    def test_bulk_create_sets_the_references(self):
+        organisation = Organisation.objects.create(name="Organisation")
+        systems = System.objects.bulk_create(
+            [
+                System(name="First", organisation=organisation),
+                System(pk=10_000, name="Second", organisation=organisation),
+            ]
+        )
+
+        for system in System.objects.filter(pk__in=[system.pk for system in systems]):
+            self.assertEqual(system.reference, generate_reference(system.pk, prime_set="system"))
+        self.assertEqual(systems[1].pk, 10_000)
+
+    def test_references_match_the_ones_saved_after_the_insert(self):
+        """
+        Rows created before the primary key was reserved got the reference of the id they were
+        inserted with, the references generated now are the same.
+        """
+        organisation = Organisation(name="Organisation")
+        models.Model.save(organisation)
+        organisation.reference = generate_reference(organisation.pk, prime_set="organisation")
+        models.Model.save(organisation, update_fields=["reference"])
+
+        self.assertEqual(Organisation.reference_for(organisation.pk), organisation.reference)
+        self.assertEqual(check_references(databases=["default"]), [])
+
+
+class CheckReferencesTest(TestCase):
+    def test_warns_about_references_not_generated_from_the_id(self):
+        Organisation.objects.create(name="Generated")
+        Organisation.objects.create(name="Imported", reference="ORG001")
+
+        warnings = check_references(databases=["default"])
+
+        self.assertEqual([warning.id for warning in warnings], ["webcaf.W001"])
+        self.assertIs(warnings[0].obj, Organisation)
+        self.assertIn("1 organisations", warnings[0].msg)
+
+    def test_only_runs_with_a_database(self):
+        Organisation.objects.create(name="Imported", reference="ORG001")
+
+        self.assertEqual(check_references(), [])
+
+
+class ReferenceLookupTest(TestCase):
+    def setUp(self):
+        self.organisation = Organisation.objects.create(name="Organisation")
+        self.system = System.objects.create(name="System", organisation=self.organisation)
+        self.imported = Organisation.objects.create(name="Imported", reference="ORG001")
+
+    def test_get_by_reference_uses_the_primary_key(self):
+        with CaptureQueriesContext(connection) as queries:
+            found = Organisation.objects.get_by_reference(f" {self.organisation.reference.lower()} ")
+
+        self.assertEqual(found, self.organisation)
+        self.assertIn(f'"webcaf_organisation"."id" IN ({self.organisation.pk})', queries[0]["sql"])
+
+    def test_reference_of_another_model_is_not_found(self):
+        with self.assertRaises(Organisation.DoesNotExist):
+            Organisation.objects.get_by_reference(self.system.reference)
+
+    def test_reference_that_was_not_generated_is_looked_up_as_it_is(self):
+        self.assertEqual(Organisation.objects.get_by_reference("ORG001"), self.imported)
+
+    def test_admin_search_finds_the_reference_by_primary_key(self):
+        model_admin = OrganisationAdmin(Organisation, AdminSite())
+        request = RequestFactory().get("/admin/webcaf/organisation/")
+
+        results, may_have_duplicates = model_admin.get_search_results(
+            request, Organisation.objects.all(), self.organisation.reference
+        )
+        self.assertEqual(list(results), [self.organisation])
+        self.assertFalse(may_have_duplicates)
+
+        results, _ = model_admin.get_search_results(request, Organisation.objects.all(), "Impor")
+        self.assertEqual(list(results), [self.imported])
@@ -0,0 +1,96 @@
+import time
+
+from django.contrib.auth.models import AnonymousUser, User
+from django.contrib.sessions.backends.db import SessionStore
+from django.contrib.sessions.models import Session
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.views.generic import View
+
+from webcaf.webcaf.models import Organisation
+from webcaf.webcaf.utils.replica import (
+    PRIMARY_UNTIL_SESSION_KEY,
+    ReadOnlyViewMixin,
+    ReplicaRouter,
+    ReplicaStickinessMiddleware,
+    read_only_view,
+)
+
+router = ReplicaRouter()
+
+
+@read_only_view
+def read_only_function_view(request):
+    return HttpResponse(router.db_for_read(Organisation))
+
+
+@read_only_view
+def writing_function_view(request):
+    router.db_for_write(Organisation)
+    return HttpResponse(router.db_for_read(Organisation))
+
+
+class ReadOnlyClassView(ReadOnlyViewMixin, View):
+    def get(self, request):
+        return HttpResponse(router.db_for_read(Organisation))
+
+    def post(self, request):
+        return HttpResponse(router.db_for_read(Organisation))
+
+
+@override_settings(DATABASE_REPLICA_ALIAS="replica", REPLICA_STICKY_SECONDS=15)
+class ReplicaRouterTest(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def request(self, view, method="get", session=None, user=None):
+        request = getattr(self.factory, method)("/")
+        request.session = session if session is not None else SessionStore()
+        request.user = user or User(username="replica-user")
+        response = ReplicaStickinessMiddleware(view)(request)
+        return response.content.decode(), request.session
+
+    def test_reads_use_the_primary_outside_read_only_views(self):
+        self.assertEqual(router.db_for_read(Organisation), "default")
+
+    def test_read_only_views_read_from_the_replica(self):
+        self.assertEqual(self.request(read_only_function_view)[0], "replica")
+        self.assertEqual(self.request(ReadOnlyClassView.as_view())[0], "replica")
+
+    def test_unsafe_methods_use_the_primary(self):
+        self.assertEqual(self.request(ReadOnlyClassView.as_view(), method="post")[0], "default")
+
+    def test_sessions_are_always_read_from_the_primary(self):
+        @read_only_view
+        def session_view(request):
+            return HttpResponse(router.db_for_read(Session))
+
+        self.assertEqual(self.request(session_view)[0], "default")
+
+    @override_settings(DATABASE_REPLICA_ALIAS=None)
+    def test_no_replica_configured(self):
+        self.assertEqual(self.request(read_only_function_view)[0], "default")
+
+    def test_reads_after_a_write_in_the_request_use_the_primary(self):
+        self.assertEqual(self.request(writing_function_view)[0], "default")
+
+    def test_session_sticks_to_the_primary_after_a_write(self):
+        content, session = self.request(writing_function_view)
+
+        self.assertGreater(session[PRIMARY_UNTIL_SESSION_KEY], time.time())
+        self.assertEqual(self.request(read_only_function_view, session=session)[0], "default")
+
+    def test_anonymous_session_is_not_marked(self):
+        content, session = self.request(writing_function_view, user=AnonymousUser())
+
+        self.assertNotIn(PRIMARY_UNTIL_SESSION_KEY, session)
+
+    def test_session_returns_to_the_replica_when_the_window_ends(self):
+        session = SessionStore()
+        session[PRIMARY_UNTIL_SESSION_KEY] = time.time() - 1
+
+        self.assertEqual(self.request(read_only_function_view, session=session)[0], "replica")
+
+    def test_only_the_primary_is_migrated(self):
+        self.assertTrue(router.allow_migrate("default", "webcaf"))
+        self.assertFalse(router.allow_migrate("replica", "webcaf"))
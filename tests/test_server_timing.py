@@ -0,0 +1,75 @@
+import json
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+
+from webcaf.webcaf.utils.timing import RequestTimings, fingerprint, timed
+
+FAKE_CACHES = {"default": {"BACKEND": "tests.fakes.FakeCache", "LOCATION": "server-timing"}}
+
+
+@override_settings(CACHES=FAKE_CACHES)
+class ServerTimingMiddlewareTest(TestCase):
+    def setUp(self):
+        caches["default"].clear()
+
+    def timing_names(self, response) -> set[str]:
+        return {entry.split(";")[0].strip() for entry in response["Server-Timing"].split(",")}
+
+    def test_staff_users_get_the_server_timing_header(self):
+        self.client.force_login(User.objects.create_user(username="timing-staff", is_staff=True))
+
+        response = self.client.get("/public/help/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue({"db", "template", "view", "total"} <= self.timing_names(response))
+
+    def test_other_users_do_not_get_the_header(self):
+        self.client.force_login(User.objects.create_user(username="timing-user"))
+
+        response = self.client.get("/public/help/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("Server-Timing", response)
+
+    def test_requests_are_logged_with_their_timings(self):
+        self.client.force_login(User.objects.create_user(username="timing-log-user"))
+
+        with self.assertLogs("webcaf.timing", level="INFO") as logs:
+            self.client.get("/public/help/")
+
+        [record] = logs.records
+        self.assertIn("GET /public/help/ 200", record.getMessage())
+        self.assertGreater(record.timings["db"]["count"], 0)
+        self.assertIn("template", record.timings)
+
+    @override_settings(SLOW_REQUEST_THRESHOLD_MS=0.001)
+    def test_slow_requests_are_written_with_their_query_fingerprints(self):
+        self.client.force_login(User.objects.create_user(username="timing-slow-user"))
+
+        with self.assertLogs("webcaf.slow_requests", level="WARNING") as logs:
+            self.client.get("/public/help/")
+
+        [record] = logs.records
+        slow_request = json.loads(record.getMessage())
+        self.assertEqual(slow_request["path"], "/public/help/")
+        self.assertTrue(any('FROM "django_session"' in query["fingerprint"] for query in slow_request["queries"]))
+
+
+class TimingTest(TestCase):
+    def test_fingerprint_replaces_literals(self):
+        self.assertEqual(
+            fingerprint("SELECT * FROM t WHERE id IN (%s, %s, %s) AND name = 'x' LIMIT 21"),
+            "SELECT * FROM t WHERE id IN (...) AND name = ? LIMIT ?",
+        )
+
+    def test_timed_outside_a_request_does_nothing(self):
+        with timed("pdf"):
+            pass
+
+    def test_server_timing_header_value(self):
+        timings = RequestTimings()
+        timings.add("pdf", 12.345)
+
+        self.assertEqual(timings.server_timing(), 'pdf;dur=12.3;desc="PDF generation"')
@@ -1,6 +1,9 @@
 import time
+from unittest.mock import patch
 
+from django.db import connection
 from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django_otp import DEVICE_ID_SESSION_KEY
 
@@ -49,3 +52,43 @@ class SessionTimeoutTest(SetupSessionTestData):
         response = self.client.get(self.my_account_url)
         self.assertEqual(response.status_code, 302)
         self.assertEqual(response.url, AccountView.login_url)
+
+
+class SessionActivityWriteTest(SetupSessionTestData):
+    def session_writes(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [query for query in queries if query["sql"].startswith('UPDATE "django_session"')]
+
+    @override_settings(SESSION_ACTIVITY_GRANULARITY=60)
+    def test_session_is_not_saved_within_the_granularity(self):
+        self.client.force_login(self.test_user)
+        self.assertEqual(len(self.session_writes(self.my_account_url)), 1)
+
+        self.assertEqual(self.session_writes(self.my_account_url), [])
+        self.assertEqual(self.session_writes(reverse("view-draft-assessments")), [])
+
+    @override_settings(SESSION_ACTIVITY_GRANULARITY=60)
+    def test_last_activity_moves_after_the_granularity(self):
+        self.client.force_login(self.test_user)
+        self.client.get(self.my_account_url)
+        first_activity = self.client.session["last_activity"]
+
+        with patch("webcaf.session.time.time", return_value=first_activity + 61):
+            self.assertEqual(len(self.session_writes(self.my_account_url)), 1)
+
+        self.assertEqual(self.client.session["last_activity"], first_activity + 61)
+
+    @override_settings(SESSION_ACTIVITY_GRANULARITY=60, USER_IDLE_TIMEOUT=600)
+    def test_timeout_uses_the_stored_activity(self):
+        self.client.force_login(self.test_user)
+        self.client.get(self.my_account_url)
+        first_activity = self.client.session["last_activity"]
+
+        with patch("webcaf.session.time.time", return_value=first_activity + 30):
+            self.client.get(self.my_account_url)
+        with patch("webcaf.session.time.time", return_value=first_activity + 601):
+            response = self.client.get(self.my_account_url)
+
+        self.assertRedirects(response, self.session_timeout_url, fetch_redirect_response=False)
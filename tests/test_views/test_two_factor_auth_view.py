@@ -1,10 +1,15 @@
+from datetime import timedelta
 from unittest.mock import patch
 
+from django.test import override_settings
 from django.urls import reverse_lazy
+from django.utils import timezone
 from django_otp import DEVICE_ID_SESSION_KEY
 
 from tests.test_views.base_view_test import BaseViewTest
+from webcaf.webcaf.cache import get_cache
 from webcaf.webcaf.models import GovNotifyEmailDevice
+from webcaf.webcaf.views.two_factor_auth import otp_metrics, reset_metrics
 
 
 class Verify2FATokenViewTests(BaseViewTest):
@@ -154,3 +159,102 @@ class Verify2FATokenViewTests(BaseViewTest):
         self.assertEqual(response.status_code, 200)
         self.assertContains(response, "Please enter your 6-digit code.")
         self.assertIn("otp_token", response.context["form"].errors)
+
+
+@override_settings(OTP_SEND_LIMIT=2, OTP_SEND_WINDOW=900)
+class Verify2FATokenChallengeTests(BaseViewTest):
+    """
+    Tokens are only sent when needed, and at most OTP_SEND_LIMIT times per window.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        BaseViewTest.setUpTestData()
+
+    def setUp(self):
+        self.client.force_login(self.test_user)
+        self.verify_url = reverse_lazy("verify-2fa-token")
+        get_cache().clear()
+        reset_metrics()
+
+    def expire_cooldown(self):
+        GovNotifyEmailDevice.objects.update(last_generated_timestamp=timezone.now() - timedelta(minutes=2))
+
+    def test_get_reuses_a_valid_token(self):
+        self.client.get(self.verify_url)
+        device = GovNotifyEmailDevice.objects.get()
+        self.expire_cooldown()
+
+        with patch.object(GovNotifyEmailDevice, "generate_challenge") as generate_challenge:
+            self.client.get(self.verify_url)
+            self.client.get(self.verify_url)
+
+        generate_challenge.assert_not_called()
+        self.assertEqual(GovNotifyEmailDevice.objects.get().token, device.token)
+        self.assertEqual(otp_metrics()["sent"], 1)
+        self.assertEqual(otp_metrics()["reused"], 2)
+
+    def test_get_sends_a_new_token_when_it_has_expired(self):
+        self.client.get(self.verify_url)
+        GovNotifyEmailDevice.objects.update(
+            valid_until=timezone.now() - timedelta(seconds=1),
+            last_generated_timestamp=timezone.now() - timedelta(minutes=6),
+        )
+
+        self.client.get(self.verify_url)
+
+        self.assertEqual(otp_metrics()["sent"], 2)
+        self.assertGreater(GovNotifyEmailDevice.objects.get().valid_until, timezone.now())
+
+    def test_resend_sends_a_new_token(self):
+        self.client.get(self.verify_url)
+        token = GovNotifyEmailDevice.objects.get().token
+        self.expire_cooldown()
+
+        response = self.client.post(self.verify_url, {"resend": "1"}, follow=True)
+
+        self.assertRedirects(response, self.verify_url)
+        self.assertContains(response, "We have sent you a new code.")
+        self.assertNotEqual(GovNotifyEmailDevice.objects.get().token, token)
+        self.assertEqual(otp_metrics()["resent"], 1)
+        self.assertEqual(otp_metrics()["reused"], 1)
+
+    def test_resend_waits_for_the_cooldown(self):
+        self.client.get(self.verify_url)
+        token = GovNotifyEmailDevice.objects.get().token
+
+        response = self.client.post(self.verify_url, {"resend": "1"}, follow=True)
+
+        self.assertContains(response, "Wait a minute before asking for another.")
+        self.assertEqual(GovNotifyEmailDevice.objects.get().token, token)
+        self.assertEqual(otp_metrics()["cooldown"], 1)
+
+    def test_resend_is_throttled(self):
+        self.client.get(self.verify_url)
+        self.expire_cooldown()
+        self.client.post(self.verify_url, {"resend": "1"})
+        token = GovNotifyEmailDevice.objects.get().token
+        self.expire_cooldown()
+
+        response = self.client.post(self.verify_url, {"resend": "1"}, follow=True)
+
+        self.assertContains(response, "You have asked for too many codes.")
+        self.assertEqual(GovNotifyEmailDevice.objects.get().token, token)
+        self.assertEqual(otp_metrics()["throttled"], 1)
+
+    def test_metrics_report_the_sends_per_login(self):
+        self.client.get(self.verify_url)
+        self.expire_cooldown()
+        self.client.post(self.verify_url, {"resend": "1"})
+        token = GovNotifyEmailDevice.objects.get().token
+
+        with patch("webcaf.webcaf.views.two_factor_auth.otp_login"):
+            self.client.post(self.verify_url, {"otp_token": "000000" if token != "000000" else "111111"})
+            # django-otp delays the next attempt after a wrong token
+            GovNotifyEmailDevice.objects.update(throttling_failure_timestamp=None)
+            self.client.post(self.verify_url, {"otp_token": token})
+
+        metrics = otp_metrics()
+        self.assertEqual(metrics["rejected"], 1)
+        self.assertEqual(metrics["verified"], 1)
+        self.assertEqual(metrics["sends_per_login"], 2.0)
@@ -6,17 +6,72 @@ for enforcing authentication requirements across the application.
 """
 
 import logging
+import threading
 import time
 import uuid
+from typing import Optional
 
 from django.conf import settings
+from django.core.exceptions import SuspiciousOperation
 from django.shortcuts import redirect
 from django.urls import reverse
+from django.utils.encoding import smart_str
+from josepy.jws import JWS, Header
 from mozilla_django_oidc.auth import OIDCAuthenticationBackend
 import jwt
 import requests
+from requests.adapters import HTTPAdapter
+from requests.auth import HTTPBasicAuth
+from urllib3.util.retry import Retry
 
-from webcaf.webcaf.utils import mask_email
+from webcaf.webcaf.cache import get_cache
+from webcaf.webcaf.utils.timing import timed
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def create_oidc_session() -> requests.Session:
+    """
+    Create an HTTP session for the identity provider, with a connection pool and a retry policy.
+
+    Failed connections are retried for every request. Read errors and 502, 503 and 504
+    responses are only retried for GET requests, an authorisation code can only be
+    exchanged for a token once.
+
+    Returns:
+        requests.Session: The new session.
+    """
+    retry = Retry(
+        total=settings.OIDC_HTTP_RETRIES,
+        allowed_methods=frozenset({"GET"}),
+        status_forcelist=(502, 503, 504),
+        backoff_factor=0.2,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=settings.OIDC_HTTP_POOL_SIZE,
+        pool_maxsize=settings.OIDC_HTTP_POOL_SIZE,
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers["User-Agent"] = settings.OIDC_USER_AGENT
+    return session
+
+
+def get_oidc_session() -> requests.Session:
+    """
+    Returns:
+        requests.Session: The session shared by every login of this process, so the
+            connections to the identity provider are kept open between logins.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = create_oidc_session()
+        return _session
 
 
 class OIDCBackend(OIDCAuthenticationBackend):
@@ -110,9 +165,28 @@ class OIDCBackend(OIDCAuthenticationBackend):
             headers["kid"] = settings.OIDC_CLIENT_ASSERTION_KID
         return jwt.encode(payload, private_key, algorithm=settings.OIDC_CLIENT_ASSERTION_ALG, headers=headers)
 
+    @property
+    def http(self) -> requests.Session:
+        return get_oidc_session()
+
+    def request_options(self) -> dict:
+        return {
+            "verify": self.get_settings("OIDC_VERIFY_SSL", True),
+            "timeout": self.get_settings("OIDC_TIMEOUT", 10),
+            "proxies": self.get_settings("OIDC_PROXY", None),
+        }
+
+    @timed("http")
     def get_token(self, payload):
         if settings.OIDC_TOKEN_AUTH_METHOD != "private_key_jwt":
-            return super().get_token(payload)
+            # As mozilla_django_oidc does, through the shared session
+            auth = None
+            if self.get_settings("OIDC_TOKEN_USE_BASIC_AUTH", False):
+                payload = dict(payload)
+                auth = HTTPBasicAuth(payload.get("client_id"), payload.pop("client_secret", None))
+            response = self.http.post(self.OIDC_OP_TOKEN_ENDPOINT, data=payload, auth=auth, **self.request_options())
+            self.raise_token_response_error(response)
+            return response.json()
 
         data = dict(payload)
         data["client_id"] = settings.OIDC_RP_CLIENT_ID
@@ -120,9 +194,8 @@ class OIDCBackend(OIDCAuthenticationBackend):
         data["client_assertion"] = self._get_client_assertion()
         headers = {
             "Content-Type": "application/x-www-form-urlencoded",
-            "User-Agent": settings.OIDC_USER_AGENT,
         }
-        response = requests.post(settings.OIDC_OP_TOKEN_ENDPOINT, data=data, headers=headers, timeout=10)
+        response = self.http.post(settings.OIDC_OP_TOKEN_ENDPOINT, data=data, headers=headers, **self.request_options())
         if getattr(settings, "OIDC_DEBUG_CLAIMS", False):
             self.logger.warning(
                 "OIDC token error: status=%s body=%s",
@@ -132,15 +205,60 @@ class OIDCBackend(OIDCAuthenticationBackend):
         response.raise_for_status()
         return response.json()
 
+    @timed("http")
     def get_userinfo(self, access_token, id_token, payload):
         headers = {
             "Authorization": f"Bearer {access_token}",
-            "User-Agent": settings.OIDC_USER_AGENT,
         }
-        response = requests.get(settings.OIDC_OP_USER_ENDPOINT, headers=headers, timeout=10)
+        response = self.http.get(settings.OIDC_OP_USER_ENDPOINT, headers=headers, **self.request_options())
         response.raise_for_status()
         return response.json()
 
+    @timed("http")
+    def get_jwks(self, refresh=False):
+        """
+        Get the signing keys of the identity provider, from the application cache when possible.
+
+        Args:
+            refresh (bool): Fetch the keys even when they are cached.
+
+        Returns:
+            dict: The JSON Web Key Set.
+        """
+        cache_key = f"oidc-jwks:{self.OIDC_OP_JWKS_ENDPOINT}"
+        timeout = settings.OIDC_JWKS_CACHE_TIMEOUT
+        jwks = None if refresh or not timeout else get_cache().get(cache_key)
+        if jwks is None:
+            response = self.http.get(self.OIDC_OP_JWKS_ENDPOINT, **self.request_options())
+            response.raise_for_status()
+            jwks = response.json()
+            if timeout:
+                get_cache().set(cache_key, jwks, timeout)
+        return jwks
+
+    def retrieve_matching_jwk(self, token):
+        """
+        Find the key that signed the token, as mozilla_django_oidc does, in the cached key set.
+        The keys are fetched again when none matches, in case the provider has rotated them.
+        """
+        header = Header.json_loads(JWS.from_compact(token).signature.protected)
+        key = self._find_jwk(self.get_jwks(), header)
+        if key is None and settings.OIDC_JWKS_CACHE_TIMEOUT:
+            key = self._find_jwk(self.get_jwks(refresh=True), header)
+        if key is None:
+            raise SuspiciousOperation("Could not find a valid JWKS.")
+        return key
+
+    def _find_jwk(self, jwks, header):
+        key = None
+        for jwk in jwks["keys"]:
+            if self.get_settings("OIDC_VERIFY_KID", True) and jwk["kid"] != smart_str(header.kid):
+                continue
+            if "alg" in jwk and jwk["alg"] != smart_str(header.alg):
+                continue
+            key = jwk
+        return key
+
     def create_user(self, claims):
         """
         Create a new local user based on OIDC claims.
@@ -165,7 +283,7 @@ class OIDCBackend(OIDCAuthenticationBackend):
             }
         """
         identifier = self._get_identifier(claims)
-        self.logger.info(mask_email(f"Create user for {identifier}"))
+        self.logger.info("Create user for %s", identifier)
         user = super().create_user(claims)
         if identifier and "@" in identifier:
             user.email = claims.get("email") or identifier
@@ -173,7 +291,7 @@ class OIDCBackend(OIDCAuthenticationBackend):
         user.first_name = claims.get("given_name", claims.get("name", ""))
         user.last_name = claims.get("family_name", "")
         user.save()
-        self.logger.info(mask_email(f"Created user {user.pk} {user.email}"))
+        self.logger.info("Created user %s %s", user.pk, user.email)
         return user
 
     def update_user(self, user, claims):
@@ -193,15 +311,22 @@ class OIDCBackend(OIDCAuthenticationBackend):
 
         Note:
             Falls back to existing user values if claims are missing or empty.
+            Only the changed fields are saved, and nothing when no claim changed.
         """
-        self.logger.info(mask_email(f"User  {user.id} {user.email} logged in to the system"))
+        self.logger.info("User  %s %s logged in to the system", user.id, user.email)
         identifier = self._get_identifier(claims)
+        values = {}
         if identifier and "@" in identifier:
-            user.email = claims.get("email") or identifier
-        user.username = identifier or user.username
-        user.first_name = claims.get("given_name", user.first_name) or claims.get("name", user.first_name)
-        user.last_name = claims.get("family_name", user.last_name)
-        user.save()
+            values["email"] = claims.get("email") or identifier
+        values["username"] = identifier or user.username
+        values["first_name"] = claims.get("given_name", user.first_name) or claims.get("name", user.first_name)
+        values["last_name"] = claims.get("family_name", user.last_name)
+        # Most logins change nothing, the user is only saved when a claim has changed
+        changed = [field for field, value in values.items() if getattr(user, field) != value]
+        if changed:
+            for field in changed:
+                setattr(user, field, values[field])
+            user.save(update_fields=changed)
         return user
 
 
@@ -242,6 +367,7 @@ class LoginRequiredMiddleware:
             "/public/",
             "/session-expired/",
             "/logout/",
+            "/internal/metrics/",
         ]
         login_url = getattr(settings, "LOGIN_URL", "")
         if login_url and login_url not in self.exempt_url_prefixes:
@@ -250,6 +376,9 @@ class LoginRequiredMiddleware:
             # index page
             "/"
         ]
+        # Resolved once, str.startswith checks all the prefixes in one call
+        self.exempt_url_prefix_tuple = tuple(self.exempt_url_prefixes)
+        self.verify_2fa_url = reverse("verify-2fa-token")
 
     def __call__(self, request):
         """
@@ -267,12 +396,12 @@ class LoginRequiredMiddleware:
                 a redirect to the authentication initialization endpoint.
         """
         if (
-            not any(request.path.startswith(url) for url in self.exempt_url_prefixes)
+            not request.path.startswith(self.exempt_url_prefix_tuple)
             and request.path not in self.exempt_exact_urls
         ):
             # you need to be authenticated to access any page outside the non secure list
             if not request.user.is_authenticated or request.user.is_anonymous:
-                if request.path == reverse("verify-2fa-token") and request.method == "POST":
+                if request.path == self.verify_2fa_url and request.method == "POST":
                     # The only possibility of this happening is that the session timing out
                     # while the user is trying to submit the 2FA token.
                     # So, reset the flow and get a new token
@@ -292,11 +421,10 @@ class LoginRequiredMiddleware:
                 if not request.user.is_staff:
                     # No varification support yet for the staff users
                     # Allow access to the verification page
-                    if request.path == reverse("verify-2fa-token"):
+                    if request.path == self.verify_2fa_url:
                         return self.get_response(request)
                     # Any other unverified user access to urls is redirected to the verification page
-                    verify_url = reverse("verify-2fa-token")
-                    return redirect(verify_url)
+                    return redirect(self.verify_2fa_url)
 
         self.logger.debug(
             "Allowing access to %s, authenticated %s is_staff %s",
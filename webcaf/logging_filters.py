@@ -1,6 +1,7 @@
 import logging
 
 from webcaf.middleware import log_context
+from webcaf.webcaf.utils import mask_email
 
 
 class RequestLogFilter(logging.Filter):
@@ -25,3 +26,26 @@ class RequestLogFilter(logging.Filter):
         record.user_id = user_id
         record.session_id = session_id
         return True
+
+
+class MaskEmailFilter(logging.Filter):
+    """
+    Masks the email addresses in log records, see ``mask_email``.
+
+    Attach it to handlers rather than loggers, so only the records that are written
+    pay for the substitution. The message and any exception text are rendered here,
+    once, and the masked text replaces them on the record.
+    """
+
+    def filter(self, record):
+        message = record.getMessage()
+        masked = mask_email(message)
+        if masked != message:
+            record.msg = masked
+            record.args = None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = mask_email(_exception_formatter.formatException(record.exc_info))
+        return True
+
+
+_exception_formatter = logging.Formatter()
@@ -0,0 +1,129 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+from webcaf.webcaf.utils import mask_email, mask_emails_in
+
+
+class _DrainingQueueListener(QueueListener):
+    def enqueue_sentinel(self):
+        # Wait for room, the records ahead of the sentinel are written before the thread stops
+        self.queue.put(self._sentinel)
+
+
+class BackgroundQueueHandler(QueueHandler):
+    """
+    Logging handler that puts records on an in-memory queue, so the request thread does not
+    wait for the log output. A ``QueueListener`` thread passes the records to the handlers
+    named in ``handlers``, which must be configured in the same ``LOGGING`` dict but not
+    attached to any logger.
+
+    The listener is started on the first record a process emits, so each worker started by
+    a forking server gets its own thread, and is stopped at exit after the queue is drained.
+    When the queue is full the record is dropped and counted rather than blocking the request.
+
+    Filters that read request state, such as ``RequestLogFilter``, must be attached to this
+    handler, as they run in the request thread before the record is queued.
+    """
+
+    def __init__(self, handlers: list[str], maxsize: int = 10000, respect_handler_level: bool = True):
+        super().__init__(queue.Queue(maxsize))
+        self.maxsize = maxsize
+        self.handler_names = handlers
+        self.respect_handler_level = respect_handler_level
+        self.listener: QueueListener | None = None
+        self.dropped = 0
+        self._pid: int | None = None
+        self._start_lock = threading.Lock()
+        atexit.register(self.stop)
+
+    def emit(self, record):
+        if self._pid != os.getpid():
+            self.start()
+        super().emit(record)
+
+    def start(self):
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            # A forked child inherits the parent's queue but not its listener thread
+            self.queue = queue.Queue(self.maxsize)
+            self.dropped = 0
+            handlers = [logging.getHandlerByName(name) for name in self.handler_names]
+            self.listener = _DrainingQueueListener(
+                self.queue, *filter(None, handlers), respect_handler_level=self.respect_handler_level
+            )
+            self.listener.start()
+            self._pid = os.getpid()
+
+    def stop(self):
+        """
+        Write out the queued records and stop the listener thread.
+        """
+        with self._start_lock:
+            if self.listener is not None and self._pid == os.getpid():
+                self.listener.stop()
+            self.listener = None
+            self._pid = None
+
+    def close(self):
+        self.stop()
+        super().close()
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def prepare(self, record):
+        # Unlike QueueHandler.prepare this does not format the record with this handler's
+        # formatter, as the target handlers do that. The message and exception are rendered
+        # now, since the arguments and traceback may not be safe to use from another thread.
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+# Attributes every record has, anything else was passed in ``extra``
+_RECORD_ATTRIBUTES = frozenset(logging.makeLogRecord({}).__dict__) | {"message", "asctime", "user_id", "session_id"}
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats log records as one JSON object per line, with the user and session IDs added by
+    ``RequestLogFilter`` and any fields passed in ``extra``. ``MaskEmailFilter`` only masks the
+    message and exception, so the email addresses in the ``extra`` fields are masked here.
+    """
+
+    def format(self, record):
+        entry = {
+            "timestamp": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "user_id": getattr(record, "user_id", "-"),
+            "session_id": getattr(record, "session_id", "-"),
+            "process": record.process,
+            "thread": record.threadName,
+        }
+        entry.update(
+            (key, mask_emails_in(value)) for key, value in record.__dict__.items() if key not in _RECORD_ATTRIBUTES
+        )
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = self.formatStack(record.stack_info)
+        return json.dumps(entry, default=lambda value: mask_email(str(value)))
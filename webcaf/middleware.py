@@ -1,6 +1,13 @@
 import contextvars
 import hashlib
 import hmac
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotFound
+
+from webcaf.webcaf import cache
 
 log_context: contextvars.ContextVar = contextvars.ContextVar("log_context", default={})
 
@@ -29,6 +36,8 @@ class RequestLoggingMiddleware:
             "session_id": self.hash_session_key(session.session_key if session and session.session_key else "-"),
         }
 
+        # Kept on the request for the middleware that logs after this one has returned
+        request.log_context = context_data
         # Set context and keep token for safe reset
         token = log_context.set(context_data)
         try:
@@ -54,9 +63,93 @@ class RequestLoggingMiddleware:
         :rtype: str
         """
         if session_key and session_key != "-":
-            from django.conf import settings
-
-            return hmac.new(settings.SECRET_KEY.encode(), session_key.encode(), hashlib.sha256).hexdigest()[
-                :8
-            ]  # truncate for readability
+            return _hash_session_key(settings.SECRET_KEY, session_key)
         return session_key
+
+
+@lru_cache(maxsize=1024)
+def _hash_session_key(secret_key: str, session_key: str) -> str:
+    # A session makes many requests, hash its key once
+    return hmac.new(secret_key.encode(), session_key.encode(), hashlib.sha256).hexdigest()[
+        :8
+    ]  # truncate for readability
+
+
+class FastPathMiddleware:
+    """
+    Answers health checks, missing static files and public pages before the session and
+    authentication middleware run.
+
+    The path is classified once with a regular expression compiled at startup:
+
+    - ``FAST_PATH_HEALTH_URL`` returns "OK" without touching the database.
+    - ``FAST_PATH_STATIC_PREFIXES``: files that exist are served by WhiteNoise before this
+      middleware, anything else under these prefixes is not found.
+    - ``FAST_PATH_PUBLIC_PREFIXES``: GET requests without a session cookie are served from
+      the application cache. A miss goes through the full stack, and the response is
+      cached when it is a plain 200 that sets no cookies. The CSP nonce of the response is
+      replaced with the nonce of each request served from the cache.
+
+    Must come after ``CSPMiddleware`` and ``WhiteNoiseMiddleware``, and before ``SessionMiddleware``.
+    """
+
+    NONCE_PLACEHOLDER = "__csp_nonce__"
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        patterns = [f"(?P<health>{re.escape(settings.FAST_PATH_HEALTH_URL)}$)"]
+        for name, prefixes in [
+            ("static", settings.FAST_PATH_STATIC_PREFIXES),
+            ("public", settings.FAST_PATH_PUBLIC_PREFIXES),
+        ]:
+            if prefixes:
+                patterns.append(f"(?P<{name}>{'|'.join(map(re.escape, prefixes))})")
+        self.path_classes = re.compile("|".join(patterns))
+
+    def __call__(self, request):
+        match = self.path_classes.match(request.path_info)
+        if match is None:
+            return self.get_response(request)
+        if match.lastgroup == "health":
+            return HttpResponse("OK", content_type="text/plain")
+        if match.lastgroup == "static":
+            return HttpResponseNotFound()
+        if request.method not in ("GET", "HEAD") or request.GET or settings.SESSION_COOKIE_NAME in request.COOKIES:
+            return self.get_response(request)
+
+        cached = cache.get_value("public_page", version=request.path_info)
+        if cached is not None:
+            return self.from_cache(request, cached)
+        response = self.get_response(request)
+        if request.method == "GET" and self.is_cacheable(response):
+            cache.set_value(
+                "public_page",
+                self.to_cache(request, response),
+                version=request.path_info,
+                timeout=settings.PUBLIC_PAGE_CACHE_TIMEOUT,
+            )
+        return response
+
+    @staticmethod
+    def is_cacheable(response) -> bool:
+        cache_control = response.get("Cache-Control", "")
+        return (
+            response.status_code == 200
+            and not response.streaming
+            and not response.cookies
+            and not any(directive in cache_control for directive in ("private", "no-cache", "no-store"))
+        )
+
+    def to_cache(self, request, response) -> dict:
+        content = response.content.decode(response.charset)
+        nonce = getattr(request, "_csp_nonce", None)
+        if isinstance(nonce, str):
+            content = content.replace(nonce, self.NONCE_PLACEHOLDER)
+        headers = {name: value for name, value in response.headers.items() if name.lower() != "content-length"}
+        return {"content": content, "headers": headers}
+
+    def from_cache(self, request, cached: dict) -> HttpResponse:
+        content = cached["content"]
+        if self.NONCE_PLACEHOLDER in content:
+            content = content.replace(self.NONCE_PLACEHOLDER, str(request.csp_nonce))
+        return HttpResponse(content, headers=cached["headers"])
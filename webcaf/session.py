@@ -8,7 +8,11 @@ redirected to an "expire-session" URL, effectively logging them out.
 
 Key behaviors:
 - Only applies to users who pass the `is_verified()` check.
-- Resets the `last_activity` timestamp in the session on each request.
+- Moves the `last_activity` timestamp in the session forward once it is more than
+  `SESSION_ACTIVITY_GRANULARITY` seconds old. Requests in between do not modify
+  the session, so it is not written back to the database. The stored time can be
+  up to the granularity behind the last request, so a session can time out that
+  much early, never late.
 - Excludes the session expiration URL (`session-expired`) and the logout
   URL (`expire-session`) from the timeout logic to prevent redirect loops.
 - Includes a special case for the root path (`/`): if a user times out
@@ -44,6 +48,7 @@ class CafSessionTimeoutMiddleware:
             get_response: The next middleware or view in the Django chain.
         """
         self.get_response = get_response
+        self.session_expired_url = reverse("session-expired")
 
     def __call__(self, request):
         """
@@ -57,10 +62,8 @@ class CafSessionTimeoutMiddleware:
         """
         # Check if the user is authenticated and verified
         if request.user.is_authenticated:
-            session_expired_url = reverse("session-expired")
-
             # Avoid processing timeout logic on the expiry/logout pages
-            if request.path not in [session_expired_url]:
+            if request.path != self.session_expired_url:
                 last_activity = request.session.get("last_activity")
                 timeout_seconds = settings.USER_IDLE_TIMEOUT
 
@@ -81,10 +84,13 @@ class CafSessionTimeoutMiddleware:
                         logger.info("User %s timed out. Redirecting to expire-session.", user_id)
                         return redirect("session-expired")
 
-                # Update the last activity time for the current request
-                # Use debug level for this as it's frequent
-                logger.debug("Updating last_activity for user %s.", request.user.pk)
-                request.session["last_activity"] = time.time()
+                # Update the last activity time once the stored one is older than the granularity,
+                # only then is the session modified and saved.
+                now = time.time()
+                if not last_activity or now - last_activity >= settings.SESSION_ACTIVITY_GRANULARITY:
+                    # Use debug level for this as it's frequent
+                    logger.debug("Updating last_activity for user %s.", request.user.pk)
+                    request.session["last_activity"] = now
 
         # Continue processing the request
         response = self.get_response(request)
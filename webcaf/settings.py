@@ -10,7 +10,9 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import copy
 import os
+import tempfile
 from pathlib import Path
 
 from csp.constants import NONCE, SELF
@@ -57,6 +59,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "govuk_frontend_django",
     "webcaf.webcaf.apps.WebcafConfig",
     "csp",
@@ -71,7 +74,10 @@ MIDDLEWARE = [
     "csp.middleware.CSPMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
+    "webcaf.middleware.FastPathMiddleware",
+    "webcaf.webcaf.utils.timing.ServerTimingMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
+    "webcaf.webcaf.utils.replica.ReplicaStickinessMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
@@ -83,13 +89,16 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "webcaf.auth.LoginRequiredMiddleware",
     "simple_history.middleware.HistoryRequestMiddleware",
+    "webcaf.webcaf.utils.timing.ViewTimingMiddleware",
 ]
 
 ROOT_URLCONF = "webcaf.urls"
 
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        # Adds the render time to the request timings
+        "BACKEND": "webcaf.webcaf.utils.timing.TimedDjangoTemplates",
+        "NAME": "django",
         "DIRS": [os.path.join(BASE_DIR, "webcaf", "templates"), os.path.join(BASE_DIR, "webcaf", "templates", "caf")],
         "APP_DIRS": True,
         "OPTIONS": {
@@ -128,6 +137,56 @@ else:
         "default": env.db_url(default="postgresql:///webcaf"),  # type: ignore
     }
 
+# Server side timeouts, so a runaway query or an abandoned transaction cannot hold a connection forever.
+# The web services set them. Management commands, such as migrate and the bulk imports, archiving and data
+# generation, run transactions that can rightly take longer, so the timeouts are off unless set. 0 turns one off.
+DB_STATEMENT_TIMEOUT_MS = env.int("DB_STATEMENT_TIMEOUT_MS", default=0)
+DB_IDLE_IN_TRANSACTION_TIMEOUT_MS = env.int("DB_IDLE_IN_TRANSACTION_TIMEOUT_MS", default=0)
+DATABASES["default"].setdefault("OPTIONS", {})["options"] = (
+    f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS} "
+    f"-c idle_in_transaction_session_timeout={DB_IDLE_IN_TRANSACTION_TIMEOUT_MS}"
+)
+DATABASES["default"]["CONN_HEALTH_CHECKS"] = True
+# Connection pool, the sizes apply to each gunicorn worker process
+if env.bool("DB_POOL_ENABLED", default=True):
+    DATABASES["default"]["OPTIONS"]["pool"] = {
+        "min_size": env.int("DB_POOL_MIN_SIZE", default=1),
+        "max_size": env.int("DB_POOL_MAX_SIZE", default=4),
+        # Seconds a request waits for a free connection before failing
+        "timeout": env.float("DB_POOL_TIMEOUT", default=10.0),
+        # Seconds before an idle connection above min_size is closed
+        "max_idle": env.float("DB_POOL_MAX_IDLE", default=300.0),
+        "max_lifetime": env.float("DB_POOL_MAX_LIFETIME", default=3600.0),
+    }
+
+# Read replica used by the read-only pages, see webcaf/webcaf/utils/replica.py.
+# Locally, a second connection to the primary database can stand in for it.
+if "DATABASE_REPLICA_URL" in os.environ:
+    DATABASES["replica"] = {
+        **env.db_url("DATABASE_REPLICA_URL"),
+        "OPTIONS": copy.deepcopy(DATABASES["default"]["OPTIONS"]),
+        "CONN_HEALTH_CHECKS": True,
+        "TEST": {"MIRROR": "default"},
+    }
+DATABASE_REPLICA_ALIAS = "replica" if "replica" in DATABASES else None
+DATABASE_ROUTERS = ["webcaf.webcaf.utils.replica.ReplicaRouter"]
+# Seconds a session keeps reading from the primary after it writes, so it always sees its own changes
+REPLICA_STICKY_SECONDS = env.int("REPLICA_STICKY_SECONDS", default=15)
+
+# Application cache, see webcaf/webcaf/cache.py. Local memory is private to each worker process,
+# set CACHE_URL to a redis:// URL (requires the redis package) to share one cache between workers.
+CACHES = {
+    "default": {
+        **env.cache_url("CACHE_URL", default="locmemcache://webcaf"),
+        "TIMEOUT": env.int("CACHE_TIMEOUT", default=300),
+        "KEY_PREFIX": "webcaf",
+    }
+}
+APP_CACHE_ALIAS = "default"
+
+# Token required to read the per-worker metrics at /internal/metrics/, the endpoint is disabled when empty
+METRICS_TOKEN = env.str("METRICS_TOKEN", default="")
+
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/4.2/howto/static-files/
 STATICFILES_DIRS = [
@@ -145,6 +204,13 @@ if not DEBUG:
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 MEDIA_URL = "/media/"
 
+# Paths answered by FastPathMiddleware before the session and authentication middleware
+FAST_PATH_HEALTH_URL = "/health/"
+FAST_PATH_STATIC_PREFIXES = [STATIC_URL, MEDIA_URL]
+FAST_PATH_PUBLIC_PREFIXES = ["/public/"]
+# Seconds a public page is served from the cache to visitors without a session
+PUBLIC_PAGE_CACHE_TIMEOUT = env.int("PUBLIC_PAGE_CACHE_TIMEOUT", default=300)
+
 # Content Security Policy: only allow images, stylesheets and scripts from the
 # same origin as the HTML
 CONTENT_SECURITY_POLICY = {
@@ -218,6 +284,15 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 FRAMEWORK_PATH = os.path.join(BASE_DIR, "..", "frameworks", "cyber-assessment-framework-v3.2.yaml")
 
+# Requests slower than this are written with their query fingerprints to SLOW_REQUEST_LOG_FILE, 0 disables it
+SLOW_REQUEST_THRESHOLD_MS = env.int("SLOW_REQUEST_THRESHOLD_MS", default=1000)
+SLOW_REQUEST_LOG_FILE = env.str(
+    "SLOW_REQUEST_LOG_FILE", default=os.path.join(tempfile.gettempdir(), "webcaf-slow-requests.log")
+)
+
+# "verbose" for plain text lines or "json" for one JSON object per line
+LOG_FORMAT = env.str("LOG_FORMAT", default="verbose" if DEBUG else "json")
+
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,
@@ -228,27 +303,65 @@ LOGGING = {
         "request_context": {
             "()": "webcaf.logging_filters.RequestLogFilter",
         },
+        "mask_email": {
+            "()": "webcaf.logging_filters.MaskEmailFilter",
+        },
     },
     "formatters": {
         "verbose": {
             "format": "[%(asctime)s] [%(process)d:%(threadName)s] [user=%(user_id)s sess=%(session_id)s] [%(levelname)s] [%(name)s] %(message)s",
             "datefmt": "%Y-%m-%d %H:%M:%S %z",
         },
+        "json": {
+            "()": "webcaf.logging_handlers.JsonFormatter",
+        },
+        "message": {
+            "format": "%(message)s",
+        },
     },
     "handlers": {
+        # Written to by the background handler's thread, not attached to a logger
         "console": {
             "level": ("INFO" if not DEBUG else "DEBUG"),
             "class": "logging.StreamHandler",
-            "formatter": "verbose",
-            "filters": ["request_context"],
+            "formatter": LOG_FORMAT,
+        },
+        # The filters run in the request thread, the request context is not available in the listener's
+        "background": {
+            "()": "webcaf.logging_handlers.BackgroundQueueHandler",
+            "handlers": ["console"],
+            "maxsize": env.int("LOG_QUEUE_SIZE", default=10000),
+            "filters": ["request_context", "mask_email"],
+        },
+        "slow_requests_file": {
+            "class": "logging.handlers.RotatingFileHandler",
+            "filename": SLOW_REQUEST_LOG_FILE,
+            "maxBytes": 10 * 1024 * 1024,
+            "backupCount": 5,
+            "delay": True,
+            "formatter": "message",
+        },
+        "slow_requests": {
+            "()": "webcaf.logging_handlers.BackgroundQueueHandler",
+            "handlers": ["slow_requests_file"],
+            "filters": ["mask_email"],
         },
     },
     "loggers": {
         "": {
             "level": ("INFO" if not DEBUG else "DEBUG"),
-            "handlers": ["console"],
+            "handlers": ["background"],
             "propagate": True,
         },
+        # One line with the timings of every request
+        "webcaf.timing": {
+            "level": env.str("REQUEST_TIMING_LOG_LEVEL", default="INFO"),
+        },
+        "webcaf.slow_requests": {
+            "level": "WARNING",
+            "handlers": ["slow_requests"],
+            "propagate": False,
+        },
     },
 }
 
@@ -315,6 +428,25 @@ else:
 # System will not send a confirmation email if this is not set
 NOTIFY_CONFIRMATION_TEMPLATE_ID = env.str("NOTIFY_CONFIRMATION_TEMPLATE_ID", "")
 
+# GOV.UK Notify emails are queued in the database. By default they are sent by the request that queued
+# them, once its transaction commits. Enable the worker only where the send_notify_emails command runs,
+# as docker-compose does, otherwise the emails are never sent.
+NOTIFY_WORKER_ENABLED = env.bool("NOTIFY_WORKER_ENABLED", default=False)
+NOTIFY_BASE_URL = env.str("NOTIFY_BASE_URL", "https://api.notifications.service.gov.uk")
+NOTIFY_TIMEOUT = env.float("NOTIFY_TIMEOUT", default=10.0)
+# Failed sends are retried after NOTIFY_RETRY_DELAY seconds, doubled for every attempt up to
+# NOTIFY_RETRY_MAX_DELAY, and marked as failed after NOTIFY_MAX_ATTEMPTS attempts
+NOTIFY_MAX_ATTEMPTS = env.int("NOTIFY_MAX_ATTEMPTS", default=8)
+NOTIFY_RETRY_DELAY = env.float("NOTIFY_RETRY_DELAY", default=30.0)
+NOTIFY_RETRY_MAX_DELAY = env.float("NOTIFY_RETRY_MAX_DELAY", default=3600.0)
+# Sent emails are deleted by cleanup_expired_data after this many days
+NOTIFY_SENT_RETENTION_DAYS = env.int("NOTIFY_SENT_RETENTION_DAYS", default=7)
+
+# A user is sent at most OTP_SEND_LIMIT one-time codes in OTP_SEND_WINDOW seconds. The count is kept
+# in the application cache, set CACHE_URL to share it between workers.
+OTP_SEND_LIMIT = env.int("OTP_SEND_LIMIT", default=5)
+OTP_SEND_WINDOW = env.int("OTP_SEND_WINDOW", default=900)
+
 OIDC_RP_SCOPES = env.str("OIDC_RP_SCOPES", "openid email profile")
 OIDC_RP_SIGN_ALGO = env.str("OIDC_RP_SIGN_ALGO", "RS256")
 OIDC_TOKEN_AUTH_METHOD = env.str("OIDC_TOKEN_AUTH_METHOD", "client_secret_basic")
@@ -324,6 +456,13 @@ OIDC_CLIENT_ASSERTION_ALG = env.str("OIDC_CLIENT_ASSERTION_ALG", default="RS256"
 OIDC_USER_AGENT = env.str("OIDC_USER_AGENT", default="webcaf/1.0")
 OIDC_RELAX_CLAIMS = env.bool("OIDC_RELAX_CLAIMS", default=False)
 OIDC_DEBUG_CLAIMS = env.bool("OIDC_DEBUG_CLAIMS", default=False)
+# The logins of a worker share one HTTP session, so the connections to the identity provider are reused.
+# Failed connections, and GET requests answered with a 502, 503 or 504, are retried OIDC_HTTP_RETRIES times.
+OIDC_TIMEOUT = env.float("OIDC_TIMEOUT", default=10.0)
+OIDC_HTTP_RETRIES = env.int("OIDC_HTTP_RETRIES", default=2)
+OIDC_HTTP_POOL_SIZE = env.int("OIDC_HTTP_POOL_SIZE", default=10)
+# Seconds the identity provider's signing keys are kept in the application cache, 0 to fetch them on every login
+OIDC_JWKS_CACHE_TIMEOUT = env.int("OIDC_JWKS_CACHE_TIMEOUT", default=3600)
 if DEBUG:
     OIDC_VERIFY_SSL = False
 
@@ -351,6 +490,8 @@ if SENTRY_DSN:
     import sentry_sdk
     from sentry_sdk.types import SamplingContext
 
+    from webcaf.webcaf.utils.email import mask_sentry_event
+
     def traces_sampler(sampling_context: SamplingContext) -> float:
         """
         Sets up custom sampling rate for specific scenarios.
@@ -372,9 +513,28 @@ if SENTRY_DSN:
         dsn=SENTRY_DSN,
         environment=ENVIRONMENT,
         traces_sampler=traces_sampler,
+        before_send=mask_sentry_event,
+        before_breadcrumb=mask_sentry_event,
     )
 
 # sets session timeout at 90 minutes
 USER_IDLE_TIMEOUT = 90 * 60
-SESSION_SAVE_EVERY_REQUEST = True
+# Seconds between writes of the last activity time, the session is only saved when it has changed
+SESSION_ACTIVITY_GRANULARITY = env.int("SESSION_ACTIVITY_GRANULARITY", default=60)
+SESSION_SAVE_EVERY_REQUEST = False
 SESSION_EXPIRE_AT_BROWSER_CLOSE = True
+
+# Number of assessment history records stored as patches before a full copy is stored again
+HISTORY_CHECKPOINT_INTERVAL = env.int("HISTORY_CHECKPOINT_INTERVAL", default=20)
+
+# Seconds a worker uses its cached default configuration before checking whether a configuration has changed,
+# so a change made in another worker is seen within this time. 0 checks on every call.
+CONFIGURATION_VERSION_CHECK_INTERVAL = env.int("CONFIGURATION_VERSION_CHECK_INTERVAL", default=5)
+
+# Organisation CSV imports with more rows than this are queued and run by the process_organisation_imports command
+ORGANISATION_IMPORT_INLINE_ROWS = env.int("ORGANISATION_IMPORT_INLINE_ROWS", default=200)
+# Seconds after which an import still running is taken by another worker, as the worker running it has stopped
+ORGANISATION_IMPORT_TIMEOUT = env.int("ORGANISATION_IMPORT_TIMEOUT", default=3600)
+
+# Admin change lists of tables with more rows than this show the planner's estimate of the rows when not filtered
+ADMIN_ESTIMATED_COUNT_THRESHOLD = env.int("ADMIN_ESTIMATED_COUNT_THRESHOLD", default=10000)
@@ -38,6 +38,7 @@ from webcaf.webcaf.views import (
     ViewSubmittedAssessmentsView,
 )
 from webcaf.webcaf.views.general import logout_view
+from webcaf.webcaf.views.metrics import metrics
 from webcaf.webcaf.views.sections import (
     DownloadSubmittedAssessmentPdf,
     SectionConfirmationView,
@@ -135,4 +136,6 @@ urlpatterns = [
     path("", Index.as_view(), name="index"),
     path("session-expired/", session_expired, name="session-expired"),
     path("verify-2fa-token/", Verify2FATokenView.as_view(), name="verify-2fa-token"),
+    # Internal endpoints, protected by a token instead of a login
+    path("internal/metrics/", metrics, name="internal-metrics"),
 ]
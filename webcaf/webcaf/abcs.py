@@ -12,8 +12,12 @@ class FrameworkRouter(ABC):
     organisations or only those associated with systems. This is done by creating a class for each view and form
     element in the CAF then updating Django's url patterns with paths to the views. Each form is provided the
     success_url for the next page in the route.
+
+    ``version`` identifies the content of the framework, cached values derived from it are scoped by it.
     """
 
+    version: str = ""
+
     @abstractmethod
     def get_sections(self) -> list[dict]:
         pass
@@ -1,28 +1,41 @@
 import csv
 import logging
-from datetime import datetime
-from io import BytesIO, StringIO, TextIOWrapper
+from io import BytesIO, StringIO
 from typing import Any, Optional
 
 from django import forms
+from django.conf import settings
 from django.contrib import admin, messages
-from django.contrib.auth.models import User
 from django.core.validators import RegexValidator
-from django.db.models import Model, Q
+from django.db.models import Model, Q, QuerySet
 from django.forms import CharField, DateTimeInput, ModelForm
 from django.forms.fields import ChoiceField
 from django.http import HttpRequest, HttpResponse
 from django.shortcuts import redirect, render
 from django.urls import path
+from django.utils import timezone
 from simple_history.admin import SimpleHistoryAdmin
 
 from webcaf.webcaf.models import (
+    ArchivedAssessment,
     Assessment,
     Configuration,
+    NotifyEmail,
     Organisation,
+    OrganisationImport,
     System,
     UserProfile,
 )
+from webcaf.webcaf.notification import send_due_emails
+from webcaf.webcaf.organisation_import import (
+    CSV_HEADERS,
+    ImportFileError,
+    OrganisationImporter,
+    queue_import,
+    read_csv,
+)
+from webcaf.webcaf.utils.changelist import AutocompleteFilter, LargeChangelistMixin
+from webcaf.webcaf.utils.replica import ReadOnlyChangelistMixin
 from webcaf.webcaf.views.system import SystemForm
 
 admin.site.site_header = "POC for MHCLG"
@@ -43,35 +56,51 @@ class OptionalFieldsAdminMixin:
         return form
 
 
+class ReferenceSearchAdminMixin:
+    """
+    Admin mixin for models with generated references. A search term that is the reference of
+    a row finds it by its primary key, other terms are searched in the search fields.
+    """
+
+    def get_search_results(self, request: HttpRequest, queryset: QuerySet, search_term: str):
+        try:
+            self.model.ids_for_reference(search_term)  # type: ignore
+        except ValueError:
+            pass
+        else:
+            matches = queryset.by_reference(search_term)
+            if matches.exists():
+                return matches, False
+        return super().get_search_results(request, queryset, search_term)  # type: ignore
+
+
 @admin.register(UserProfile)
-class UserProfileAdmin(SimpleHistoryAdmin):
+class UserProfileAdmin(ReadOnlyChangelistMixin, LargeChangelistMixin, SimpleHistoryAdmin):
     model = UserProfile
-    search_fields = ["organisation__name", "user__email"]
+    search_fields = ["^organisation__name", "^user__email"]
     list_display = ["user__email", "organisation__name", "role"]
-    list_filter = ["role", "user__email", "organisation__name"]
+    list_select_related = ["user", "organisation"]
+    list_filter = ["role", ("user", AutocompleteFilter), ("organisation", AutocompleteFilter)]
+    autocomplete_fields = ["user", "organisation"]
 
 
 @admin.register(Organisation)
-class OrganisationAdmin(OptionalFieldsAdminMixin, SimpleHistoryAdmin):  # type: ignore
+class OrganisationAdmin(  # type: ignore
+    ReadOnlyChangelistMixin,
+    LargeChangelistMixin,
+    ReferenceSearchAdminMixin,
+    OptionalFieldsAdminMixin,
+    SimpleHistoryAdmin,
+):
     model = Organisation
-    search_fields = ["name", "systems__name", "reference"]
+    search_fields = ["^name", "^systems__name", "=reference"]
     list_display = ["name", "reference"]
+    autocomplete_fields = ["parent_organisation"]
     readonly_fields = ["reference"]
     optional_fields = ["reference"]
 
     logger = logging.getLogger("OrganisationAdmin")
-    csv_headers = [
-        "Organisation",
-        "Lead Government Department",
-        "Reference",
-        "Type",
-        "Email1",
-        "Email2",
-        "Email3",
-        "Email4",
-        "Email5",
-        "Email6",
-    ]
+    csv_headers = CSV_HEADERS
 
     # Add custom URL for the import view
     def get_urls(self):
@@ -117,9 +146,9 @@ class OrganisationAdmin(OptionalFieldsAdminMixin, SimpleHistoryAdmin):  # type:
         The header row is expected to contain the fields defined in `csv_headers`:
         Each email field represents a cyber advisor for a particular organisation.
 
-        This method expects a CSV file containing organisation and user information. It reads and processes
-        this file to create the necessary records in the database while maintaining proper associations between
-        users, organisations, and their parent organisations.
+        Files of up to ``ORGANISATION_IMPORT_INLINE_ROWS`` rows are imported during the request, see
+        ``OrganisationImporter``. Larger files are queued as an ``OrganisationImport`` and the user is
+        redirected to its admin page, which shows the progress of the import.
 
         :param request: The HTTP request object that includes the CSV file to be processed.
         :type request: HttpRequest
@@ -129,78 +158,26 @@ class OrganisationAdmin(OptionalFieldsAdminMixin, SimpleHistoryAdmin):  # type:
         """
         if request.method == "POST":
             csv_file = request.FILES["csv_file"]
-            decoded = TextIOWrapper(csv_file.file, encoding="utf-8")
-            reader = csv.DictReader(decoded)
+            content = csv_file.read().decode("utf-8")
+            try:
+                rows = read_csv(content)
+            except ImportFileError as error:
+                self.message_user(request, str(error), messages.ERROR)
+                return redirect("..")
 
-            # Check headers
-            headers = reader.fieldnames
-            if set(headers) != set(self.csv_headers):
+            # Large files are imported by the process_organisation_imports command, so the request does not time out
+            if len(rows) > settings.ORGANISATION_IMPORT_INLINE_ROWS:
+                job = queue_import(csv_file.name, content, len(rows), request.user)
                 self.message_user(
-                    request, f"The CSV file is missing required headers {self.csv_headers}.", messages.ERROR
+                    request,
+                    f"{len(rows)} Organisations queued for import. This page shows the progress of the import.",
+                    messages.SUCCESS,
                 )
-                return redirect("..")
+                return redirect("admin:webcaf_organisationimport_change", job.pk)
 
-            count = 0
-            # Import the organisations
-            for row in reader:
-                count += 1
-                organisation = self.find_organisation(row)
-
-                # If still not found, then create a new organisation
-                if not organisation:
-                    self.logger.info(
-                        f"Creating {row['Organisation']} as not found in the database"
-                        f"reference: {row['Reference']}"
-                        f"name: {row['Organisation']}."
-                    )
-                    self.message_user(
-                        request, f"Creating {row['Organisation']} as not found in the database", messages.WARNING
-                    )
-                    organisation_type = row.get("Type", "").strip()
-                    if org_type_id := Organisation.get_type_id(organisation_type):
-                        organisation = Organisation.objects.create(
-                            name=row["Organisation"], organisation_type=org_type_id
-                        )
-                    else:
-                        organisation = Organisation.objects.create(name=row["Organisation"])
-
-                for email in ["Email1", "Email2", "Email3", "Email4", "Email5", "Email6"]:
-                    email_ = row.get(email, "").strip()
-                    if email_:
-                        user = User.objects.filter(email=email_).first()
-                        if not user:
-                            self.logger.info(f"Creating {email_} as not found in the database.")
-                            self.message_user(
-                                request, f"Creating {email_} as not found in the database.", messages.WARNING
-                            )
-                            # If not found, create a new user
-                            user = User.objects.create_user(email_, email_)
-                        profile, _created = UserProfile.objects.get_or_create(
-                            user=user, organisation=organisation, role="cyber_advisor"
-                        )
-
-                        if not _created:
-                            msg = f"The user with email {email_} already exists in the database for the organisation {organisation}."
-                            self.logger.warning(msg)
-                            self.logger.info(msg)
-
-            # Now set the parent organisation
-            # Reset the reader
-            decoded.seek(0)
-            reader = csv.DictReader(decoded)
-            for row in reader:
-                parent_organisation = Organisation.objects.filter(Q(name=row["Lead Government Department"])).first()
-                if parent_organisation:
-                    organisation = self.find_organisation(row)
-                    if organisation != parent_organisation:
-                        # No parent if this is the parent organisation
-                        organisation.parent_organisation = parent_organisation
-                        organisation.save()
-                    else:
-                        organisation.parent_organisation = None
-                        organisation.save()
-
-            self.message_user(request, f"✅ Imported {count} Organisations.", messages.SUCCESS)
+            summary = OrganisationImporter(rows).run()
+            self.message_user(request, f"✅ Imported {summary.rows} Organisations.", messages.SUCCESS)
+            self.message_user(request, summary.message(), messages.INFO)
             return redirect("..")
 
         opts = self.model._meta
@@ -228,7 +205,7 @@ class OrganisationAdmin(OptionalFieldsAdminMixin, SimpleHistoryAdmin):  # type:
         organisation: Organisation | None = None
         # first try to get the organisation by reference
         if row["Reference"]:
-            organisation = Organisation.objects.filter(Q(reference=row["Reference"])).first()
+            organisation = Organisation.objects.by_reference(row["Reference"]).first()
 
         # If fails try to get the organisation by name
         if not organisation and row["Organisation"]:
@@ -273,10 +250,18 @@ class AdminSystemForm(SystemForm):
 
 
 @admin.register(System)
-class SystemAdmin(OptionalFieldsAdminMixin, SimpleHistoryAdmin):  # type: ignore
+class SystemAdmin(  # type: ignore
+    ReadOnlyChangelistMixin,
+    LargeChangelistMixin,
+    ReferenceSearchAdminMixin,
+    OptionalFieldsAdminMixin,
+    SimpleHistoryAdmin,
+):
     form = AdminSystemForm
-    search_fields = ["name", "reference"]
+    search_fields = ["^name", "^organisation__name", "=reference"]
     list_display = ["name", "reference", "organisation__name", "system_type", "description"]
+    list_select_related = ["organisation"]
+    autocomplete_fields = ["organisation"]
     readonly_fields = ["reference"]
     optional_fields = ["reference"]
 
@@ -285,15 +270,114 @@ class SystemAdmin(OptionalFieldsAdminMixin, SimpleHistoryAdmin):  # type: ignore
 
 
 @admin.register(Assessment)
-class AssessmentAdmin(OptionalFieldsAdminMixin, SimpleHistoryAdmin):  # type: ignore
+class AssessmentAdmin(  # type: ignore
+    ReadOnlyChangelistMixin,
+    LargeChangelistMixin,
+    ReferenceSearchAdminMixin,
+    OptionalFieldsAdminMixin,
+    SimpleHistoryAdmin,
+):
     model = Assessment
-    search_fields = ["status", "system__name", "reference"]
+    search_fields = ["=status", "^system__name", "^system__organisation__name", "=reference"]
     list_display = ["status", "reference", "system__name", "system__organisation__name", "created_on", "last_updated"]
-    list_filter = ["status", "system__organisation"]
+    list_select_related = ["system__organisation"]
+    list_filter = ["status", ("system__organisation", AutocompleteFilter)]
+    changelist_defer = ["assessments_data"]
+    autocomplete_fields = ["system", "created_by", "last_updated_by", "first_submitted_by"]
     ordering = ["-created_on"]
     readonly_fields = ["reference"]
     optional_fields = ["reference"]
 
+    def set_history_delta_changes(self, request, historical_records, foreign_keys_are_objs=True):
+        # The answers of the page are rebuilt together, rather than once for every record diffed
+        records = list(historical_records)
+        self.model.history.model.load_delta_field_data(records)
+        super().set_history_delta_changes(request, records, foreign_keys_are_objs)
+
+
+@admin.register(ArchivedAssessment)
+class ArchivedAssessmentAdmin(ReadOnlyChangelistMixin, admin.ModelAdmin):
+    """
+    Read only view of the archived assessments, use the archive_assessment_period
+    command to archive or restore a period.
+    """
+
+    model = ArchivedAssessment
+    search_fields = ["system__name", "reference"]
+    list_display = ["reference", "assessment_period", "status", "system__name", "archived_on"]
+    list_filter = ["assessment_period", "status"]
+    ordering = ["-archived_on"]
+    exclude = ["records"]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(NotifyEmail)
+class NotifyEmailAdmin(ReadOnlyChangelistMixin, admin.ModelAdmin):
+    """
+    Read only view of the GOV.UK Notify outbox, to find the emails that failed and queue
+    them again once the problem is fixed.
+    """
+
+    model = NotifyEmail
+    list_display = ["id", "template_id", "status", "attempts", "created_on", "next_attempt_at", "sent_at"]
+    list_filter = ["status", "template_id"]
+    ordering = ["-created_on"]
+    # The personalisation holds the OTP tokens
+    exclude = ["personalisation"]
+    actions = ["retry"]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    @admin.action(description="Retry the selected failed emails")
+    def retry(self, request, queryset):
+        failed_ids = list(queryset.filter(status="failed").values_list("id", flat=True))
+        count = NotifyEmail.objects.filter(id__in=failed_ids).update(
+            status="pending", attempts=0, next_attempt_at=timezone.now()
+        )
+        if not settings.NOTIFY_WORKER_ENABLED:
+            # Without the worker nothing else picks up the pending emails
+            sent = send_due_emails(batch_size=len(failed_ids), ids=failed_ids)["sent"]
+            self.message_user(request, f"{sent} of {count} emails sent again", messages.SUCCESS)
+            return
+        self.message_user(request, f"{count} emails queued again", messages.SUCCESS)
+
+
+@admin.register(OrganisationImport)
+class OrganisationImportAdmin(ReadOnlyChangelistMixin, admin.ModelAdmin):
+    """
+    Read only view of the organisation CSVs queued from the organisation admin, showing the
+    progress of the import and a summary of the changes once it is done.
+    """
+
+    model = OrganisationImport
+    list_display = ["id", "file_name", "status", "progress", "created_by", "created_on", "finished_on"]
+    list_filter = ["status"]
+    ordering = ["-created_on"]
+    exclude = ["csv_data"]
+    readonly_fields = ["progress"]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    @admin.display(description="Rows read")
+    def progress(self, obj: OrganisationImport) -> str:
+        if obj.status == "running" and obj.processed_rows == obj.total_rows:
+            # The changes are written in one transaction, the rows written are not known until it commits
+            return f"{obj.processed_rows} of {obj.total_rows}, saving the changes"
+        return f"{obj.processed_rows} of {obj.total_rows}"
+
 
 class CustomConfigForm(ModelForm):
     """
@@ -312,6 +396,16 @@ class CustomConfigForm(ModelForm):
         ],
         help_text="Enter in format 'YY/YY', e.g., 25/26",
     )
+    period_start = forms.DateTimeField(
+        widget=DateTimeInput(
+            attrs={
+                "type": "datetime-local",
+                "class": "vDateTimeField",
+            }
+        ),
+        required=False,
+        help_text="Leave empty to start as soon as the previous period ends",
+    )
     assessment_period_end = forms.DateTimeField(
         widget=DateTimeInput(
             attrs={
@@ -325,16 +419,25 @@ class CustomConfigForm(ModelForm):
 
     class Meta:
         model = Configuration
-        fields = ["name", "current_assessment_period", "assessment_period_end", "default_framework"]
+        fields = ["name", "current_assessment_period", "period_start", "assessment_period_end", "default_framework"]
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.fields["current_assessment_period"].initial = self.instance.get_current_assessment_period()
-        self.fields["assessment_period_end"].initial = datetime.strptime(
-            self.instance.get_assessment_period_end(), "%d %B %Y %I:%M%p"
-        ).strftime("%Y-%m-%dT%H:%M")
+        if self.instance.get_assessment_period_end():
+            self.fields["assessment_period_end"].initial = self.instance.get_submission_due_date().strftime(
+                "%Y-%m-%dT%H:%M"
+            )
         self.fields["default_framework"].initial = self.instance.get_default_framework()
 
+    def clean(self):
+        cleaned_data = super().clean()
+        period_start = cleaned_data.get("period_start")
+        period_end = cleaned_data.get("assessment_period_end")
+        if period_start and period_end and period_start >= period_end:
+            self.add_error("period_start", "The period must start before it ends")
+        return cleaned_data
+
     def save(self, commit=True):
         if not self.instance.config_data:
             self.instance.config_data = {}
@@ -343,10 +446,13 @@ class CustomConfigForm(ModelForm):
         self.instance.config_data["assessment_period_end"] = self.cleaned_data["assessment_period_end"].strftime(
             "%d %B %Y %I:%M%p"
         )
+        self.instance.period_end = self.cleaned_data["assessment_period_end"]
         self.instance.config_data["default_framework"] = self.cleaned_data["default_framework"]
         return super().save(commit=commit)
 
 
 @admin.register(Configuration)
-class ConfigurationAdmin(admin.ModelAdmin):
+class ConfigurationAdmin(ReadOnlyChangelistMixin, admin.ModelAdmin):
     form = CustomConfigForm
+    list_display = ["name", "period_start", "period_end"]
+    ordering = ["-period_end"]
@@ -7,6 +7,7 @@ class WebcafConfig(AppConfig):
     label = "webcaf"
 
     def ready(self) -> None:
+        from . import checks, signals  # noqa: F401
         from .frameworks import execute_routers
 
         execute_routers()
@@ -0,0 +1,154 @@
+"""
+Application cache, on top of the Django cache configured by ``CACHE_URL``.
+
+Cache keys are scoped by keyword, for example ``organisation=12`` or ``framework="caf32"``.
+Every scope has a generation token stored in the cache, and the tokens of a key's scopes
+are part of the key. Invalidating a scope replaces its token, so every entry cached under
+it is orphaned at once and expires on its own. The model signals in ``signals.py`` do
+this when assessments, systems, user profiles or configurations are saved.
+
+The default local memory cache is private to each worker, so an invalidation only reaches
+the worker that made the change. Entries that must be exact across workers should include
+a version of their source in the name, as ``Assessment.is_complete_cached`` does.
+"""
+
+import threading
+import uuid
+from collections import Counter
+from typing import Any, Callable
+
+from django.conf import settings
+from django.core.cache import caches
+
+from webcaf.webcaf.metrics import register_collector
+
+_counters: Counter = Counter()
+_counters_lock = threading.Lock()
+
+
+def get_cache():
+    return caches[settings.APP_CACHE_ALIAS]
+
+
+def _generation_key(kind: str, value: Any) -> str:
+    return f"generation:{kind}:{value}"
+
+
+def make_key(name: str, **scopes: Any) -> str:
+    """
+    Build the cache key of an entry, including the current generation of each scope.
+
+    :param name: Name of the cached value, unique within its scopes.
+    :param scopes: The scopes the value depends on, such as ``organisation=12``.
+    :return: The cache key.
+    """
+    cache = get_cache()
+    generation_keys = [_generation_key(kind, scopes[kind]) for kind in sorted(scopes)]
+    generations = cache.get_many(generation_keys)
+    for generation_key in generation_keys:
+        if generation_key not in generations:
+            # Never start from a fixed value, the entries of an evicted generation must stay orphaned
+            cache.add(generation_key, uuid.uuid4().hex, timeout=None)
+            generations[generation_key] = cache.get(generation_key)
+    parts = [f"{kind}={scopes[kind]}@{generations[key]}" for kind, key in zip(sorted(scopes), generation_keys)]
+    return ":".join([name, *parts])
+
+
+_missing = object()
+
+
+def _versioned_key(name: str, version: Any, scopes: dict[str, Any]) -> str:
+    return make_key(name if version is None else f"{name}:{version}", **scopes)
+
+
+def _get(key: str, name: str, default: Any) -> Any:
+    value = get_cache().get(key, _missing)
+    if value is _missing:
+        _count(name, "misses")
+        return default
+    _count(name, "hits")
+    return value
+
+
+def _set(key: str, value: Any, timeout: int | None):
+    if timeout is None:
+        get_cache().set(key, value)
+    else:
+        get_cache().set(key, value, timeout)
+
+
+def get_value(name: str, default: Any = None, version: Any = None, **scopes: Any) -> Any:
+    """
+    Return the cached value, or ``default`` when it is not cached.
+
+    :param name: Name of the cached value, hits and misses are counted by name.
+    :param default: Returned on a miss.
+    :param version: Optional version of the source data, a new version is a miss.
+    :param scopes: The scopes the value depends on.
+    :return: The cached value or the default.
+    """
+    return _get(_versioned_key(name, version, scopes), name, default)
+
+
+def set_value(name: str, value: Any, version: Any = None, timeout: int | None = None, **scopes: Any):
+    """
+    Cache a value, see ``get_value`` for the other parameters.
+
+    :param timeout: Seconds to keep the value, the cache's default timeout when None.
+    """
+    _set(_versioned_key(name, version, scopes), value, timeout)
+
+
+def get_or_set(
+    name: str, default: Callable[[], Any], version: Any = None, timeout: int | None = None, **scopes: Any
+) -> Any:
+    """
+    Return the cached value, or compute, cache and return it.
+
+    :param name: Name of the cached value, hits and misses are counted by name.
+    :param default: Computes the value on a miss.
+    :param version: Optional version of the source data, a new version is a miss.
+    :param timeout: Seconds to keep the value, the cache's default timeout when None.
+    :param scopes: The scopes the value depends on.
+    :return: The cached or computed value.
+    """
+    key = _versioned_key(name, version, scopes)
+    value = _get(key, name, _missing)
+    if value is _missing:
+        value = default()
+        _set(key, value, timeout)
+    return value
+
+
+def invalidate(**scopes: Any):
+    """
+    Orphan every entry cached under any of the given scopes.
+
+    :param scopes: The scopes to invalidate, such as ``organisation=12``.
+    """
+    get_cache().set_many({_generation_key(kind, value): uuid.uuid4().hex for kind, value in scopes.items()}, None)
+
+
+def _count(name: str, outcome: str):
+    with _counters_lock:
+        _counters[(name, outcome)] += 1
+
+
+def cache_metrics() -> dict[str, dict[str, int]]:
+    """
+    Hits and misses of each cached value name in this worker.
+    """
+    with _counters_lock:
+        counters = dict(_counters)
+    metrics: dict[str, dict[str, int]] = {}
+    for (name, outcome), count in sorted(counters.items()):
+        metrics.setdefault(name, {"hits": 0, "misses": 0})[outcome] = count
+    return metrics
+
+
+def reset_metrics():
+    with _counters_lock:
+        _counters.clear()
+
+
+register_collector("cache", cache_metrics)
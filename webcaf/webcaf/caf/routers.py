@@ -1,3 +1,4 @@
+import hashlib
 import logging
 import os
 from abc import abstractmethod
@@ -16,6 +17,7 @@ from webcaf import urls
 from webcaf.webcaf.abcs import FrameworkRouter
 from webcaf.webcaf.caf.views.factory import create_form_view
 from webcaf.webcaf.forms.factory import create_form
+from webcaf.webcaf.utils.timing import timed
 
 from .field_providers import (
     FieldProvider,
@@ -69,9 +71,11 @@ class CAFLoader(FrameworkRouter):
         """
 
     def _read(self) -> None:
-        with open(self.get_framework_path(), "r") as file:
-            self.framework = yaml.safe_load(file)
-            self.elements = list(self._traverse_framework())
+        with open(self.get_framework_path(), "rb") as file:
+            content = file.read()
+        self.version = hashlib.sha256(content).hexdigest()[:12]
+        self.framework = yaml.safe_load(content)
+        self.elements = list(self._traverse_framework())
 
     def _traverse_framework(self) -> Generator[CAF32Element, None, None]:
         """
@@ -220,7 +224,7 @@ class CAF32Router(CAFLoader):
                 name=element["short_name"],
             )
             urls.urlpatterns.append(url_to_add)
-        self.logger.debug(f"Added {url_to_add}")
+        self.logger.debug("Added %s", url_to_add)
 
     def _process_outcome(self, element) -> None:
         if element.get("stage") == "indicators":
@@ -410,6 +414,7 @@ class CAF32ExcelExporter(CAFLoader):
         }
 
     # ---- Public API ------------------------------------------------------------
+    @timed("xlsx")
     def execute(self) -> Workbook:
         """Build and return the Excel workbook for the framework."""
         wb = Workbook()
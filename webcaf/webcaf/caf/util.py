@@ -75,27 +75,28 @@ class IndicatorStatusChecker:
 
         :return: Timestamp indicating when the status change occurred.
         """
-        historical_assessments = assessment.history.all()
+        # Rebuild the answers for every version in one pass, as they are stored as patches
+        historical_assessments = assessment.history.model.with_rebuilt_data(assessment.history.all())
 
         # Filter historical assessments where the indicator's status has changed
 
         filtered_history = []
         for i in range(len(historical_assessments) - 1):
             prev_outcome = (
-                historical_assessments[i]
-                .assessments_data.get(indicator_id, {})
+                historical_assessments[i][1]
+                .get(indicator_id, {})
                 .get("confirmation", {})
                 .get("confirm_outcome_status", "")
             )
             next_outcome = (
-                historical_assessments[i + 1]
-                .assessments_data.get(indicator_id, {})
+                historical_assessments[i + 1][1]
+                .get(indicator_id, {})
                 .get("confirmation", {})
                 .get("confirm_outcome_status", "")
             )
             # We get the records in reverse order, so we need to check the next outcome first
             if prev_outcome == status and next_outcome != status:
-                filtered_history.append(historical_assessments[i])
+                filtered_history.append(historical_assessments[i][0])
 
         # If there are no matching statuses, return None
         if not filtered_history:
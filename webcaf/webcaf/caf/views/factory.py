@@ -16,7 +16,6 @@ from django.views.generic import FormView
 
 from webcaf.webcaf.caf.util import IndicatorStatusChecker
 from webcaf.webcaf.forms.general import ContinueForm, NextActionForm
-from webcaf.webcaf.utils import mask_email
 from webcaf.webcaf.utils.caf import CafFormUtil
 from webcaf.webcaf.utils.session import SessionUtil
 from webcaf.webcaf.views.general import FormViewWithBreadcrumbs
@@ -166,15 +165,20 @@ class BaseIndicatorsFormView(FormViewWithBreadcrumbs):
                         ]
                     }
                     self.logger.info(
-                        f"Updated assessment data for class {self.class_id} as the answers have changed status is {current_outcome_status}."
+                        "Updated assessment data for class %s as the answers have changed status is %s.",
+                        self.class_id,
+                        current_outcome_status,
                     )
             assessment.assessments_data[self.class_id][self.stage] = form.cleaned_data
             assessment.last_updated_by = current_user_profile.user
             assessment.save()
             self.logger.info(
-                mask_email(
-                    f"Updating section {self.class_id} -> [{self.stage}] saved by user {current_user_profile.user.username}[{current_user_profile.role}] of {current_user_profile.organisation.name}"
-                )
+                "Updating section %s -> [%s] saved by user %s[%s] of %s",
+                self.class_id,
+                self.stage,
+                current_user_profile.user.username,
+                current_user_profile.role,
+                current_user_profile.organisation.name,
             )
         else:
             return HttpResponseNotFound("Requested assessment could not be found.")
@@ -367,7 +371,7 @@ class OutcomeConfirmationView(BaseIndicatorsFormView):
             assessment.assessments_data[self.class_id]
         )
         form.cleaned_data.update(**status_for_indicator)
-        self.logger.info(f"Saving outcome confirmation {self.class_id} form {self.request.user.pk}")
+        self.logger.info("Saving outcome confirmation %s form %s", self.class_id, self.request.user.pk)
 
         return super().form_valid(form)
 
@@ -462,5 +466,5 @@ def create_form_view(
         )
 
     FormViewClass = type(class_name, parent_classes, class_attrs)
-    create_form_view_logger.debug(f"Creating view class {class_name} with parent classes {parent_classes}")
+    create_form_view_logger.debug("Creating view class %s with parent classes %s", class_name, parent_classes)
     return FormViewClass
@@ -0,0 +1,43 @@
+"""
+System checks of the data, run with ``manage.py check --database default``.
+"""
+
+from django.apps import apps
+from django.core.checks import Tags, Warning, register
+
+# Rows of a model listed in a warning
+EXAMPLES = 5
+
+
+@register(Tags.database)
+def check_references(app_configs=None, databases=None, **kwargs) -> list[Warning]:
+    """
+    Check that every reference is the one generated from the row's primary key, so changes
+    to how references are allocated can be shown not to have changed the existing ones.
+
+    :param databases: The database aliases to check, only given with ``--database``.
+    :return: A warning for each model with references that do not match.
+    """
+    from webcaf.webcaf.models import ReferenceGeneratorMixin
+
+    warnings: list[Warning] = []
+    for alias in databases or []:
+        for model in apps.get_models():
+            if not issubclass(model, ReferenceGeneratorMixin):
+                continue
+            rows = model._default_manager.using(alias).exclude(reference=None).values_list("pk", "reference")
+            mismatched = [
+                pk for pk, reference in rows.iterator(chunk_size=5000) if reference != model.reference_for(pk)
+            ]
+            if mismatched:
+                warnings.append(
+                    Warning(
+                        f"{len(mismatched)} {model._meta.verbose_name_plural} in the {alias} database have a "
+                        f"reference that was not generated from their id, for example ids {mismatched[:EXAMPLES]}.",
+                        hint="References are generated from the id with generate_reference(), using the model "
+                        "name as the prime set.",
+                        obj=model,
+                        id="webcaf.W001",
+                    )
+                )
+    return warnings
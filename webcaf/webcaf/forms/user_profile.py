@@ -3,7 +3,6 @@ import logging
 from django import forms
 
 from webcaf.webcaf.models import UserProfile
-from webcaf.webcaf.utils import mask_email
 
 
 class UserProfileForm(forms.ModelForm):
@@ -72,7 +71,7 @@ class UserProfileForm(forms.ModelForm):
         if user.email != self.cleaned_data["email"]:
             user.email = self.cleaned_data["email"]
             user.username = user.email
-            self.logger.info(mask_email(f"Updated user {user.pk} email to {user.email}"))
+            self.logger.info("Updated user %s email to %s", user.pk, user.email)
         if commit:
             user.save()
             profile.save()
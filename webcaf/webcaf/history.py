@@ -0,0 +1,292 @@
+"""
+Delta-encoded history records for models with large JSON fields.
+
+django-simple-history copies every field into the history table on each save. For
+``Assessment`` this means a full copy of ``assessments_data`` for every page of answers
+saved. The classes here store that field as a JSON patch against an earlier record
+instead, with a full copy (a checkpoint) every ``HISTORY_CHECKPOINT_INTERVAL`` records.
+
+Each delta record points at the record it was computed against through
+``history_delta_base``, so concurrent saves that share the same base still rebuild to
+the data that was actually saved.
+"""
+
+import logging
+from datetime import datetime
+from typing import Any, Iterable, Optional
+
+from django.conf import settings
+from django.db import models
+from simple_history.models import HistoricalRecords, ModelChange, ModelDelta
+
+from webcaf.webcaf import cache
+from webcaf.webcaf.utils.json_patch import apply_patch, make_patch
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHECKPOINT_INTERVAL = 20
+
+
+def get_checkpoint_interval() -> int:
+    """
+    :return: The number of records in a chain, including the checkpoint, before a new
+        checkpoint is written. A value of 1 stores every record as a checkpoint.
+    """
+    return max(1, getattr(settings, "HISTORY_CHECKPOINT_INTERVAL", DEFAULT_CHECKPOINT_INTERVAL))
+
+
+class DeltaHistoryModel(models.Model):
+    """
+    Abstract base for historical models created by ``DeltaHistoricalRecords``.
+
+    :ivar history_delta_base: The ``history_id`` of the record the stored patch applies
+        to, or None if the record holds the full value (a checkpoint).
+    :ivar history_delta_depth: Number of patches between this record and its checkpoint.
+    """
+
+    delta_field: str
+
+    history_delta_base = models.BigIntegerField(null=True, blank=True)
+    history_delta_depth = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+    @property
+    def is_checkpoint(self) -> bool:
+        return self.history_delta_base is None
+
+    def save(self, *args, **kwargs):
+        if not (self._state.adding and self.history_delta_base is None):
+            super().save(*args, **kwargs)
+            return
+        full_data = getattr(self, self.delta_field)
+        self._encode_delta()
+        super().save(*args, **kwargs)
+        # The next record of the object is diffed against this one
+        cache.set_value(self._data_cache_name(), full_data, version=self.history_id)
+
+    def _encode_delta(self):
+        """
+        Replace the delta field with a patch against the latest record of the same
+        object, unless that would make the chain longer than the checkpoint interval.
+        The latest record's full value is normally cached by its save, so only a
+        record saved by another worker, or evicted from the cache, is rebuilt.
+        """
+        object_id = getattr(self, self._object_id_attname())
+        previous = (
+            type(self)
+            .objects.filter(**{self._object_id_attname(): object_id})
+            .order_by("-history_id")
+            .values_list("history_id", "history_delta_depth")
+            .first()
+        )
+        if not previous or previous[1] + 1 >= get_checkpoint_interval():
+            self.history_delta_depth = 0
+            return
+        base_id, base_depth = previous
+        base_data = cache.get_value(self._data_cache_name(), default=None, version=base_id)
+        if base_data is None:
+            base_data = type(self).rebuild(object_id, base_id)
+        setattr(self, self.delta_field, make_patch(base_data, getattr(self, self.delta_field)))
+        self.history_delta_base = base_id
+        self.history_delta_depth = base_depth + 1
+
+    def get_delta_field_data(self) -> Any:
+        """
+        :return: The full value of the delta field as it was saved for this record.
+        """
+        if not hasattr(self, "_delta_field_data"):
+            if self.is_checkpoint:
+                self._delta_field_data = getattr(self, self.delta_field)
+            else:
+                self._delta_field_data = type(self).rebuild(getattr(self, self._object_id_attname()), self.history_id)
+        return self._delta_field_data
+
+    def diff_against(self, old_history, excluded_fields=None, included_fields=None, **kwargs) -> ModelDelta:
+        """
+        Compare with another record as ``HistoricalChanges.diff_against`` does, with the
+        full values of the delta field rather than the patches stored for them.
+        """
+        excluded_fields = set(excluded_fields or [])
+        delta = super().diff_against(  # type: ignore[misc]
+            old_history, excluded_fields | {self.delta_field}, included_fields, **kwargs
+        )
+        if self.delta_field in excluded_fields or (
+            included_fields is not None and self.delta_field not in included_fields
+        ):
+            return delta
+        old_data, new_data = old_history.get_delta_field_data(), self.get_delta_field_data()
+        if old_data == new_data:
+            return delta
+        changes = sorted([*delta.changes, ModelChange(self.delta_field, old_data, new_data)], key=lambda c: c.field)
+        return ModelDelta(changes, [change.field for change in changes], old_history, self)
+
+    @classmethod
+    def load_delta_field_data(cls, records: Iterable["DeltaHistoryModel"]):
+        """
+        Rebuild the delta field of the given records of one object, reading their
+        chain once, so ``get_delta_field_data`` and ``diff_against`` do not rebuild
+        each record separately.
+
+        :param records: History records of one object, such as a page of its history.
+        """
+        records = list(records)
+        if not records:
+            return
+        id_field = cls._object_id_attname()
+        object_id = getattr(records[0], id_field)
+        oldest = min(record.history_id for record in records)
+        checkpoint_id = (
+            cls.objects.filter(**{id_field: object_id}, history_id__lte=oldest, history_delta_base__isnull=True)
+            .order_by("-history_id")
+            .values_list("history_id", flat=True)
+            .first()
+        )
+        chain = cls.objects.filter(
+            **{id_field: object_id},
+            history_id__gte=checkpoint_id or oldest,
+            history_id__lte=max(record.history_id for record in records),
+        ).only("history_id", "history_delta_base", id_field, cls.delta_field)
+        rebuilt = {record.history_id: data for record, data in cls.with_rebuilt_data(chain)}
+        for record in records:
+            record._delta_field_data = rebuilt[record.history_id]
+
+    @classmethod
+    def _data_cache_name(cls) -> str:
+        return f"history-data:{cls._meta.label_lower}"
+
+    @classmethod
+    def _object_id_attname(cls) -> str:
+        return cls.instance_type._meta.pk.attname  # type: ignore[attr-defined]
+
+    @classmethod
+    def rebuild(cls, object_id: Any, history_id: int) -> Any:
+        """
+        Rebuild the delta field of a record from its checkpoint and the patches after it.
+
+        :param object_id: Primary key of the tracked object.
+        :param history_id: The history record to rebuild.
+        :return: The full value of the delta field for that record.
+        :raises cls.DoesNotExist: If the record or one of its bases is missing.
+        """
+        id_field = cls._object_id_attname()
+        rows: dict[int, tuple[Optional[int], Any]] = {}
+        upper = history_id
+        while True:
+            checkpoint_id = (
+                cls.objects.filter(**{id_field: object_id}, history_id__lte=upper, history_delta_base__isnull=True)
+                .order_by("-history_id")
+                .values_list("history_id", flat=True)
+                .first()
+            )
+            if checkpoint_id is None:
+                raise cls.DoesNotExist(f"No checkpoint found for {object_id} before history record {upper}")
+            for row_id, base_id, value in cls.objects.filter(
+                **{id_field: object_id}, history_id__gte=checkpoint_id, history_id__lte=upper
+            ).values_list("history_id", "history_delta_base", cls.delta_field):
+                rows[row_id] = (base_id, value)
+
+            # Follow the base pointers back to a checkpoint
+            chain = [history_id]
+            while chain[-1] in rows and rows[chain[-1]][0] is not None:
+                chain.append(rows[chain[-1]][0])  # type: ignore[arg-type]
+            if chain[-1] in rows:
+                break
+            # A base from before the latest checkpoint, only possible after concurrent saves
+            upper = chain[-1]
+
+        data = apply_patch(rows[chain[-1]][1], [])
+        for row_id in reversed(chain[:-1]):
+            data = apply_patch(data, rows[row_id][1], in_place=True)
+        return data
+
+    @classmethod
+    def rebuild_as_of(cls, object_id: Any, timestamp: datetime) -> Any:
+        """
+        Rebuild the delta field as it was at the given time.
+
+        :param object_id: Primary key of the tracked object.
+        :param timestamp: The point in time to rebuild the value for.
+        :return: The full value of the delta field at ``timestamp``.
+        :raises cls.DoesNotExist: If the object has no history before ``timestamp``.
+        """
+        history_id = (
+            cls.objects.filter(**{cls._object_id_attname(): object_id}, history_date__lte=timestamp)
+            .order_by("-history_date", "-history_id")
+            .values_list("history_id", flat=True)
+            .first()
+        )
+        if history_id is None:
+            raise cls.DoesNotExist(f"No history for {object_id} before {timestamp}")
+        return cls.rebuild(object_id, history_id)
+
+    @classmethod
+    def with_rebuilt_data(cls, records: Iterable["DeltaHistoryModel"]) -> list[tuple["DeltaHistoryModel", Any]]:
+        """
+        Pair every record of a single object's history with its full delta field value.
+
+        The records are folded in ``history_id`` order, so each patch is applied once.
+        The history passed in must include every record back to the first checkpoint.
+
+        :param records: All history records of one object.
+        :return: A list of ``(record, data)`` tuples in the order the records were given.
+        """
+        records = list(records)
+        in_order = sorted(records, key=lambda record: record.history_id)
+        pending_uses: dict[int, int] = {}
+        for record in in_order:
+            if not record.is_checkpoint:
+                pending_uses[record.history_delta_base] = pending_uses.get(record.history_delta_base, 0) + 1
+
+        states: dict[int, Any] = {}
+        rebuilt: dict[int, Any] = {}
+        for record in in_order:
+            if record.is_checkpoint:
+                data = getattr(record, cls.delta_field)
+            else:
+                base_id = record.history_delta_base
+                if base_id in states:
+                    data = apply_patch(states[base_id], getattr(record, cls.delta_field))
+                    pending_uses[base_id] -= 1
+                    if not pending_uses[base_id]:
+                        # Nothing else is built from this record, free the copy
+                        del states[base_id]
+                else:
+                    data = record.get_delta_field_data()
+            rebuilt[record.history_id] = data
+            if pending_uses.get(record.history_id):
+                states[record.history_id] = data
+        return [(record, rebuilt[record.history_id]) for record in records]
+
+
+class DeltaHistoricalRecords(HistoricalRecords):
+    """
+    ``HistoricalRecords`` that stores one JSON field as patches between versions.
+
+    Historical instances returned by ``instance``, ``history_object`` and ``as_of``
+    carry the rebuilt value, so code reading the history does not see the patches.
+
+    :param delta_field: Name of the JSON field to store as patches.
+    """
+
+    def __init__(self, *args, delta_field: str, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Ahead of HistoricalChanges, which simple_history puts first, to override diff_against
+        self.bases = (DeltaHistoryModel,) + tuple(self.bases)
+        self.delta_field = delta_field
+
+    def get_extra_fields(self, model, fields):
+        extra_fields = super().get_extra_fields(model, fields)
+        delta_field = self.delta_field
+        get_instance = extra_fields["instance"].fget
+
+        def get_rebuilt_instance(history_record):
+            instance = get_instance(history_record)
+            setattr(instance, delta_field, history_record.get_delta_field_data())
+            return instance
+
+        extra_fields["delta_field"] = delta_field
+        extra_fields["instance"] = property(get_rebuilt_instance)
+        extra_fields["history_object"] = property(get_rebuilt_instance)
+        return extra_fields
@@ -1,6 +1,11 @@
 import csv
+import time
+from itertools import islice
 
 from django.core.management.base import BaseCommand
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils import timezone
 
 from webcaf.webcaf.models import Organisation
 
@@ -8,23 +13,105 @@ CSV_PATH = "webcaf/seed/webcaf-orgs.csv"
 
 
 class Command(BaseCommand):
-    help = "Populate the Organisation table from webcaf-orgs.csv if the table is empty"
+    help = (
+        "Populate the Organisation table from webcaf-orgs.csv. The file is read in batches, new "
+        "organisations are inserted and changed ones updated, keeping the ids of the file, so the "
+        "command can be run again against an existing database."
+    )
 
-    def handle(self, *args, **options):
-        if Organisation.objects.exists():
-            self.stdout.write(self.style.WARNING("Organisation table is not empty. No data loaded."))
-            return
+    def add_arguments(self, parser):
+        parser.add_argument("--path", help=f"CSV file to load (default: {CSV_PATH})")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Rows written per statement")
 
-        with open(CSV_PATH, newline="", encoding="utf-8") as csvfile:
+    def handle(self, *args, **options):
+        path = options["path"] or CSV_PATH
+        counts = {"created": 0, "updated": 0, "unchanged": 0, "skipped": 0}
+        start = time.perf_counter()
+        with open(path, newline="", encoding="utf-8") as csvfile:
             reader = csv.DictReader(csvfile)
-            for count, row in enumerate(reader):
-                pk = int(row["old_organisation_id"])
-                name = row["organisation_name"]
-                organisation_type = Organisation.get_type_id(row["organisation_type_description"])
-                Organisation.objects.create(
-                    pk=pk,
-                    name=name,
-                    organisation_type=organisation_type,
+            while batch := list(islice(reader, options["batch_size"])):
+                for key, value in self.load_batch(batch).items():
+                    counts[key] += value
+        self.reset_sequence()
+
+        rows = sum(counts.values())
+        seconds = time.perf_counter() - start
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Seeded {rows} organisations from {path}: {counts['created']} created, {counts['updated']} updated, "
+                f"{counts['unchanged']} unchanged, {counts['skipped']} skipped "
+                f"in {seconds:.2f}s ({rows / max(seconds, 1e-6):.0f} rows/s)"
+            )
+        )
+
+    def load_batch(self, rows: list[dict]) -> dict[str, int]:
+        """
+        Upsert one batch of the file. Only the organisations that are new or differ from the
+        file are written, and a name used by an organisation with another id is skipped, as
+        the names are unique.
+
+        :param rows: Rows of the CSV.
+        :return: The number of organisations created, updated, unchanged and skipped.
+        """
+        organisations = {}
+        for row in rows:
+            pk = int(row["old_organisation_id"])
+            organisations[pk] = Organisation(
+                pk=pk,
+                name=row["organisation_name"].strip(),
+                organisation_type=Organisation.get_type_id(row["organisation_type_description"]),
+            )
+        names = [organisation.name for organisation in organisations.values()]
+        existing = Organisation.objects.in_bulk(organisations.keys())
+        taken = dict(
+            Organisation.objects.filter(name__in=names).exclude(pk__in=organisations).values_list("name", "pk")
+        )
+
+        counts = {"created": 0, "updated": 0, "unchanged": 0, "skipped": 0}
+        created, updated = [], []
+        for pk, organisation in organisations.items():
+            current = existing.get(pk)
+            if organisation.name in taken:
+                self.stdout.write(
+                    self.style.WARNING(
+                        f"Skipped {organisation.name} ({pk}), the name is used by organisation {taken[organisation.name]}"
+                    )
                 )
+                counts["skipped"] += 1
+            elif current is None:
+                created.append(organisation)
+            elif (current.name, current.organisation_type) != (organisation.name, organisation.organisation_type):
+                # The existing row is updated, so its history records the other fields as they are
+                current.name = organisation.name
+                current.organisation_type = organisation.organisation_type
+                updated.append(current)
+            else:
+                counts["unchanged"] += 1
+        if not created and not updated:
+            return counts
+
+        with transaction.atomic():
+            # The conflict update keeps the reference of existing organisations, and covers rows
+            # inserted by another run since they were read
+            Organisation.objects.bulk_create(
+                created + updated,
+                update_conflicts=True,
+                unique_fields=["id"],
+                update_fields=["name", "organisation_type"],
+            )
+            now = timezone.now()
+            Organisation.history.bulk_history_create(created, default_date=now)
+            Organisation.history.bulk_history_create(updated, update=True, default_date=now)
+        counts["created"] = len(created)
+        counts["updated"] = len(updated)
+        return counts
 
-            self.stdout.write(self.style.SUCCESS(f"Seeded {count + 1} organisations from {CSV_PATH}"))
+    @staticmethod
+    def reset_sequence():
+        """
+        The ids are taken from the file, so move the id sequence past them for the
+        organisations created later.
+        """
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), [Organisation]):
+                cursor.execute(sql)
@@ -0,0 +1,136 @@
+import gzip
+import json
+from pathlib import Path
+
+from django.core import serializers
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+
+from webcaf.webcaf.models import ArchivedAssessment, Assessment, Configuration
+
+
+class Command(BaseCommand):
+    help = (
+        "Move the assessments of a closed assessment period, and their history, out of the live "
+        "tables into the archive table. Optionally export the archived period to a gzipped JSON lines file."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("period", help="The assessment period to archive, for example 24/25")
+        parser.add_argument("--batch-size", type=int, default=100, help="Number of assessments per transaction")
+        parser.add_argument(
+            "--export-dir", help="Write the archived period to <export-dir>/assessments-<period>.jsonl.gz"
+        )
+        parser.add_argument("--restore", action="store_true", help="Move the archived period back to the live tables")
+        parser.add_argument(
+            "--force", action="store_true", help="Archive even if the period has no closed configuration"
+        )
+
+    def handle(self, *args, **options):
+        period = options["period"]
+        if options["restore"]:
+            restored = self.restore(period, options["batch_size"])
+            self.stdout.write(self.style.SUCCESS(f"Restored {restored} assessments for {period}"))
+            return
+
+        self.check_period_closed(period, options["force"])
+        archived = self.archive(period, options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Archived {archived} assessments for {period}"))
+        if options["export_dir"]:
+            path, exported = self.export(period, Path(options["export_dir"]))
+            self.stdout.write(self.style.SUCCESS(f"Exported {exported} assessments to {path}"))
+
+    @staticmethod
+    def check_period_closed(period: str, force: bool):
+        """
+        Refuse to archive the current period, or a period whose configuration has not ended.
+        """
+        default_config = Configuration.objects.get_default_config()
+        if default_config and default_config.get_current_assessment_period() == period:
+            raise CommandError(f"{period} is the current assessment period")
+        configs = [
+            config
+            for config in Configuration.objects.all()
+            if config.get_current_assessment_period() == period and config.get_assessment_period_end()
+        ]
+        if not configs and not force:
+            raise CommandError(f"No configuration found for {period}, use --force to archive it anyway")
+        if any(config.get_submission_due_date() >= timezone.now() for config in configs):
+            raise CommandError(f"{period} has not ended yet")
+
+    def archive(self, period: str, batch_size: int) -> int:
+        """
+        Archive the period one batch of assessments at a time, each batch in its own transaction.
+        """
+        history_model = Assessment.history.model
+        assessment_ids = list(
+            Assessment.objects.filter(assessment_period=period).order_by("id").values_list("id", flat=True)
+        )
+        for start in range(0, len(assessment_ids), batch_size):
+            batch_ids = assessment_ids[start : start + batch_size]
+            with transaction.atomic():
+                assessments = Assessment.objects.select_for_update().filter(id__in=batch_ids).order_by("id")
+                history: dict[int, list] = {}
+                for record in history_model.objects.filter(id__in=batch_ids).order_by("history_id"):
+                    history.setdefault(record.id, []).append(record)
+                ArchivedAssessment.objects.bulk_create(
+                    [
+                        ArchivedAssessment(
+                            id=assessment.id,
+                            reference=assessment.reference,
+                            system_id=assessment.system_id,
+                            assessment_period=assessment.assessment_period,
+                            status=assessment.status,
+                            records=serializers.serialize("python", [assessment] + history.get(assessment.id, [])),
+                        )
+                        for assessment in assessments
+                    ]
+                )
+                history_model.objects.filter(id__in=batch_ids).delete()
+                # Delete without signals, so no deletion record is added to the history just moved
+                Assessment.objects.filter(id__in=batch_ids)._raw_delete(Assessment.objects.db)
+            self.stdout.write(f"Archived {start + len(batch_ids)} of {len(assessment_ids)} assessments")
+        return len(assessment_ids)
+
+    def restore(self, period: str, batch_size: int) -> int:
+        """
+        Move an archived period back to the live tables, the reverse of ``archive``.
+        """
+        archived_ids = list(
+            ArchivedAssessment.objects.filter(assessment_period=period).order_by("id").values_list("id", flat=True)
+        )
+        for start in range(0, len(archived_ids), batch_size):
+            batch_ids = archived_ids[start : start + batch_size]
+            with transaction.atomic():
+                for archived in ArchivedAssessment.objects.select_for_update().filter(id__in=batch_ids):
+                    # Raw saves skip Assessment.save() and the history signals, so nothing is recalculated
+                    for deserialized in serializers.deserialize("python", archived.records):
+                        deserialized.save()
+                ArchivedAssessment.objects.filter(id__in=batch_ids).delete()
+            self.stdout.write(f"Restored {start + len(batch_ids)} of {len(archived_ids)} assessments")
+        return len(archived_ids)
+
+    @staticmethod
+    def export(period: str, export_dir: Path) -> tuple[Path, int]:
+        """
+        Write every archived assessment of the period to a gzipped JSON lines file.
+        """
+        export_dir.mkdir(parents=True, exist_ok=True)
+        path = export_dir / f"assessments-{period.replace('/', '-')}.jsonl.gz"
+        exported = 0
+        with gzip.open(path, "wt", encoding="utf-8") as export_file:
+            for archived in ArchivedAssessment.objects.filter(assessment_period=period).order_by("id").iterator():
+                row = {
+                    "id": archived.id,
+                    "reference": archived.reference,
+                    "system_id": archived.system_id,
+                    "assessment_period": archived.assessment_period,
+                    "status": archived.status,
+                    "archived_on": archived.archived_on,
+                    "records": archived.records,
+                }
+                export_file.write(json.dumps(row, cls=DjangoJSONEncoder) + "\n")
+                exported += 1
+        return path, exported
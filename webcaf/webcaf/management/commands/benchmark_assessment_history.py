@@ -0,0 +1,105 @@
+import json
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import override_settings
+
+from webcaf.webcaf.history import get_checkpoint_interval
+from webcaf.webcaf.models import Assessment, Organisation, System
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the storage used by the assessment history and the time taken to rebuild "
+        "past versions, for full copies and for the configured checkpoint interval. "
+        "All data is created in a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--assessments", type=int, default=5, help="Number of assessments to create")
+        parser.add_argument("--edits", type=int, default=200, help="Number of saves per assessment")
+        parser.add_argument("--samples", type=int, default=200, help="Number of versions to rebuild")
+        parser.add_argument("--interval", type=int, default=None, help="Checkpoint interval to compare against")
+        parser.add_argument("--seed", type=int, default=1, help="Seed for the generated answers")
+
+    def handle(self, *args, **options):
+        interval = options["interval"] or get_checkpoint_interval()
+        results = {
+            "full_copies": self.run(1, options),
+            f"checkpoint_every_{interval}": self.run(interval, options),
+        }
+        self.stdout.write(json.dumps(results, indent=2))
+
+    def run(self, interval: int, options) -> dict:
+        """
+        Create the assessments and their edits with the given checkpoint interval, then
+        measure the history table. Nothing is left in the database afterwards.
+        """
+        result: dict = {}
+        try:
+            with override_settings(HISTORY_CHECKPOINT_INTERVAL=interval), transaction.atomic():
+                history_model = Assessment.history.model
+                rng = random.Random(options["seed"])
+                organisation = Organisation.objects.create(name="History benchmark organisation")
+                assessment_ids = []
+                for i in range(options["assessments"]):
+                    system = System.objects.create(name=f"History benchmark system {i}", organisation=organisation)
+                    assessment = Assessment.objects.create(system=system, status="draft", assessment_period="25/26")
+                    for _ in range(options["edits"]):
+                        self.answer_indicator(assessment.assessments_data, rng)
+                        assessment.save()
+                    assessment_ids.append(assessment.id)
+
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        "SELECT count(*), sum(pg_column_size(assessments_data)) "
+                        f"FROM {history_model._meta.db_table} WHERE id = ANY(%s)",
+                        [assessment_ids],
+                    )
+                    records, data_bytes = cursor.fetchone()
+
+                versions = list(
+                    history_model.objects.filter(id__in=assessment_ids).values_list("id", "history_id", "history_date")
+                )
+                timings = []
+                for object_id, history_id, history_date in rng.sample(versions, min(options["samples"], len(versions))):
+                    start = time.perf_counter()
+                    history_model.rebuild_as_of(object_id, history_date)
+                    timings.append((time.perf_counter() - start) * 1000)
+                quantiles = statistics.quantiles(timings, n=100)
+
+                result = {
+                    "history_records": records,
+                    "assessments_data_bytes": data_bytes,
+                    "rebuild_p50_ms": round(quantiles[49], 3),
+                    "rebuild_p95_ms": round(quantiles[94], 3),
+                }
+                raise Rollback()
+        except Rollback:
+            pass
+        return result
+
+    @staticmethod
+    def answer_indicator(assessments_data: dict, rng: random.Random):
+        """
+        Change the answers for one outcome, in the shape the assessment pages save them.
+        """
+        objective = rng.choice("ABCD")
+        outcome_id = f"{objective}{rng.randint(1, 5)}.{rng.choice('abcd')}"
+        outcome = assessments_data.setdefault(outcome_id, {"indicators": {}, "confirmation": {}})
+        for level in ("achieved", "partially-achieved", "not-achieved"):
+            for number in range(1, 6):
+                key = f"{level}_{outcome_id}.{number}"
+                outcome["indicators"][key] = rng.random() < 0.5
+                outcome["indicators"][f"{key}_comment"] = "x" * rng.randint(0, 200)
+        outcome["confirmation"] = {
+            "confirm_outcome": "confirm",
+            "confirm_outcome_status": rng.choice(["Achieved", "Partially achieved", "Not achieved"]),
+        }
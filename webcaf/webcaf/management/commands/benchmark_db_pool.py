@@ -0,0 +1,71 @@
+import json
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import psycopg
+from django.core.management.base import BaseCommand
+from django.db import connection
+from psycopg_pool import ConnectionPool
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the latency of a request sized unit of database work when every request opens "
+        "its own connection with the same work done on a pooled connection. Reports p50/p95/p99 as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=500, help="Number of simulated requests per run")
+        parser.add_argument("--concurrency", type=int, default=4, help="Simulated requests running at once")
+        parser.add_argument("--queries", type=int, default=5, help="Queries per simulated request")
+
+    def handle(self, *args, **options):
+        connect_kwargs = connection.get_connection_params()
+        connect_kwargs.pop("cursor_factory", None)
+        connect_kwargs.pop("context", None)
+
+        def unpooled_request():
+            with psycopg.connect(**connect_kwargs, autocommit=True) as conn:
+                self.run_queries(conn, options["queries"])
+
+        with ConnectionPool(
+            kwargs={**connect_kwargs, "autocommit": True},
+            min_size=options["concurrency"],
+            max_size=options["concurrency"],
+            check=ConnectionPool.check_connection,
+        ) as pool:
+            pool.wait()
+
+            def pooled_request():
+                with pool.connection() as conn:
+                    self.run_queries(conn, options["queries"])
+
+            results = {
+                "connection_per_request": self.measure(unpooled_request, options),
+                "pooled": self.measure(pooled_request, options),
+            }
+            results["pooled"]["pool_stats"] = pool.get_stats()
+        self.stdout.write(json.dumps(results, indent=2))
+
+    @staticmethod
+    def run_queries(conn, queries: int):
+        for _ in range(queries):
+            conn.execute("SELECT 1").fetchone()
+
+    @staticmethod
+    def measure(simulated_request, options) -> dict:
+        def timed(_):
+            start = time.perf_counter()
+            simulated_request()
+            return (time.perf_counter() - start) * 1000
+
+        with ThreadPoolExecutor(max_workers=options["concurrency"]) as executor:
+            timings = list(executor.map(timed, range(options["requests"])))
+        quantiles = statistics.quantiles(timings, n=100)
+        return {
+            "requests": len(timings),
+            "p50_ms": round(quantiles[49], 3),
+            "p95_ms": round(quantiles[94], 3),
+            "p99_ms": round(quantiles[98], 3),
+        }
@@ -0,0 +1,228 @@
+import json
+import platform
+import random
+import statistics
+import timeit
+from typing import Callable
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from webcaf.webcaf.caf.field_providers import (
+    OutcomeConfirmationFieldProvider,
+    OutcomeIndicatorsFieldProvider,
+)
+from webcaf.webcaf.caf.routers import CAF32ExcelExporter
+from webcaf.webcaf.caf.util import IndicatorStatusChecker
+from webcaf.webcaf.caf.views.factory import create_form_view
+from webcaf.webcaf.forms.factory import create_form
+from webcaf.webcaf.frameworks import routers
+from webcaf.webcaf.models import Assessment
+from webcaf.webcaf.templatetags.form_extras import (
+    generate_assessment_progress_indicators,
+    get_answers,
+)
+from webcaf.webcaf.utils import mask_email
+from webcaf.webcaf.utils.caf import CafFormUtil
+from webcaf.webcaf.utils.references import generate_reference
+from webcaf.webcaf.utils.synthetic import caf32_outcomes, synthetic_assessments_data
+
+Benchmark = tuple[str, Callable[[], object]]
+
+CATEGORIES = ["achieved", "partially-achieved", "not-achieved"]
+
+LOG_LINE = "Updated assessment 1234 for user {} on system 56, outcome B2.a confirmed as Partially achieved"
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the functions on the assessment pages' hot paths, with synthetic assessments of "
+        "increasing completion. Prints the results as JSON, or with --compare a report of the "
+        "change from a baseline saved with --output."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            type=int,
+            nargs="+",
+            default=[10, 50, 100],
+            help="Completion of the synthetic assessments, in percent of the outcomes answered",
+        )
+        parser.add_argument("--repeat", type=int, default=5, help="Number of timings of each benchmark")
+        parser.add_argument("--min-time", type=float, default=0.2, help="Minimum seconds per timing")
+        parser.add_argument("--filter", default="", help="Only run the benchmarks whose name contains this text")
+        parser.add_argument("--seed", type=int, default=1, help="Seed for the synthetic answers")
+        parser.add_argument("--output", help="Save the results to this file, to use as a baseline")
+        parser.add_argument("--compare", help="Baseline file to compare the results with")
+        parser.add_argument(
+            "--threshold", type=float, default=20.0, help="Change in percent reported as slower or faster"
+        )
+        parser.add_argument(
+            "--fail-on-regression",
+            action="store_true",
+            help="Exit with an error when a benchmark is slower than the baseline by more than the threshold",
+        )
+
+    def handle(self, *args, **options):
+        results = {}
+        for name, function in self.benchmarks(options):
+            if options["filter"] in name:
+                results[name] = self.measure(function, options["repeat"], options["min_time"])
+        report = {
+            "created": timezone.now().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "sizes": options["sizes"],
+            "seed": options["seed"],
+            "results": results,
+        }
+        if options["output"]:
+            with open(options["output"], "w") as output:
+                json.dump(report, output, indent=2)
+        if not options["compare"]:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        with open(options["compare"]) as baseline_file:
+            baseline = json.load(baseline_file)
+        rows = self.compare(baseline["results"], results, options["threshold"])
+        self.write_report(baseline, rows)
+        slower = [row["name"] for row in rows if row["status"] == "slower"]
+        if slower and options["fail_on_regression"]:
+            raise CommandError(f"Slower than the baseline: {', '.join(slower)}")
+
+    @staticmethod
+    def measure(function: Callable[[], object], repeat: int, min_time: float) -> dict:
+        """
+        Time the function like ``timeit``: call it enough times for each timing to take at
+        least ``min_time`` seconds, and report the time per call in microseconds.
+        """
+        timer = timeit.Timer(function)
+        elapsed = timer.timeit(1)
+        number = max(1, int(min_time / elapsed)) if elapsed < min_time else 1
+        timings = [total / number * 1_000_000 for total in timer.repeat(repeat, number)]
+        return {
+            "number": number,
+            "repeat": repeat,
+            "min_us": round(min(timings), 2),
+            "median_us": round(statistics.median(timings), 2),
+            "max_us": round(max(timings), 2),
+        }
+
+    @staticmethod
+    def compare(baseline: dict, results: dict, threshold: float) -> list[dict]:
+        """
+        Compare the fastest time of each benchmark with the baseline. The fastest time is the
+        least affected by other processes on the machine.
+        """
+        rows = []
+        for name in sorted(baseline.keys() | results.keys()):
+            before = baseline.get(name, {}).get("min_us")
+            after = results.get(name, {}).get("min_us")
+            change = None
+            if before is None:
+                status = "new"
+            elif after is None:
+                status = "not run"
+            else:
+                change = (after - before) / before * 100 if before else 0.0
+                status = "slower" if change > threshold else "faster" if change < -threshold else "same"
+            rows.append({"name": name, "baseline_us": before, "current_us": after, "change": change, "status": status})
+        return rows
+
+    def write_report(self, baseline: dict, rows: list[dict]):
+        self.stdout.write(f"Compared with the baseline from {baseline.get('created', 'an unknown date')}")
+        width = max((len(row["name"]) for row in rows), default=4)
+        self.stdout.write(f"{'Benchmark':<{width}}  {'Baseline µs':>12}  {'Current µs':>12}  {'Change':>8}  Status")
+        for row in rows:
+            before = "-" if row["baseline_us"] is None else f"{row['baseline_us']:.2f}"
+            after = "-" if row["current_us"] is None else f"{row['current_us']:.2f}"
+            change = "-" if row["change"] is None else f"{row['change']:+.1f}%"
+            line = f"{row['name']:<{width}}  {before:>12}  {after:>12}  {change:>8}  {row['status']}"
+            if row["status"] == "slower":
+                line = self.style.ERROR(line)
+            elif row["status"] == "faster":
+                line = self.style.SUCCESS(line)
+            self.stdout.write(line)
+
+    def benchmarks(self, options) -> list[Benchmark]:
+        outcomes = caf32_outcomes()
+        # The indicators page with the most statements
+        outcome = max(
+            (element for element in routers["caf32"].elements if element.get("stage") == "indicators"),
+            key=lambda element: sum(len(statements) for statements in element["indicators"].values()),
+        )
+        indicators_form = create_form(OutcomeIndicatorsFieldProvider(outcome))
+        form = indicators_form()
+        questions = [name for name in form.fields if not name.endswith("_comment")]
+        # Reads the same framework file as the router, without adding URLs
+        loader = CAF32ExcelExporter()
+        long_text = "\n".join(LOG_LINE.format(f"user{i}@example.gov.uk") for i in range(100))
+
+        benchmarks: list[Benchmark] = [
+            ("CAFLoader._read", loader._read),
+            ("CAFLoader._traverse_framework", lambda: list(loader._traverse_framework())),
+            (
+                f"create_form[indicators {outcome['code']}]",
+                lambda: create_form(OutcomeIndicatorsFieldProvider(outcome)),
+            ),
+            (
+                f"create_form[confirmation {outcome['code']}]",
+                lambda: create_form(OutcomeConfirmationFieldProvider(outcome)),
+            ),
+            (
+                "create_form_view",
+                lambda: create_form_view(
+                    success_url_name="my-account",
+                    template_name="caf/indicators.html",
+                    form_class=indicators_form,
+                    class_prefix="Caf32OutcomeIndicatorsView",
+                    stage="indicators",
+                    class_id=outcome["code"],
+                    extra_context={"outcome": outcome},
+                ),
+            ),
+            (
+                f"CafFormUtil.human_index[{len(questions)} fields]",
+                lambda: [CafFormUtil.human_index(form, name) for name in questions],
+            ),
+            (
+                "generate_reference[1000 keys]",
+                lambda: [generate_reference(pk, prime_set="assessment") for pk in range(1, 1001)],
+            ),
+            ("mask_email[one line]", lambda: mask_email(LOG_LINE.format("alice.smith@example.gov.uk"))),
+            (f"mask_email[{len(long_text) // 1024}KB]", lambda: mask_email(long_text)),
+        ]
+        for size in options["sizes"]:
+            benchmarks += self.assessment_benchmarks(outcomes, size, options["seed"])
+        return benchmarks
+
+    @staticmethod
+    def assessment_benchmarks(outcomes: list[dict], size: int, seed: int) -> list[Benchmark]:
+        """
+        Benchmarks of the functions that read the answers, on an assessment with ``size``
+        percent of the outcomes answered.
+        """
+        assessments_data = synthetic_assessments_data(random.Random(seed), size / 100, outcomes=outcomes)
+        assessment = Assessment(framework="caf32", assessments_data=assessments_data)
+        answered = [outcome for outcome in outcomes if outcome["code"] in assessments_data]
+        return [
+            (
+                f"IndicatorStatusChecker.get_status_for_indicator[{size}%]",
+                lambda: [
+                    IndicatorStatusChecker.get_status_for_indicator(assessments_data[outcome["code"]])
+                    for outcome in answered
+                ],
+            ),
+            (f"Assessment.is_complete[{size}%]", assessment.is_complete),
+            (f"Assessment.is_objective_complete[{size}%]", lambda: assessment.is_objective_complete("B")),
+            (
+                f"generate_assessment_progress_indicators[{size}%]",
+                lambda: generate_assessment_progress_indicators(assessment, "B2.a"),
+            ),
+            (
+                f"get_answers[{size}%]",
+                lambda: [get_answers(assessment, outcome, category) for outcome in answered for category in CATEGORIES],
+            ),
+        ]
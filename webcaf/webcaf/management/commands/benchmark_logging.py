@@ -0,0 +1,96 @@
+import json
+import logging
+import os
+import statistics
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+
+from webcaf.logging_filters import MaskEmailFilter, RequestLogFilter
+from webcaf.logging_handlers import BackgroundQueueHandler, JsonFormatter
+from webcaf.middleware import log_context
+from webcaf.webcaf.utils import mask_email
+
+EMAIL = "benchmark.user@example.gov.uk"
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the time a request spends logging, with the handler writing synchronously and "
+        "eager masking, and with the background queue handler and the masking filter. Each simulated "
+        "request logs a mix of enabled and disabled messages. Prints p50/p95/p99 in microseconds as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=2000, help="Number of simulated requests")
+        parser.add_argument("--info", type=int, default=5, help="INFO messages logged per request")
+        parser.add_argument("--debug", type=int, default=20, help="DEBUG messages, disabled, logged per request")
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as directory:
+            results = {
+                "synchronous_eager_masking": self.run(
+                    "synchronous", os.path.join(directory, "synchronous.log"), options, self.log_eagerly
+                ),
+                "background_lazy_masking": self.run(
+                    "background", os.path.join(directory, "background.log"), options, self.log_lazily
+                ),
+            }
+        self.stdout.write(json.dumps(results, indent=2))
+
+    def run(self, pipeline: str, path: str, options, log_request) -> dict:
+        target = logging.FileHandler(path)
+        target.setFormatter(JsonFormatter())
+        if pipeline == "background":
+            target.set_name(f"benchmark-logging-{os.getpid()}")
+            logging._handlers[target.name] = target
+            handler: logging.Handler = BackgroundQueueHandler(handlers=[target.name])
+            handler.addFilter(MaskEmailFilter())
+        else:
+            handler = target
+        handler.addFilter(RequestLogFilter())
+
+        logger = logging.getLogger(f"benchmark.logging.{pipeline}")
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+        logger.addHandler(handler)
+        token = log_context.set({"user_id": 1, "session_id": "benchmark"})
+        timings = []
+        try:
+            for request in range(options["requests"]):
+                start = time.perf_counter()
+                log_request(logger, request, options)
+                timings.append((time.perf_counter() - start) * 1_000_000)
+        finally:
+            log_context.reset(token)
+            logger.removeHandler(handler)
+            handler.close()
+            target.close()
+            logging._handlers.pop(target.name, None)
+        p50, p95, p99 = (statistics.quantiles(timings, n=100)[i] for i in (49, 94, 98))
+        with open(path) as log_file:
+            written = sum(1 for _ in log_file)
+        return {
+            "requests": len(timings),
+            "records_written": written,
+            "p50_us": round(p50, 1),
+            "p95_us": round(p95, 1),
+            "p99_us": round(p99, 1),
+            "mean_us": round(statistics.fmean(timings), 1),
+        }
+
+    @staticmethod
+    def log_eagerly(logger: logging.Logger, request: int, options):
+        # How the views logged before: the message is built and masked whether or not it is written
+        for i in range(options["info"]):
+            logger.info(mask_email(f"Request {request} step {i} for user {EMAIL}"))
+        for i in range(options["debug"]):
+            logger.debug(mask_email(f"Request {request} detail {i} for user {EMAIL}"))
+
+    @staticmethod
+    def log_lazily(logger: logging.Logger, request: int, options):
+        for i in range(options["info"]):
+            logger.info("Request %s step %s for user %s", request, i, EMAIL)
+        for i in range(options["debug"]):
+            logger.debug("Request %s detail %s for user %s", request, i, EMAIL)
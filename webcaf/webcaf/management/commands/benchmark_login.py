@@ -0,0 +1,199 @@
+import json
+import statistics
+import threading
+import time
+import uuid
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+import jwt
+import requests
+from cryptography.hazmat.primitives.asymmetric import rsa
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from webcaf.auth import OIDCBackend, create_oidc_session
+
+CLIENT_ID = "benchmark-login"
+
+
+class StubOIDCProvider:
+    """
+    Token, userinfo and JWKS endpoints of an identity provider, on a local port. The id
+    tokens are signed with a key made at start up, and carry the authorisation code as
+    their nonce. Counts the connections opened and the requests made to each endpoint.
+    """
+
+    def __init__(self, claims: dict, delay: float = 0.0):
+        self.claims = claims
+        self.delay = delay
+        self.key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        self.kid = uuid.uuid4().hex
+        self.connections = 0
+        self.requests: Counter = Counter()
+        self.lock = threading.Lock()
+        provider = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keeps the connection open between requests, as identity providers do
+            protocol_version = "HTTP/1.1"
+            # The headers and body are written separately, without this a kept open connection waits for delayed ACKs
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                with provider.lock:
+                    provider.connections += 1
+
+            def do_GET(self):
+                provider.count(self.path)
+                if self.path == "/keys":
+                    self.respond(provider.jwks())
+                elif self.path == "/userinfo":
+                    self.respond(provider.claims)
+                else:
+                    self.respond({"error": "not_found"}, 404)
+
+            def do_POST(self):
+                provider.count(self.path)
+                form = parse_qs(self.rfile.read(int(self.headers["Content-Length"])).decode())
+                code = form.get("code", [""])[0]
+                self.respond(
+                    {"access_token": uuid.uuid4().hex, "id_token": provider.id_token(code), "token_type": "Bearer"}
+                )
+
+            def respond(self, data: dict, status: int = 200):
+                content = json.dumps(data).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_port}"
+
+    def count(self, path: str):
+        time.sleep(self.delay)
+        with self.lock:
+            self.requests[path] += 1
+
+    def jwks(self) -> dict:
+        jwk = jwt.algorithms.RSAAlgorithm.to_jwk(self.key.public_key(), as_dict=True)
+        return {"keys": [{**jwk, "kid": self.kid, "alg": "RS256", "use": "sig"}]}
+
+    def id_token(self, nonce: str) -> str:
+        now = int(time.time())
+        claims = {**self.claims, "iss": self.url, "aud": CLIENT_ID, "iat": now, "exp": now + 300, "nonce": nonce}
+        return jwt.encode(claims, self.key, algorithm="RS256", headers={"kid": self.kid})
+
+    def settings(self) -> dict:
+        return {
+            "OIDC_RP_CLIENT_ID": CLIENT_ID,
+            "OIDC_RP_CLIENT_SECRET": "benchmark",  # pragma: allowlist secret
+            "OIDC_RP_SIGN_ALGO": "RS256",
+            "OIDC_TOKEN_AUTH_METHOD": "client_secret_post",
+            "OIDC_OP_TOKEN_ENDPOINT": f"{self.url}/token",
+            "OIDC_OP_USER_ENDPOINT": f"{self.url}/userinfo",
+            "OIDC_OP_JWKS_ENDPOINT": f"{self.url}/keys",
+            "OIDC_RELAX_CLAIMS": False,
+        }
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class UnpooledOIDCBackend(OIDCBackend):
+    """
+    The backend as it was before the shared session and the JWKS cache: a new connection
+    for every request, the keys fetched and the user saved on every login.
+    """
+
+    @property
+    def http(self) -> requests.Session:
+        session = create_oidc_session()
+        # Closes the connection once the response is read
+        session.headers["Connection"] = "close"
+        return session
+
+    def get_jwks(self, refresh=False):
+        return super().get_jwks(refresh=True)
+
+    def update_user(self, user, claims):
+        user = super().update_user(user, claims)
+        user.save()
+        return user
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the OIDC login path (token exchange, id token verification, userinfo and user update) "
+        "against a local stub identity provider, with a new connection per request and the keys "
+        "fetched on every login, then with the shared session and cached keys. Prints the "
+        "p50/p95/p99 latency and the queries, connections and requests made per login as JSON. The users "
+        "created are rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--logins", type=int, default=200, help="Number of logins per run")
+        parser.add_argument(
+            "--latency", type=float, default=0.0, help="Seconds the stub waits before answering each request"
+        )
+
+    def handle(self, *args, **options):
+        claims = {
+            "sub": "benchmark-login",
+            "email": "benchmark-login@example.gov.uk",
+            "given_name": "Benchmark",
+            "family_name": "Login",
+        }
+        results = {}
+        for name, backend_class in [("connection_per_request", UnpooledOIDCBackend), ("pooled", OIDCBackend)]:
+            with StubOIDCProvider(claims, options["latency"]) as provider, override_settings(
+                **provider.settings(), OIDC_JWKS_CACHE_TIMEOUT=3600
+            ):
+                results[name] = self.measure(provider, backend_class(), options["logins"])
+        self.stdout.write(json.dumps(results, indent=2))
+
+    @staticmethod
+    def measure(provider: StubOIDCProvider, backend: OIDCBackend, logins: int) -> dict:
+        factory = RequestFactory()
+        timings = []
+        with transaction.atomic(), CaptureQueriesContext(connection) as queries:
+            for _ in range(logins):
+                code = uuid.uuid4().hex
+                request = factory.get("/oidc/callback/", {"code": code, "state": "benchmark"})
+                request.session = SessionStore()
+                start = time.perf_counter()
+                user = backend.authenticate(request, nonce=code)
+                timings.append((time.perf_counter() - start) * 1000)
+                if not isinstance(user, User):
+                    raise RuntimeError("The stub login failed")
+            transaction.set_rollback(True)
+        quantiles = statistics.quantiles(timings, n=100)
+        return {
+            "logins": logins,
+            "p50_ms": round(quantiles[49], 3),
+            "p95_ms": round(quantiles[94], 3),
+            "p99_ms": round(quantiles[98], 3),
+            "queries_per_login": round(len(queries) / logins, 2),
+            "connections_per_login": round(provider.connections / logins, 2),
+            "requests_per_login": {path: round(count / logins, 2) for path, count in sorted(provider.requests.items())},
+        }
@@ -0,0 +1,110 @@
+import json
+import time
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from django_otp import DEVICE_ID_SESSION_KEY
+
+from webcaf.webcaf.models import GovNotifyEmailDevice, Organisation, System, UserProfile
+
+JOURNEY = [
+    "my-account",
+    "view-draft-assessments",
+    "view-systems",
+    "view-profiles",
+    "view-submitted-assessments",
+]
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Count the session writes of a signed in user browsing the account pages, when the session "
+        "is saved on every request and when the last activity time is coalesced. "
+        "All data is created in a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rounds", type=int, default=10, help="Number of times the journey is repeated")
+        parser.add_argument("--think-time", type=float, default=5.0, help="Simulated seconds between page views")
+        parser.add_argument(
+            "--granularity", type=int, default=None, help="Activity granularity to compare, the setting by default"
+        )
+
+    def handle(self, *args, **options):
+        granularity = options["granularity"]
+        if granularity is None:
+            granularity = settings.SESSION_ACTIVITY_GRANULARITY
+        results = {
+            "save_every_request": self.run(
+                {"SESSION_SAVE_EVERY_REQUEST": True, "SESSION_ACTIVITY_GRANULARITY": 0}, options
+            ),
+            f"coalesced_{granularity}s": self.run(
+                {"SESSION_SAVE_EVERY_REQUEST": False, "SESSION_ACTIVITY_GRANULARITY": granularity}, options
+            ),
+        }
+        self.stdout.write(json.dumps(results, indent=2))
+
+    def run(self, session_settings: dict, options) -> dict:
+        """
+        Sign in a new user and walk the journey with a simulated clock, counting the
+        statements that write the session. Nothing is left in the database afterwards.
+        """
+        writes = []
+
+        def count_session_writes(execute, sql, params, many, context):
+            if sql.startswith(('UPDATE "django_session"', 'INSERT INTO "django_session"')):
+                writes.append(sql)
+            return execute(sql, params, many, context)
+
+        result: dict = {}
+        clock = [time.time()]
+        try:
+            with (
+                override_settings(ALLOWED_HOSTS=["testserver"], **session_settings),
+                transaction.atomic(),
+                patch("webcaf.session.time.time", lambda: clock[0]),
+            ):
+                client = self.sign_in()
+                with connection.execute_wrapper(count_session_writes):
+                    requests = 0
+                    for _ in range(options["rounds"]):
+                        for url_name in JOURNEY:
+                            response = client.get(reverse(url_name))
+                            if response.status_code != 200:
+                                raise RuntimeError(f"{url_name} returned {response.status_code}")
+                            requests += 1
+                            clock[0] += options["think_time"]
+                result = {
+                    "requests": requests,
+                    "session_writes": len(writes),
+                    "writes_per_request": round(len(writes) / requests, 3),
+                }
+                raise Rollback()
+        except Rollback:
+            pass
+        return result
+
+    @staticmethod
+    def sign_in() -> Client:
+        organisation = Organisation.objects.create(name="Session benchmark organisation")
+        System.objects.create(name="Session benchmark system", organisation=organisation)
+        user = User.objects.create_user(username="session-benchmark", email="session-benchmark@example.gov.uk")
+        profile = UserProfile.objects.create(user=user, organisation=organisation, role="cyber_advisor")
+        device = GovNotifyEmailDevice.objects.create(user=user, email=user.email)
+        client = Client()
+        client.force_login(user)
+        session = client.session
+        session["current_profile_id"] = profile.id
+        session[DEVICE_ID_SESSION_KEY] = device.persistent_id
+        session.save()
+        return client
@@ -0,0 +1,86 @@
+import json
+import time
+from datetime import timedelta
+from typing import Callable
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, QuerySet
+from django.utils import timezone
+
+from webcaf.webcaf.models import GovNotifyEmailDevice, NotifyEmail
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete expired sessions, orphaned OTP devices and old sent emails, and clear expired OTP challenges. "
+        "Works in small batches, each in its own transaction, and stops when the time budget "
+        "is used so it can run often. Prints the number of rows changed as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500, help="Number of rows per transaction")
+        parser.add_argument(
+            "--time-budget", type=float, default=60.0, help="Seconds after which no new batch is started"
+        )
+
+    def handle(self, *args, **options):
+        self.batch_size = options["batch_size"]
+        self.deadline = time.monotonic() + options["time_budget"]
+        now = timezone.now()
+        report = {
+            # The range over the indexed expire_date column finds the expired sessions without a table scan
+            "expired_sessions": self.in_batches(Session.objects.filter(expire_date__lt=now), self.delete_batch),
+            "expired_otp_challenges": self.in_batches(
+                GovNotifyEmailDevice.objects.filter(token__isnull=False, valid_until__lt=now), self.clear_challenges
+            ),
+            # A device is looked up by the user's current email, so one for an old email is never used again
+            "orphaned_otp_devices": self.in_batches(
+                GovNotifyEmailDevice.objects.filter(email__isnull=False).exclude(email=F("user__email")),
+                self.delete_batch,
+            ),
+            "sent_notify_emails": self.in_batches(
+                NotifyEmail.objects.filter(
+                    status="sent", sent_at__lt=now - timedelta(days=settings.NOTIFY_SENT_RETENTION_DAYS)
+                ),
+                self.delete_batch,
+            ),
+        }
+        report["completed"] = time.monotonic() < self.deadline
+        self.stdout.write(json.dumps(report, indent=2))
+        if not report["completed"]:
+            self.stderr.write(self.style.WARNING("Time budget used up, run the command again to remove the rest"))
+
+    def in_batches(self, queryset: QuerySet, process: Callable[[QuerySet], int]) -> int:
+        """
+        Apply ``process`` to the rows of the queryset, one batch per transaction, until no rows
+        are left or the time budget is used.
+
+        :return: The number of rows processed.
+        """
+        model = queryset.model
+        pk_name = model._meta.pk.name
+        total = 0
+        while time.monotonic() < self.deadline:
+            with transaction.atomic():
+                # Rows locked by a request are left for the next run instead of waiting for them
+                batch_pks = list(
+                    queryset.select_for_update(skip_locked=True, of=("self",))
+                    .order_by()
+                    .values_list(pk_name, flat=True)[: self.batch_size]
+                )
+                if not batch_pks:
+                    break
+                total += process(model.objects.filter(**{f"{pk_name}__in": batch_pks}))
+        return total
+
+    @staticmethod
+    def delete_batch(batch: QuerySet) -> int:
+        deleted, _ = batch.delete()
+        return deleted
+
+    @staticmethod
+    def clear_challenges(batch: QuerySet) -> int:
+        return batch.update(token=None)
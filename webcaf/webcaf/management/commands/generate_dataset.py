@@ -0,0 +1,292 @@
+import json
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import override_settings
+from django.utils import timezone
+from django.utils.text import slugify
+
+from webcaf.webcaf.history import get_checkpoint_interval
+from webcaf.webcaf.models import Assessment, Organisation, System, UserProfile
+from webcaf.webcaf.utils.json_patch import make_patch
+from webcaf.webcaf.utils.references import reserve_ids
+from webcaf.webcaf.utils.synthetic import caf32_outcomes, synthetic_assessments_data
+
+# Share of the outcomes answered in draft assessments, submitted assessments answer all of them
+DRAFT_COMPLETION = [0.0, 0.1, 0.25, 0.5, 0.75, 0.9, 1.0]
+STATUSES = ["submitted", "draft"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a large synthetic dataset of organisations, systems, users and assessments with "
+        "their history, for checking performance at production scale. The same seed gives the same "
+        "data. Everything is named with --prefix, and --delete removes it again."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--organisations", type=int, default=100, help="Number of organisations")
+        parser.add_argument(
+            "--sub-organisations",
+            type=float,
+            default=0.3,
+            help="Share of the organisations that have a parent organisation",
+        )
+        parser.add_argument("--systems", type=int, default=1000, help="Number of systems")
+        parser.add_argument("--assessments", type=int, default=4000, help="Number of assessments")
+        parser.add_argument(
+            "--periods",
+            nargs="+",
+            default=["23/24", "24/25", "25/26"],
+            help="Assessment periods the assessments are spread across",
+        )
+        parser.add_argument("--versions", type=int, default=3, help="Saved versions in the history of each assessment")
+        parser.add_argument("--users", type=int, default=300, help="Number of organisation users")
+        parser.add_argument("--advisors", type=int, default=10, help="Number of cyber advisors")
+        parser.add_argument("--seed", type=int, default=1, help="Seed for the generated data")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Rows inserted per statement")
+        parser.add_argument("--prefix", default="Synthetic", help="Prefix of the names of the generated data")
+        parser.add_argument("--delete", action="store_true", help="Delete the data generated with --prefix")
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.slug = slugify(options["prefix"])
+        if options["delete"]:
+            self.delete()
+            return
+        if Organisation.objects.filter(name__startswith=f"{options['prefix']} organisation ").exists():
+            raise CommandError(f"Data with the prefix {options['prefix']} exists, remove it with --delete first")
+        slots = options["systems"] * len(options["periods"]) * len(STATUSES)
+        if options["assessments"] > slots:
+            raise CommandError(
+                f"At most {slots} assessments fit {options['systems']} systems and {len(options['periods'])} periods"
+            )
+
+        rng = random.Random(options["seed"])
+        start = time.perf_counter()
+        organisation_ids = self.create_organisations(rng)
+        systems = self.create_systems(rng, organisation_ids)
+        leads = self.create_users(rng, organisation_ids)
+        history_records = self.create_assessments(rng, systems, leads)
+        self.stdout.write(
+            json.dumps(
+                {
+                    "organisations": len(organisation_ids),
+                    "systems": len(systems),
+                    "users": options["users"] + options["advisors"],
+                    "assessments": options["assessments"],
+                    "assessment_history_records": history_records,
+                    "seconds": round(time.perf_counter() - start, 1),
+                }
+            )
+        )
+
+    def bulk_create(self, model, objects: list, history: bool = True) -> list:
+        batch_size = self.options["batch_size"]
+        for start in range(0, len(objects), batch_size):
+            batch = objects[start : start + batch_size]
+            with transaction.atomic():
+                model.objects.bulk_create(batch)
+                if history:
+                    model.history.bulk_history_create(batch, default_date=timezone.now())
+        self.stdout.write(f"Created {len(objects)} {model._meta.verbose_name_plural}")
+        return objects
+
+    def create_organisations(self, rng: random.Random) -> list[int]:
+        count = self.options["organisations"]
+        ids = reserve_ids(Organisation, count)
+        top_level = max(1, round(count * (1 - self.options["sub_organisations"])))
+        types = [choice[0] for choice in Organisation.ORGANISATION_TYPE_CHOICES]
+        organisations = []
+        for index, pk in enumerate(ids):
+            number = f"{index + 1:05d}"
+            organisations.append(
+                Organisation(
+                    id=pk,
+                    name=f"{self.options['prefix']} organisation {number}",
+                    organisation_type=rng.choice(types),
+                    contact_name=f"Contact {number}",
+                    contact_email=f"{self.slug}-contact-{number}@example.gov.uk",
+                    contact_role="Head of cyber security",
+                    # Any earlier organisation, so the hierarchies are several levels deep
+                    parent_organisation_id=ids[rng.randrange(index)] if index >= top_level else None,
+                )
+            )
+        self.bulk_create(Organisation, organisations)
+        return ids
+
+    def create_systems(self, rng: random.Random, organisation_ids: list[int]) -> list[tuple[int, int]]:
+        """
+        :return: The id and organisation id of every system.
+        """
+        count = self.options["systems"]
+        ids = reserve_ids(System, count)
+        systems = []
+        for index, pk in enumerate(ids):
+            systems.append(
+                System(
+                    id=pk,
+                    name=f"{self.options['prefix']} system {index + 1:06d}",
+                    description="A system generated for performance testing",
+                    organisation_id=rng.choice(organisation_ids),
+                    system_type=rng.choice(System.SYSTEM_TYPES)[0],
+                    system_owner=[rng.choice(System.OWNER_TYPES)[0]],
+                    hosting_type=[rng.choice(System.HOSTING_TYPES)[0]],
+                    last_assessed=rng.choice(System.ASSESSED_CHOICES)[0],
+                    corporate_services=rng.sample([service[0] for service in System.CORPORATE_SERVICES], k=2),
+                )
+            )
+        self.bulk_create(System, systems)
+        return [(system.id, system.organisation_id) for system in systems]
+
+    def create_users(self, rng: random.Random, organisation_ids: list[int]) -> dict[int, int]:
+        """
+        Every organisation gets a lead while there are users left, the rest are spread
+        across the organisations.
+
+        :return: The user id of the lead of each organisation.
+        """
+        password = make_password(None)
+        users = []
+        roles = []
+        for index in range(self.options["users"] + self.options["advisors"]):
+            if index >= self.options["users"]:
+                role = "cyber_advisor"
+                organisation_id = rng.choice(organisation_ids)
+            elif index < len(organisation_ids):
+                role = "organisation_lead"
+                organisation_id = organisation_ids[index]
+            else:
+                role = rng.choice(["organisation_lead", "organisation_user", "organisation_user"])
+                organisation_id = rng.choice(organisation_ids)
+            email = f"{self.slug}-user-{index + 1:06d}@example.gov.uk"
+            users.append(User(username=email, email=email, password=password))
+            roles.append((role, organisation_id))
+        self.bulk_create(User, users, history=False)
+
+        profiles = [
+            UserProfile(user_id=user.id, organisation_id=organisation_id, role=role)
+            for user, (role, organisation_id) in zip(users, roles)
+        ]
+        self.bulk_create(UserProfile, profiles)
+        leads: dict[int, int] = {}
+        for profile in profiles:
+            if profile.role == "organisation_lead":
+                leads.setdefault(profile.organisation_id, profile.user_id)
+        return leads
+
+    def create_assessments(self, rng: random.Random, systems: list[tuple[int, int]], leads: dict[int, int]) -> int:
+        """
+        Create the assessments, at most one per system, period and status, each with a
+        history of versions answering more of the outcomes.
+
+        :return: The number of history records created.
+        """
+        count = self.options["assessments"]
+        periods = self.options["periods"]
+        batch_size = self.options["batch_size"]
+        per_system = len(periods) * len(STATUSES)
+        # Sorted so the rows are inserted in system order, like they would be over time
+        slots = sorted(rng.sample(range(len(systems) * per_system), count))
+        ids = reserve_ids(Assessment, count)
+        outcomes = caf32_outcomes()
+        now = timezone.now()
+        history_records = 0
+        for start in range(0, count, batch_size):
+            assessments = []
+            for pk, slot in zip(ids[start : start + batch_size], slots[start : start + batch_size]):
+                system_id, organisation_id = systems[slot // per_system]
+                status = STATUSES[slot % len(STATUSES)]
+                completion = 1.0 if status == "submitted" else rng.choice(DRAFT_COMPLETION)
+                user_id = leads.get(organisation_id)
+                assessments.append(
+                    Assessment(
+                        id=pk,
+                        system_id=system_id,
+                        status=status,
+                        assessment_period=periods[slot // len(STATUSES) % len(periods)],
+                        framework="caf32",
+                        caf_profile=rng.choice(Assessment.PROFILE_CHOICES)[0],
+                        review_type=rng.choice(Assessment.REVIEW_TYPE_CHOICES)[0],
+                        created_by_id=user_id,
+                        last_updated_by_id=user_id,
+                        assessments_data=synthetic_assessments_data(rng, completion, outcomes=outcomes),
+                        first_submitted_at=now if status == "submitted" else None,
+                        first_submitted_by_id=user_id if status == "submitted" else None,
+                    )
+                )
+            with transaction.atomic():
+                Assessment.objects.bulk_create(assessments)
+                history_records += self.create_assessment_history(assessments, now)
+            self.stdout.write(f"Created {start + len(assessments)} of {count} assessments")
+        return history_records
+
+    def create_assessment_history(self, assessments: list[Assessment], now) -> int:
+        """
+        Write the history of the assessments as ``DeltaHistoricalRecords`` would have saved it:
+        checkpoints every ``HISTORY_CHECKPOINT_INTERVAL`` versions and patches in between.
+        Each version answers a larger part of the outcomes, the last one is the assessment.
+        """
+        history_model = Assessment.history.model
+        interval = get_checkpoint_interval()
+        versions = self.options["versions"]
+        answers = [list(assessment.assessments_data.items()) for assessment in assessments]
+        base_ids: list[int | None] = [None] * len(assessments)
+        base_data: list[dict] = [{}] * len(assessments)
+        for version in range(1, versions + 1):
+            depth = (version - 1) % interval
+            records = []
+            for index, assessment in enumerate(assessments):
+                data = dict(answers[index][: round(len(answers[index]) * version / versions)])
+                values = {field.attname: getattr(assessment, field.attname) for field in Assessment._meta.fields}
+                values.update(
+                    assessments_data=make_patch(base_data[index], data) if depth else data,
+                    status=assessment.status if version == versions else "draft",
+                    last_updated=now - timedelta(hours=versions - version),
+                )
+                records.append(
+                    history_model(
+                        **values,
+                        history_date=values["last_updated"],
+                        history_type="+" if version == 1 else "~",
+                        history_user_id=assessment.last_updated_by_id,
+                        history_delta_base=base_ids[index] if depth else None,
+                        history_delta_depth=depth,
+                    )
+                )
+                base_data[index] = data
+            history_model.objects.bulk_create(records)
+            base_ids = [record.history_id for record in records]
+        return versions * len(assessments)
+
+    def delete(self):
+        """
+        Delete the generated data with its history. The history of the deletions themselves
+        is not recorded.
+        """
+        prefix = self.options["prefix"]
+        organisation_ids = list(
+            Organisation.objects.filter(name__startswith=f"{prefix} organisation ")
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+        batch_size = max(1, self.options["batch_size"] // 100)
+        with override_settings(SIMPLE_HISTORY_ENABLED=False):
+            for start in range(0, len(organisation_ids), batch_size):
+                batch = organisation_ids[start : start + batch_size]
+                with transaction.atomic():
+                    system_ids = list(System.objects.filter(organisation_id__in=batch).values_list("id", flat=True))
+                    Assessment.history.model.objects.filter(system_id__in=system_ids).delete()
+                    Assessment.objects.filter(system_id__in=system_ids).delete()
+                    System.history.model.objects.filter(organisation_id__in=batch).delete()
+                    UserProfile.history.model.objects.filter(organisation_id__in=batch).delete()
+                    Organisation.history.model.objects.filter(id__in=batch).delete()
+                    Organisation.objects.filter(id__in=batch).delete()
+                self.stdout.write(f"Deleted {start + len(batch)} of {len(organisation_ids)} organisations")
+            User.objects.filter(username__startswith=f"{self.slug}-user-").delete()
+        self.stdout.write(self.style.SUCCESS(f"Deleted the data with the prefix {prefix}"))
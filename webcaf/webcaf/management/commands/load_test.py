@@ -0,0 +1,318 @@
+import json
+import re
+import statistics
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin
+
+import requests
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from webcaf.webcaf.frameworks import routers
+from webcaf.webcaf.models import Organisation, System, UserProfile
+
+CSRF_TOKEN_RE = re.compile(r'name="csrfmiddlewaretoken" value="([^"]+)"')
+USERNAME_PREFIX = "loadtest-"
+ORGANISATION_PREFIX = "Load test organisation"
+
+
+class JourneyFailed(Exception):
+    pass
+
+
+class Recorder:
+    """
+    Collects the latency and outcome of every request, from all the virtual users.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+        self.journeys = {"completed": 0, "failed": 0}
+
+    def record(self, name: str, latency_ms: float, ok: bool):
+        with self.lock:
+            self.latencies[name].append(latency_ms)
+            if not ok:
+                self.errors[name] += 1
+
+    def journey(self, completed: bool):
+        with self.lock:
+            self.journeys["completed" if completed else "failed"] += 1
+
+    def report(self, elapsed: float) -> dict:
+        total = sum(len(latencies) for latencies in self.latencies.values())
+        errors = sum(self.errors.values())
+        return {
+            "duration_s": round(elapsed, 2),
+            "requests": total,
+            "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+            "error_rate": round(errors / total, 4) if total else 0.0,
+            "journeys": self.journeys,
+            "urls": {name: self.summarise(name) for name in sorted(self.latencies)},
+        }
+
+    def summarise(self, name: str) -> dict:
+        latencies = self.latencies[name]
+        if len(latencies) > 1:
+            quantiles = statistics.quantiles(latencies, n=100)
+            p50, p95, p99 = quantiles[49], quantiles[94], quantiles[98]
+        else:
+            p50 = p95 = p99 = latencies[0]
+        return {
+            "requests": len(latencies),
+            "error_rate": round(self.errors[name] / len(latencies), 4),
+            "p50_ms": round(p50, 1),
+            "p95_ms": round(p95, 1),
+            "p99_ms": round(p99, 1),
+            "mean_ms": round(statistics.fmean(latencies), 1),
+        }
+
+
+class VirtualUser:
+    """
+    A signed in user with its own cookies, requesting pages from the server under test.
+    """
+
+    def __init__(self, base_url: str, session_key: str, recorder: Recorder, think_time: float):
+        self.base_url = base_url
+        self.recorder = recorder
+        self.think_time = think_time
+        self.http = requests.Session()
+        self.http.cookies.set(settings.SESSION_COOKIE_NAME, session_key)
+        self.csrf_token = ""
+
+    def get(self, name: str, path: str, expected_status: int = 200) -> requests.Response:
+        return self.request("GET", name, path, expected_status)
+
+    def post(self, name: str, path: str, data: dict, expected_status: int = 302) -> requests.Response:
+        return self.request("POST", name, path, expected_status, data={"csrfmiddlewaretoken": self.csrf_token, **data})
+
+    def request(self, method: str, name: str, path: str, expected_status: int, data=None) -> requests.Response:
+        if self.think_time:
+            time.sleep(self.think_time)
+        start = time.perf_counter()
+        try:
+            response = self.http.request(
+                method,
+                urljoin(self.base_url, path),
+                data=data,
+                allow_redirects=False,
+                headers={"Referer": urljoin(self.base_url, path)},
+                timeout=60,
+            )
+        except requests.RequestException as e:
+            self.recorder.record(f"{method} {name}", (time.perf_counter() - start) * 1000, ok=False)
+            raise JourneyFailed(f"{method} {path}: {e}") from e
+        # The server under test is usually reached over plain HTTP, keep the cookies it marks as secure
+        for cookie in response.cookies:
+            self.http.cookies.set(cookie.name, cookie.value)
+        ok = response.status_code == expected_status
+        self.recorder.record(f"{method} {name}", (time.perf_counter() - start) * 1000, ok=ok)
+        if not ok:
+            raise JourneyFailed(f"{method} {path} returned {response.status_code}, expected {expected_status}")
+        match = CSRF_TOKEN_RE.search(response.text) if "html" in response.headers.get("Content-Type", "") else None
+        if match:
+            self.csrf_token = match.group(1)
+        return response
+
+
+class Command(BaseCommand):
+    help = (
+        "Load test a running server with organisation leads completing and submitting a CAF 3.2 "
+        "assessment, while cyber advisors browse the submitted assessments and download PDFs. "
+        "Creates its users and organisations in the database the server uses, so point it at a "
+        "disposable database, and signs them in by creating their sessions directly. "
+        "Prints the latency percentiles of every URL name, the throughput and the error rates as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--base-url", default="http://localhost:8010", help="Server under test")
+        parser.add_argument("--leads", type=int, default=5, help="Concurrent organisation leads")
+        parser.add_argument("--advisors", type=int, default=2, help="Concurrent cyber advisors")
+        parser.add_argument("--think-time", type=float, default=0.0, help="Seconds between requests of a user")
+        parser.add_argument("--ramp-up", type=float, default=0.0, help="Seconds over which the users are started")
+        parser.add_argument("--output", help="Also write the report to this file")
+        parser.add_argument("--cleanup", action="store_true", help="Delete the users and organisations created")
+
+    def handle(self, *args, **options):
+        if options["cleanup"]:
+            self.cleanup()
+            return
+        if options["leads"] < 1:
+            raise CommandError("At least one organisation lead is needed")
+        self.options = options
+        self.recorder = Recorder()
+        self.answers = self.build_answers()
+        self.leads_running = threading.Event()
+        self.leads_running.set()
+        self.submitted: dict[int, list[int]] = defaultdict(list)
+        self.submitted_lock = threading.Lock()
+        # The virtual users only make HTTP requests, the database is used before they start
+        self.systems: dict[int, int] = {}
+
+        leads, advisors = self.seed(options["leads"], options["advisors"])
+        users = leads + advisors
+        delay = options["ramp_up"] / len(users) if options["ramp_up"] else 0.0
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(users)) as executor:
+            lead_futures = []
+            for index, (organisation_id, session_key) in enumerate(leads):
+                lead_futures.append(executor.submit(self.lead_journey, organisation_id, session_key, index * delay))
+            for index, (organisation_id, session_key) in enumerate(advisors, start=len(leads)):
+                executor.submit(self.advisor_journey, organisation_id, session_key, index * delay)
+            for future in lead_futures:
+                future.result()
+            self.leads_running.clear()
+        report = self.recorder.report(time.perf_counter() - start)
+        report["users"] = {"leads": len(leads), "advisors": len(advisors)}
+
+        output = json.dumps(report, indent=2)
+        self.stdout.write(output)
+        if options["output"]:
+            with open(options["output"], "w") as output_file:
+                output_file.write(output)
+
+    def seed(self, lead_count: int, advisor_count: int) -> tuple[list, list]:
+        """
+        Create an organisation with a system for each lead and share the advisors between them.
+
+        :return: The organisation and session key of every lead and advisor.
+        """
+        run = uuid.uuid4().hex[:8]
+        leads = []
+        organisations = []
+        for index in range(lead_count):
+            organisation = Organisation.objects.create(name=f"{ORGANISATION_PREFIX} {run}-{index}")
+            system = System.objects.create(name=f"Load test system {run}-{index}", organisation=organisation)
+            self.systems[organisation.id] = system.id
+            organisations.append(organisation)
+            leads.append((organisation.id, self.sign_in(f"{run}-lead-{index}", organisation, "organisation_lead")))
+        advisors = []
+        for index in range(advisor_count):
+            organisation = organisations[index % len(organisations)]
+            advisors.append((organisation.id, self.sign_in(f"{run}-advisor-{index}", organisation, "cyber_advisor")))
+        return leads, advisors
+
+    @staticmethod
+    def sign_in(name: str, organisation: Organisation, role: str) -> str:
+        user = User.objects.create_user(username=f"{USERNAME_PREFIX}{name}", email=f"{name}@loadtest.example.gov.uk")
+        UserProfile.objects.create(user=user, organisation=organisation, role=role)
+        session = SessionStore()
+        session[SESSION_KEY] = str(user.pk)
+        session[BACKEND_SESSION_KEY] = "django.contrib.auth.backends.ModelBackend"
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.create()
+        return session.session_key
+
+    @staticmethod
+    def build_answers() -> dict[str, tuple[dict, dict]]:
+        """
+        Indicator and confirmation form data achieving every CAF 3.2 outcome.
+        """
+        answers = {}
+        for objective in routers["caf32"].get_sections():
+            for principle in objective["principles"].values():
+                for outcome_id, outcome in principle["outcomes"].items():
+                    indicators = {}
+                    for category, statements in outcome["indicators"].items():
+                        for statement_id in statements:
+                            indicators[f"{category}_{statement_id}"] = category == "achieved"
+                            indicators[f"{category}_{statement_id}_comment"] = ""
+                    confirmation = {"confirm_outcome": "confirm", "confirm_outcome_confirm_comment": "Load test"}
+                    answers[outcome_id] = (indicators, confirmation)
+        return answers
+
+    def lead_journey(self, organisation_id: int, session_key: str, delay: float):
+        time.sleep(delay)
+        user = VirtualUser(self.options["base_url"], session_key, self.recorder, self.options["think_time"])
+        try:
+            user.get("my-account", reverse("my-account"))
+            user.get("create-draft-assessment", reverse("create-draft-assessment"))
+            user.get("create-draft-assessment-system", reverse("create-draft-assessment-system"))
+            user.post(
+                "create-draft-assessment-system",
+                reverse("create-draft-assessment-system"),
+                {"system": self.systems[organisation_id]},
+            )
+            user.get("create-draft-assessment-profile", reverse("create-draft-assessment-profile"))
+            user.post(
+                "create-draft-assessment-profile",
+                reverse("create-draft-assessment-profile"),
+                {"caf_profile": "baseline"},
+            )
+            review_type_url = reverse("create-draft-assessment-choose-review-type")
+            user.get("create-draft-assessment-choose-review-type", review_type_url)
+            response = user.post(
+                "create-draft-assessment-choose-review-type", review_type_url, {"review_type": "peer_review"}
+            )
+            edit_url = response.headers["Location"]
+            assessment_id = int(re.search(r"/(\d+)/$", edit_url).group(1))
+            user.get("edit-draft-assessment", edit_url)
+
+            for outcome_id, (indicators, confirmation) in self.answers.items():
+                indicators_url = reverse(f"caf32_indicators_{outcome_id}")
+                confirmation_url = reverse(f"caf32_confirmation_{outcome_id}")
+                user.get("caf32_indicators", indicators_url)
+                user.post("caf32_indicators", indicators_url, indicators)
+                user.get("caf32_confirmation", confirmation_url)
+                user.post("caf32_confirmation", confirmation_url, confirmation)
+
+            user.get("objective-confirmation", reverse("objective-confirmation"))
+            user.post("objective-confirmation", reverse("objective-confirmation"), {})
+            user.get("show-submission-confirmation", reverse("show-submission-confirmation"))
+        except JourneyFailed as e:
+            self.stderr.write(f"Lead journey failed: {e}")
+            self.recorder.journey(completed=False)
+            return
+        with self.submitted_lock:
+            self.submitted[organisation_id].append(assessment_id)
+        self.recorder.journey(completed=True)
+
+    def advisor_journey(self, organisation_id: int, session_key: str, delay: float):
+        time.sleep(delay)
+        user = VirtualUser(self.options["base_url"], session_key, self.recorder, self.options["think_time"])
+        downloaded: set[int] = set()
+        try:
+            user.get("my-account", reverse("my-account"))
+            while True:
+                # One more pass after the leads finish, for the last submissions
+                leads_finished = not self.leads_running.is_set()
+                user.get("view-submitted-assessments", reverse("view-submitted-assessments"))
+                with self.submitted_lock:
+                    new = [
+                        assessment_id
+                        for assessment_id in self.submitted[organisation_id]
+                        if assessment_id not in downloaded
+                    ]
+                for assessment_id in new:
+                    user.get(
+                        "view-submitted-assessment",
+                        reverse("view-submitted-assessment", kwargs={"assessment_id": assessment_id}),
+                    )
+                    user.get(
+                        "download-submitted-assessment",
+                        reverse("download-submitted-assessment", kwargs={"assessment_id": assessment_id}),
+                    )
+                    downloaded.add(assessment_id)
+                if leads_finished:
+                    break
+                if not new:
+                    # Browse at a steady rate rather than as fast as possible while there is nothing new
+                    time.sleep(max(self.options["think_time"], 1.0))
+        except JourneyFailed as e:
+            self.stderr.write(f"Advisor journey failed: {e}")
+
+    def cleanup(self):
+        users, _ = User.objects.filter(username__startswith=USERNAME_PREFIX).delete()
+        organisations, _ = Organisation.objects.filter(name__startswith=ORGANISATION_PREFIX).delete()
+        self.stdout.write(f"Deleted {users} user and {organisations} organisation rows")
@@ -0,0 +1,44 @@
+import json
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from webcaf.webcaf.organisation_import import claim_import, run_import
+
+
+class Command(BaseCommand):
+    help = (
+        "Import the organisation CSVs queued from the admin, one at a time, recording the rows "
+        "read so far on each import. Runs until stopped, checking for new imports every poll "
+        "interval, or with --once until none is queued. Prints the number of imports completed "
+        "and failed as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--poll-interval", type=float, default=5.0, help="Seconds to wait when none is queued")
+        parser.add_argument("--once", action="store_true", help="Stop when no import is queued")
+
+    def handle(self, *args, **options):
+        stop = threading.Event()
+        handlers = {signum: signal.signal(signum, lambda *_: stop.set()) for signum in (signal.SIGTERM, signal.SIGINT)}
+        totals = {"completed": 0, "failed": 0}
+        try:
+            while not stop.is_set():
+                # The worker runs for a long time, so it drops connections the database closed
+                close_old_connections()
+                job = claim_import()
+                if job:
+                    status = run_import(job).status
+                    # Not counted when another worker took the import
+                    if status in totals:
+                        totals[status] += 1
+                elif options["once"]:
+                    break
+                else:
+                    stop.wait(options["poll_interval"])
+        finally:
+            for signum, handler in handlers.items():
+                signal.signal(signum, handler)
+        self.stdout.write(json.dumps(totals, indent=2))
@@ -0,0 +1,42 @@
+import json
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from webcaf.webcaf.notification import send_due_emails
+
+
+class Command(BaseCommand):
+    help = (
+        "Send the queued GOV.UK Notify emails, several at a time, and retry the ones that fail. "
+        "Runs until stopped, checking for new emails every poll interval, or with --once until "
+        "no email is due. Prints the number of emails sent, retried and failed as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=50, help="Number of emails claimed at a time")
+        parser.add_argument("--concurrency", type=int, default=4, help="Number of emails sent at the same time")
+        parser.add_argument("--poll-interval", type=float, default=1.0, help="Seconds to wait when no email is due")
+        parser.add_argument("--once", action="store_true", help="Stop when no email is due")
+
+    def handle(self, *args, **options):
+        stop = threading.Event()
+        handlers = {signum: signal.signal(signum, lambda *_: stop.set()) for signum in (signal.SIGTERM, signal.SIGINT)}
+        totals = {"claimed": 0, "sent": 0, "retried": 0, "failed": 0}
+        try:
+            while not stop.is_set():
+                # The worker runs for a long time, so it drops connections the database closed
+                close_old_connections()
+                counts = send_due_emails(options["batch_size"], options["concurrency"])
+                for key, value in counts.items():
+                    totals[key] += value
+                if counts["claimed"] < options["batch_size"]:
+                    if options["once"]:
+                        break
+                    stop.wait(options["poll_interval"])
+        finally:
+            for signum, handler in handlers.items():
+                signal.signal(signum, handler)
+        self.stdout.write(json.dumps(totals, indent=2))
@@ -0,0 +1,58 @@
+"""
+Process-local metrics, served as JSON by the internal metrics endpoint.
+
+Every gunicorn worker keeps its own numbers, so each response describes the worker that
+handled the request. Collectors are registered by name and called on every read.
+"""
+
+import os
+from typing import Any, Callable
+
+from django.db import connections
+
+_collectors: dict[str, Callable[[], dict[str, Any]]] = {}
+
+
+def register_collector(name: str, collector: Callable[[], dict[str, Any]]):
+    """
+    Add a section to the metrics output.
+
+    :param name: Key of the section in the output.
+    :param collector: Function returning the current values of the section.
+    """
+    _collectors[name] = collector
+
+
+def collect_metrics() -> dict[str, Any]:
+    """
+    :return: The current values of every registered collector, for this worker.
+    """
+    return {"pid": os.getpid(), **{name: collector() for name, collector in _collectors.items()}}
+
+
+def database_pool_metrics() -> dict[str, Any]:
+    """
+    Usage of the connection pool of every database alias that has one.
+
+    ``checkouts`` counts connections handed out, ``average_wait_ms`` is the mean time a
+    request waited for one and ``saturation`` is the fraction of the maximum pool size
+    currently checked out.
+    """
+    pools = {}
+    for alias in connections:
+        pool = getattr(connections[alias], "pool", None)
+        if pool is None:
+            continue
+        stats = pool.get_stats()
+        checkouts = stats.get("requests_num", 0)
+        in_use = stats.get("pool_size", 0) - stats.get("pool_available", 0)
+        pools[alias] = {
+            **stats,
+            "checkouts": checkouts,
+            "average_wait_ms": stats.get("requests_wait_ms", 0) / checkouts if checkouts else 0.0,
+            "saturation": in_use / stats["pool_max"] if stats.get("pool_max") else 0.0,
+        }
+    return pools
+
+
+register_collector("database_pools", database_pool_metrics)
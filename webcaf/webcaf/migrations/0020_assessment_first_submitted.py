@@ -0,0 +1,83 @@
+# Generated by Django 5.1.15 on 2026-10-19 08:06
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+BACKFILL_BATCH_SIZE = 500
+
+
+def backfill_first_submitted(apps, schema_editor):
+    """
+    Replays the status changes in the history table, one batch of assessments at a time,
+    to find the first draft -> submitted transition and record it on the assessment.
+    """
+    Assessment = apps.get_model("webcaf", "Assessment")
+    HistoricalAssessment = apps.get_model("webcaf", "HistoricalAssessment")
+
+    assessment_ids = list(
+        Assessment.objects.filter(first_submitted_at__isnull=True).order_by("id").values_list("id", flat=True)
+    )
+    for start in range(0, len(assessment_ids), BACKFILL_BATCH_SIZE):
+        batch_ids = assessment_ids[start : start + BACKFILL_BATCH_SIZE]
+        histories = (
+            HistoricalAssessment.objects.filter(id__in=batch_ids)
+            .order_by("id", "history_date")
+            .values_list("id", "status", "history_date", "last_updated_by_id")
+        )
+        first_submitted: dict[int, tuple] = {}
+        prev_status: dict[int, str] = {}
+        for aid, status, history_date, last_updated_by_id in histories:
+            if prev_status.get(aid) == "draft" and status == "submitted" and aid not in first_submitted:
+                first_submitted[aid] = (history_date, last_updated_by_id)
+            prev_status[aid] = status
+
+        to_update = []
+        for assessment in Assessment.objects.filter(id__in=first_submitted.keys()).only("id"):
+            assessment.first_submitted_at, assessment.first_submitted_by_id = first_submitted[assessment.id]
+            to_update.append(assessment)
+        Assessment.objects.bulk_update(to_update, ["first_submitted_at", "first_submitted_by"])
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("webcaf", "0019_historicalsystem_corporate_services_other_and_more"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="assessment",
+            name="first_submitted_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="assessment",
+            name="first_submitted_by",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="assessments_first_submitted",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddField(
+            model_name="historicalassessment",
+            name="first_submitted_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="historicalassessment",
+            name="first_submitted_by",
+            field=models.ForeignKey(
+                blank=True,
+                db_constraint=False,
+                null=True,
+                on_delete=django.db.models.deletion.DO_NOTHING,
+                related_name="+",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.RunPython(code=backfill_first_submitted, reverse_code=migrations.RunPython.noop),
+    ]
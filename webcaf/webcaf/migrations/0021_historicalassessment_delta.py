@@ -0,0 +1,22 @@
+# Generated by Django 5.1.15 on 2026-10-19 08:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("webcaf", "0020_assessment_first_submitted"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="historicalassessment",
+            name="history_delta_base",
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="historicalassessment",
+            name="history_delta_depth",
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+    ]
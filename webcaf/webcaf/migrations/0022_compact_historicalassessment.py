@@ -0,0 +1,143 @@
+"""
+The compaction is copied here rather than imported from webcaf.webcaf.history, so later
+changes to how history is stored cannot change what this migration does.
+"""
+
+import copy
+import logging
+from typing import Any
+
+from django.conf import settings
+from django.db import migrations, transaction
+
+logger = logging.getLogger(__name__)
+
+COMPACTION_BATCH_SIZE = 100
+DEFAULT_CHECKPOINT_INTERVAL = 20
+DELTA_FIELD = "assessments_data"
+UPDATE_FIELDS = [DELTA_FIELD, "history_delta_base", "history_delta_depth"]
+
+
+def _escape(key: str) -> str:
+    return key.replace("~", "~0").replace("/", "~1")
+
+
+def _unescape(token: str) -> str:
+    return token.replace("~1", "/").replace("~0", "~")
+
+
+def make_patch(source: Any, target: Any, path: str = "") -> list[dict[str, Any]]:
+    if isinstance(source, dict) and isinstance(target, dict):
+        operations: list[dict[str, Any]] = []
+        for key in source.keys() - target.keys():
+            operations.append({"op": "remove", "path": f"{path}/{_escape(key)}"})
+        for key, value in target.items():
+            key_path = f"{path}/{_escape(key)}"
+            if key not in source:
+                operations.append({"op": "add", "path": key_path, "value": value})
+            elif source[key] != value or type(source[key]) is not type(value):
+                operations.extend(make_patch(source[key], value, key_path))
+        return operations
+    if source == target and type(source) is type(target):
+        return []
+    return [{"op": "replace", "path": path, "value": target}]
+
+
+def apply_patch(document: Any, patch: list[dict[str, Any]]) -> Any:
+    result = copy.deepcopy(document)
+    for operation in patch:
+        if operation["path"] == "":
+            result = copy.deepcopy(operation["value"])
+            continue
+        *parents, last = [_unescape(token) for token in operation["path"].split("/")[1:]]
+        container = result
+        for token in parents:
+            container = container[token]
+        if operation["op"] == "remove":
+            del container[last]
+        else:
+            container[last] = copy.deepcopy(operation["value"])
+    return result
+
+
+def _batches(object_ids: list, batch_size: int):
+    for start in range(0, len(object_ids), batch_size):
+        yield start + min(batch_size, len(object_ids) - start), object_ids[start : start + batch_size]
+
+
+def _records(history_model, batch_ids: list):
+    return (
+        history_model.objects.select_for_update()
+        .filter(id__in=batch_ids)
+        .order_by("id", "history_id")
+        .only("id", "history_id", *UPDATE_FIELDS)
+    )
+
+
+def compact_assessment_history(apps, schema_editor):
+    """
+    Rewrites the existing full copies of assessments_data in the history table as
+    patches. Each batch of assessments is committed separately, so a large history table
+    is not locked for the whole migration and an interrupted run can be restarted.
+    """
+    history_model = apps.get_model("webcaf", "HistoricalAssessment")
+    interval = max(1, getattr(settings, "HISTORY_CHECKPOINT_INTERVAL", DEFAULT_CHECKPOINT_INTERVAL))
+    compacted_ids = history_model.objects.filter(history_delta_base__isnull=False).values("id")
+    object_ids = list(
+        history_model.objects.exclude(id__in=compacted_ids).order_by("id").values_list("id", flat=True).distinct()
+    )
+    for done, batch_ids in _batches(object_ids, COMPACTION_BATCH_SIZE):
+        with transaction.atomic():
+            to_update = []
+            previous = None
+            previous_data: Any = None
+            for record in _records(history_model, batch_ids):
+                data = getattr(record, DELTA_FIELD)
+                if previous is not None and previous.id == record.id and previous.history_delta_depth + 1 < interval:
+                    setattr(record, DELTA_FIELD, make_patch(previous_data, data))
+                    record.history_delta_base = previous.history_id
+                    record.history_delta_depth = previous.history_delta_depth + 1
+                    to_update.append(record)
+                previous, previous_data = record, data
+            history_model.objects.bulk_update(to_update, UPDATE_FIELDS, batch_size=500)
+        logger.info("Compacted history for %s of %s assessments", done, len(object_ids))
+
+
+def expand_assessment_history(apps, schema_editor):
+    """
+    Rewrites the patches back into full copies.
+    """
+    history_model = apps.get_model("webcaf", "HistoricalAssessment")
+    object_ids = list(
+        history_model.objects.filter(history_delta_base__isnull=False)
+        .order_by("id")
+        .values_list("id", flat=True)
+        .distinct()
+    )
+    for _, batch_ids in _batches(object_ids, COMPACTION_BATCH_SIZE):
+        with transaction.atomic():
+            states: dict[int, Any] = {}
+            to_update = []
+            for record in _records(history_model, batch_ids):
+                if record.history_delta_base is None:
+                    states[record.history_id] = getattr(record, DELTA_FIELD)
+                    continue
+                data = apply_patch(states[record.history_delta_base], getattr(record, DELTA_FIELD))
+                states[record.history_id] = data
+                setattr(record, DELTA_FIELD, data)
+                record.history_delta_base = None
+                record.history_delta_depth = 0
+                to_update.append(record)
+            history_model.objects.bulk_update(to_update, UPDATE_FIELDS, batch_size=500)
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("webcaf", "0021_historicalassessment_delta"),
+    ]
+
+    operations = [
+        migrations.RunPython(code=compact_assessment_history, reverse_code=expand_assessment_history),
+    ]
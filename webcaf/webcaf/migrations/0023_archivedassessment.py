@@ -0,0 +1,44 @@
+# Generated by Django 5.1.15 on 2026-10-19 08:17
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("webcaf", "0022_compact_historicalassessment"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ArchivedAssessment",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                ("reference", models.CharField(max_length=20, null=True, unique=True)),
+                ("assessment_period", models.CharField(db_index=True, max_length=255)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("draft", "Draft"),
+                            ("submitted", "Submitted"),
+                            ("completed", "Completed"),
+                            ("cancelled", "Cancelled"),
+                        ],
+                        max_length=255,
+                    ),
+                ),
+                ("archived_on", models.DateTimeField(auto_now_add=True)),
+                ("records", models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                (
+                    "system",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="archived_assessments",
+                        to="webcaf.system",
+                    ),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.15 on 2026-10-19 08:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("webcaf", "0023_archivedassessment"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ConfigurationVersion",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("version", models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.1.15 on 2026-10-19 08:22
+
+import logging
+from datetime import datetime
+
+from django.db import migrations, models
+from django.utils.timezone import make_aware
+
+logger = logging.getLogger(__name__)
+
+
+def populate_period_end(apps, schema_editor):
+    """
+    Copies assessment_period_end from the JSON into the new column. Rows with a missing or
+    unparseable value are left empty, so they are no longer picked as the default configuration.
+    """
+    Configuration = apps.get_model("webcaf", "Configuration")
+    to_update = []
+    for config in Configuration.objects.all():
+        assessment_period_end = config.config_data.get("assessment_period_end")
+        try:
+            config.period_end = make_aware(datetime.strptime(assessment_period_end, "%d %B %Y %I:%M%p"))
+        except (TypeError, ValueError):
+            logger.warning("Configuration %s has an invalid assessment_period_end %s", config.name, assessment_period_end)
+            continue
+        to_update.append(config)
+    Configuration.objects.bulk_update(to_update, ["period_end"])
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("webcaf", "0024_configurationversion"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="configuration",
+            name="period_end",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="configuration",
+            name="period_start",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="configuration",
+            index=models.Index(fields=["period_end", "period_start"], name="configuration_period_idx"),
+        ),
+        migrations.RunPython(code=populate_period_end, reverse_code=migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.1.15 on 2026-10-19 09:17
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("webcaf", "0025_configuration_period"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="NotifyEmail",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("email_addresses", models.JSONField(default=list)),
+                ("template_id", models.CharField(max_length=255)),
+                ("personalisation", models.JSONField(blank=True, default=dict)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[("pending", "Pending"), ("sent", "Sent"), ("failed", "Failed")],
+                        default="pending",
+                        max_length=20,
+                    ),
+                ),
+                ("attempts", models.PositiveSmallIntegerField(default=0)),
+                ("next_attempt_at", models.DateTimeField(default=django.utils.timezone.now)),
+                ("expires_at", models.DateTimeField(blank=True, null=True)),
+                ("last_error", models.TextField(blank=True, default="")),
+                ("notification_id", models.CharField(blank=True, max_length=255, null=True)),
+                ("created_on", models.DateTimeField(auto_now_add=True)),
+                ("sent_at", models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        condition=models.Q(("status", "pending")),
+                        fields=["next_attempt_at"],
+                        name="notify_email_pending_idx",
+                    ),
+                    models.Index(fields=["status", "created_on"], name="notify_email_status_idx"),
+                ],
+            },
+        ),
+    ]
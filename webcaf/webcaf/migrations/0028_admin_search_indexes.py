@@ -0,0 +1,32 @@
+# Generated by Django 5.1.15 on 2026-10-19 09:49
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("webcaf", "0027_organisationimport"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="organisation",
+            index=models.Index(
+                django.contrib.postgres.indexes.OpClass(
+                    django.db.models.functions.text.Upper("name"), name="text_pattern_ops"
+                ),
+                name="organisation_name_prefix_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="system",
+            index=models.Index(
+                django.contrib.postgres.indexes.OpClass(
+                    django.db.models.functions.text.Upper("name"), name="text_pattern_ops"
+                ),
+                name="system_name_prefix_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.15 on 2026-10-19 10:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("webcaf", "0028_admin_search_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="organisationimport",
+            name="attempts",
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -1,41 +1,107 @@
 import logging
-from datetime import datetime
+import time
+from dataclasses import dataclass, replace
+from datetime import UTC, datetime
+from typing import Optional
 
 from django.conf import settings
 from django.contrib.auth.models import User
-from django.db import models
-from django.db.models import F, Func, Value
-from django.db.models.functions import Cast
+from django.contrib.postgres.indexes import OpClass
+from django.core import serializers
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction
+from django.db.models import F, Q
+from django.db.models.fields.json import KeyTransform
+from django.db.models.functions import Upper
+from django.utils import timezone
 from django.utils.timezone import make_aware
 from django_otp.plugins.otp_email.models import EmailDevice
 from multiselectfield import MultiSelectField
 from simple_history.models import HistoricalRecords
 
+from webcaf.webcaf import cache
 from webcaf.webcaf.abcs import FrameworkRouter
-from webcaf.webcaf.notification import send_notify_email
-from webcaf.webcaf.utils import mask_email
-from webcaf.webcaf.utils.references import generate_reference
+from webcaf.webcaf.history import DeltaHistoricalRecords
+from webcaf.webcaf.notification import queue_notify_email
+from webcaf.webcaf.utils.references import (
+    generate_reference,
+    reference_ids,
+    reserve_ids,
+)
 
 # Set up a logger for any Notify errors
 logger = logging.getLogger(__name__)
 
 
+class ReferenceGeneratorQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        self.model.assign_references(objs)
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def by_reference(self, reference: str) -> "ReferenceGeneratorQuerySet":
+        """
+        Filter on a reference by the primary key it was generated from, so the lookup uses the
+        primary key index. A reference that is not a generated one, such as one imported
+        with the organisations, is looked up as it is.
+
+        :param reference: The reference, in any case.
+        :return: The row with the reference, if there is one.
+        """
+        reference = reference.strip()
+        try:
+            ids = self.model.ids_for_reference(reference)
+        except ValueError:
+            return self.filter(reference=reference)
+        return self.filter(pk__in=ids, reference=reference.upper())
+
+    def get_by_reference(self, reference: str):
+        return self.by_reference(reference).get()
+
+
 class ReferenceGeneratorMixin:
     """
     Mixin to automatically generate a unique reference for models.
     Requires a 'reference' field on the model.
+
+    The primary key of a new row is taken from its sequence before the insert, so the row is
+    written once, with its reference, and has a single history record. Rows created with
+    ``bulk_create`` get their references the same way, through ``ReferenceGeneratorQuerySet``.
     """
 
+    @classmethod
+    def reference_for(cls, pk: int) -> str:
+        return generate_reference(pk, prime_set=cls.__name__.lower())
+
+    @classmethod
+    def ids_for_reference(cls, reference: str) -> list[int]:
+        """
+        :raises ValueError: When the reference is not one generated for this model.
+        """
+        return reference_ids(reference.strip().upper(), prime_set=cls.__name__.lower())
+
+    @classmethod
+    def assign_references(cls, objs: list["ReferenceGeneratorMixin"]):
+        """
+        Set the references of the objects without one, reserving the primary keys of the
+        objects that are not saved yet.
+
+        :param objs: Instances of the model, about to be created.
+        """
+        objs = [obj for obj in objs if not obj.reference]
+        new = [obj for obj in objs if obj.pk is None]
+        for obj, pk in zip(new, reserve_ids(cls, len(new))):
+            obj.pk = pk
+        for obj in objs:
+            obj.reference = cls.reference_for(obj.pk)
+
     def save(self, *args, **kwargs):
         if not self.reference:
-            model_name = self.__class__.__name__.lower()
             if self.pk is None:
-                super().save(*args, **kwargs)
-                self.reference = generate_reference(self.pk, prime_set=model_name)
-                super().save(update_fields=["reference"])
-                return
-            else:
-                self.reference = generate_reference(self.pk, prime_set=model_name)
+                self.pk = reserve_ids(type(self), 1)[0]
+                # The row is new, skip the update Django tries first when the primary key is set
+                kwargs.setdefault("force_insert", True)
+            self.reference = self.reference_for(self.pk)
         super().save(*args, **kwargs)
 
 
@@ -68,8 +134,15 @@ class Organisation(ReferenceGeneratorMixin, models.Model):
         "self", on_delete=models.SET_NULL, related_name="sub_organisations", null=True, blank=True
     )
 
+    objects = ReferenceGeneratorQuerySet.as_manager()
     history = HistoricalRecords()
 
+    class Meta:
+        indexes = [
+            # The admin searches for names starting with the search term, in any case
+            models.Index(OpClass(Upper("name"), name="text_pattern_ops"), name="organisation_name_prefix_idx"),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -141,10 +214,14 @@ class System(ReferenceGeneratorMixin, models.Model):
     corporate_services = MultiSelectField(choices=CORPORATE_SERVICES, null=True, blank=True, max_length=255)
     corporate_services_other = models.CharField(max_length=100, blank=True, null=True)
 
+    objects = ReferenceGeneratorQuerySet.as_manager()
     history = HistoricalRecords()
 
     class Meta:
         unique_together = ["name", "organisation"]
+        indexes = [
+            models.Index(OpClass(Upper("name"), name="text_pattern_ops"), name="system_name_prefix_idx"),
+        ]
 
     def __str__(self):
         return self.name
@@ -204,11 +281,59 @@ class Assessment(ReferenceGeneratorMixin, models.Model):
 
     review_type = models.CharField(max_length=255, choices=REVIEW_TYPE_CHOICES, default="not_decided")
 
-    history = HistoricalRecords()
+    # Denormalised from the history table so the submitted lists do not need to replay status changes
+    first_submitted_at = models.DateTimeField(null=True, blank=True)
+    first_submitted_by = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True, related_name="assessments_first_submitted"
+    )
+
+    # assessments_data is stored as a patch against the previous version, see webcaf.webcaf.history
+    objects = ReferenceGeneratorQuerySet.as_manager()
+    history = DeltaHistoricalRecords(delta_field="assessments_data")
+
+    # The status as it is stored, None for an assessment that has not been saved or loaded with it
+    _stored_status: str | None = None
 
     class Meta:
         unique_together = ["assessment_period", "system", "status"]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._stored_status = instance.__dict__.get("status")
+        return instance
+
+    def save(self, *args, **kwargs):
+        """
+        Stamps the first submission details as part of the same write that moves the
+        assessment from another stored status to submitted, so they can never disagree
+        with the status. Other saves of a submitted assessment, and assessments created
+        as submitted, are left as they are.
+        """
+        update_fields = kwargs.get("update_fields")
+        status_saved = update_fields is None or "status" in update_fields
+        if (
+            self.status == "submitted"
+            and self._stored_status not in (None, "submitted")
+            and self.first_submitted_at is None
+            and status_saved
+        ):
+            self.first_submitted_at = timezone.now()
+            self.first_submitted_by_id = self.last_updated_by_id
+            if update_fields is not None:
+                kwargs["update_fields"] = list(update_fields) + ["first_submitted_at", "first_submitted_by"]
+        super().save(*args, **kwargs)
+        if status_saved:
+            self._stored_status = self.status
+
+    def get_assessments_data_as_of(self, timestamp: datetime) -> dict:
+        """
+        Rebuilds the answers as they were saved at the given time.
+        :param timestamp: The point in time to rebuild the answers for.
+        :return: The assessments_data of the latest version saved on or before ``timestamp``.
+        """
+        return self.history.model.rebuild_as_of(self.id, timestamp)
+
     def get_section_by_outcome_id(self, outcome_id):
         """
         Retrieve a specific section of assessments data based on the provided outcome ID.
@@ -261,6 +386,21 @@ class Assessment(ReferenceGeneratorMixin, models.Model):
                 return False
         return True
 
+    def is_complete_cached(self) -> bool:
+        """
+        ``is_complete`` through the application cache. The last update time is part of the key,
+        so the cached value is never older than the assessment, even without a shared cache.
+        When ``assessments_data`` is deferred it is only loaded on a miss.
+        """
+        router = self.get_router()
+        return cache.get_or_set(
+            "assessment_complete",
+            self.is_complete,
+            version=self.last_updated.timestamp(),
+            framework=f"{self.framework}@{router.version}",
+            assessment=self.pk,
+        )
+
     def is_objective_complete(
         self,
         objective_id: str,
@@ -299,6 +439,62 @@ class Assessment(ReferenceGeneratorMixin, models.Model):
         return f"reference={self.reference if self.reference else '-'}, id={self.id}"
 
 
+class ArchivedAssessmentQuerySet(models.QuerySet):
+    def with_assessment_record(self) -> "ArchivedAssessmentQuerySet":
+        """
+        Load the serialised assessment without its history records, which are only needed
+        to restore it.
+        """
+        return self.annotate(assessment_record=KeyTransform("0", "records")).defer("records")
+
+    def assessments(self) -> list[Assessment]:
+        """
+        The archived assessments as unsaved ``Assessment`` objects, so pages listing or
+        showing assessments can include the ones from archived periods. The system and the
+        user who first submitted each assessment are loaded with them.
+
+        :return: The assessments, in the order of the queryset.
+        """
+        archived = list(self.with_assessment_record().select_related("system__organisation"))
+        assessments = [archived_assessment.get_assessment() for archived_assessment in archived]
+        users = User.objects.in_bulk({a.first_submitted_by_id for a in assessments if a.first_submitted_by_id})
+        for archived_assessment, assessment in zip(archived, assessments):
+            assessment.system = archived_assessment.system
+            assessment.first_submitted_by = users.get(assessment.first_submitted_by_id)
+        return assessments
+
+
+class ArchivedAssessment(models.Model):
+    """
+    An assessment from a closed assessment period, moved out of the live tables together
+    with its history by the archive_assessment_period management command.
+
+    The assessment and its history records are kept in Django's serialisation format, so
+    they can be restored exactly as they were.
+    """
+
+    # Same as the id of the archived assessment
+    id = models.BigIntegerField(primary_key=True)
+    reference = models.CharField(max_length=20, null=True, unique=True)
+    system = models.ForeignKey(System, on_delete=models.CASCADE, related_name="archived_assessments")
+    assessment_period = models.CharField(max_length=255, db_index=True)
+    status = models.CharField(max_length=255, choices=Assessment.STATUS_CHOICES)
+    archived_on = models.DateTimeField(auto_now_add=True)
+    records = models.JSONField(encoder=DjangoJSONEncoder)
+
+    objects = ArchivedAssessmentQuerySet.as_manager()
+
+    def get_assessment(self) -> Assessment:
+        """
+        :return: An unsaved Assessment with the data it had when it was archived.
+        """
+        record = getattr(self, "assessment_record", None) or self.records[0]
+        return next(serializers.deserialize("python", [record])).object
+
+    def __str__(self):
+        return f"{self.reference} ({self.assessment_period})"
+
+
 class UserProfile(models.Model):
     ROLE_ACTIONS = {
         "organisation_lead": [
@@ -345,49 +541,134 @@ class UserProfile(models.Model):
         return None
 
 
+class ConfigurationVersion(models.Model):
+    """
+    Single row counter that is incremented whenever a Configuration is saved or deleted,
+    so every worker can tell when its cached default configuration is out of date.
+    """
+
+    version = models.PositiveBigIntegerField(default=0)
+
+    @classmethod
+    def get_current(cls) -> int:
+        return cls.objects.filter(pk=1).values_list("version", flat=True).first() or 0
+
+    @classmethod
+    def increment(cls):
+        if not cls.objects.filter(pk=1).update(version=F("version") + 1):
+            cls.objects.get_or_create(pk=1, defaults={"version": 1})
+
+
+@dataclass(frozen=True)
+class _CachedDefaultConfig:
+    config: Optional["Configuration"]
+    version: int
+    loaded_at: datetime
+    expires_at: datetime
+    checked_at: float
+
+
 class ConfigurationManager(models.Manager):
+    # Process local, shared by every thread of the worker
+    _cached_default_config: Optional[_CachedDefaultConfig] = None
+
     def get_default_config(self):
         """
         Summary:
         Retrieves the default configuration based on the current date and time.
-        This will check all existing configurations that have the assessment_period_end
+        This will check all existing configurations that have started and have a period_end
         value that is greater than or equal to the current date and time, and pick
         the closest value to the current date+time.
 
+        The result is cached in the process until the assessment period ends, another
+        period starts or a configuration is changed in any worker, whichever comes first. Changes
+        made in another worker are seen within ``CONFIGURATION_VERSION_CHECK_INTERVAL`` seconds. The
+        returned object is shared, so it must not be modified.
+
+        :return: The default configuration if found, otherwise None.
+        """
+        now = timezone.now()
+        cached = ConfigurationManager._cached_default_config
+        if cached and cached.loaded_at <= now < cached.expires_at:
+            check_interval = getattr(settings, "CONFIGURATION_VERSION_CHECK_INTERVAL", 5)
+            if 0 <= time.monotonic() - cached.checked_at < check_interval:
+                return cached.config
+            version = ConfigurationVersion.get_current()
+            if version == cached.version:
+                ConfigurationManager._cached_default_config = replace(cached, checked_at=time.monotonic())
+                return cached.config
+        else:
+            version = ConfigurationVersion.get_current()
+
+        default_config = self.get_default_config_uncached()
+        # The next change of default configuration is the end of this period, or the start of another one
+        next_start = self.filter(period_start__gt=now).order_by("period_start").values_list("period_start", flat=True)
+        changes_at = [at for at in (default_config and default_config.period_end, next_start.first()) if at]
+        ConfigurationManager._cached_default_config = _CachedDefaultConfig(
+            config=default_config,
+            version=version,
+            loaded_at=now,
+            # Without any period boundary ahead only a configuration change can alter the result
+            expires_at=min(changes_at, default=datetime.max.replace(tzinfo=UTC)),
+            checked_at=time.monotonic(),
+        )
+        return default_config
+
+    def get_default_config_uncached(self):
+        """
+        Runs the query behind ``get_default_config`` without the cache. This is a range
+        query on the indexed period columns.
+
         :return: The default configuration if found, otherwise None.
         """
-        now = make_aware(datetime.now())
-        # Annotate the model with a datetime parsed from JSON field
-        qs = (
+        now = timezone.now()
+        return (
             self.get_queryset()
-            .annotate(
-                # Extract the key "assessment_period_end" from the JSON field and cast to text
-                assessment_period_end_text=Cast(
-                    F("config_data__assessment_period_end"), output_field=models.TextField()
-                )
-            )
-            .annotate(
-                # Remove the quotes from the string
-                assessment_period_end_dt=Func(
-                    Func(F("assessment_period_end_text"), Value('"'), Value(""), function="replace"),
-                    Value("DD Month YYYY HH12:MIpm"),  # Adjust format to match your string
-                    function="to_timestamp",
-                    output_field=models.DateTimeField(),
-                )
-            )
+            .filter(Q(period_start__isnull=True) | Q(period_start__lte=now), period_end__gte=now)
+            .order_by("period_end")
+            .first()
         )
 
-        # Filter configs where assessment_period_end >= now and get the earliest one
-        default_config = qs.filter(assessment_period_end_dt__gte=now).order_by("assessment_period_end_dt").first()
-        return default_config
+    @classmethod
+    def clear_cache(cls):
+        cls._cached_default_config = None
 
 
 class Configuration(models.Model):
     config_data = models.JSONField(default=dict)
     name = models.CharField(max_length=255, unique=True)
+    # Typed copies of the period in config_data, so the default configuration can be found with an index.
+    # A configuration without a start applies from whenever the previous period ends.
+    period_start = models.DateTimeField(null=True, blank=True)
+    period_end = models.DateTimeField(null=True, blank=True)
     # custom manager to get the default config
     objects = ConfigurationManager()
 
+    class Meta:
+        indexes = [models.Index(fields=["period_end", "period_start"], name="configuration_period_idx")]
+
+    def save(self, *args, **kwargs):
+        if self.get_assessment_period_end():
+            self.period_end = self.get_submission_due_date()
+            update_fields = kwargs.get("update_fields")
+            if update_fields is not None and "config_data" in update_fields:
+                kwargs["update_fields"] = list(update_fields) + ["period_end"]
+        super().save(*args, **kwargs)
+        self.configuration_changed()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        self.configuration_changed()
+        return result
+
+    @staticmethod
+    def configuration_changed():
+        """
+        Drop the cached default configuration in this worker and tell the other workers to do the same.
+        """
+        ConfigurationManager.clear_cache()
+        ConfigurationVersion.increment()
+
     def get_current_assessment_period(self):
         return self.config_data.get("current_assessment_period")
 
@@ -401,11 +682,16 @@ class Configuration(models.Model):
         """
         Convert the get_assessment_period_end in to a datetime object.
         The format is 31 March 2026 11:59pm.
+        The parsed value is kept on the instance until assessment_period_end changes.
         :return:
         """
         assessment_period_end = self.get_assessment_period_end()
-        # Parse the date string in format "31 March 2026 11:59pm"
-        return make_aware(datetime.strptime(assessment_period_end, "%d %B %Y %I:%M%p"))
+        parsed = getattr(self, "_parsed_submission_due_date", None)
+        if parsed is None or parsed[0] != assessment_period_end:
+            # Parse the date string in format "31 March 2026 11:59pm"
+            parsed = (assessment_period_end, make_aware(datetime.strptime(assessment_period_end, "%d %B %Y %I:%M%p")))
+            self._parsed_submission_due_date = parsed
+        return parsed[1]
 
     def __str__(self):
         return self.name
@@ -420,6 +706,14 @@ class GovNotifyEmailDevice(EmailDevice):
     which is configurable via settings.
     """
 
+    def generate_challenge(self, extra_context=None):
+        """
+        Saves the new token and queues its email in one transaction, so the email is only
+        sent for a token that was saved.
+        """
+        with transaction.atomic():
+            return super().generate_challenge(extra_context)
+
     def send_mail(self, token, **kwargs):
         """
         Overrides the default ``send_mail`` method to send the OTP token.
@@ -431,9 +725,9 @@ class GovNotifyEmailDevice(EmailDevice):
         to the parent class's ``send_mail`` method (which typically prints
         the token to the console in development).
 
-        If ``settings.SSO_MODE`` is "external", it attempts to send the
-        token using the GOV.UK Notify API. Any exceptions during this
-        process are caught and logged, preventing a hard failure.
+        If ``settings.SSO_MODE`` is "external", it queues an email with the
+        token, sent through the GOV.UK Notify API by the send_notify_emails
+        command until the token expires.
 
         :param token: The one-time password (OTP) token to be sent.
         :type token: str
@@ -446,17 +740,16 @@ class GovNotifyEmailDevice(EmailDevice):
             logger.debug("SSO_MODE is not 'external'. Using default send_mail.")
             return super().send_mail(token, **kwargs)
 
-        try:
-            personalisation_data = {
-                "token": token,
-                "first_name": self.user.first_name,
-                "last_name": self.user.last_name,
-            }
-            send_notify_email([self.email], personalisation_data, settings.NOTIFY_OTP_TEMPLATE_ID)
-            logger.info(mask_email(f"GOV.UK Notify: Successfully sent OTP to {self.email}"))
-        except Exception as e:
-            logger.exception(mask_email(f"GOV.UK Notify: Failed to send OTP to {self.email}: {e}"))
-            pass
+        personalisation_data = {
+            "token": token,
+            "first_name": self.user.first_name,
+            "last_name": self.user.last_name,
+        }
+        # A token is no use once it has expired, so the email is not sent after that
+        queue_notify_email(
+            [self.email], personalisation_data, settings.NOTIFY_OTP_TEMPLATE_ID, expires_at=self.valid_until
+        )
+        logger.info("GOV.UK Notify: Queued OTP email to %s", self.email)
 
     class Meta:
         """
@@ -468,3 +761,76 @@ class GovNotifyEmailDevice(EmailDevice):
         """
 
         proxy = True
+
+
+class NotifyEmail(models.Model):
+    """
+    An email to send through GOV.UK Notify. Emails are written in the same transaction as
+    the change that triggers them, and sent by the send_notify_emails command, so requests
+    never wait for Notify and failed sends are retried.
+
+    Failed emails are kept with their last error. Sent emails keep no personalisation.
+    """
+
+    STATUS_CHOICES = [
+        ("pending", "Pending"),
+        ("sent", "Sent"),
+        ("failed", "Failed"),
+    ]
+    email_addresses = models.JSONField(default=list)
+    template_id = models.CharField(max_length=255)
+    personalisation = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending")
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    # Emails that are useless after a time, such as one time passwords, are not sent after it
+    expires_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default="")
+    notification_id = models.CharField(max_length=255, null=True, blank=True)
+    created_on = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["next_attempt_at"], condition=Q(status="pending"), name="notify_email_pending_idx"),
+            models.Index(fields=["status", "created_on"], name="notify_email_status_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.template_id} ({self.status}), id={self.id}"
+
+
+class OrganisationImport(models.Model):
+    """
+    An organisation CSV uploaded in the admin, too large to import during the request. Run
+    by the process_organisation_imports command, which records the rows read so far and a
+    summary of the changes made.
+    """
+
+    STATUS_CHOICES = [
+        ("queued", "Queued"),
+        ("running", "Running"),
+        ("completed", "Completed"),
+        ("failed", "Failed"),
+    ]
+    file_name = models.CharField(max_length=255)
+    csv_data = models.TextField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="queued")
+    total_rows = models.PositiveIntegerField(default=0)
+    processed_rows = models.PositiveIntegerField(default=0)
+    # Times the import was claimed by a worker
+    attempts = models.PositiveIntegerField(default=0)
+    summary = models.JSONField(default=dict, blank=True)
+    error = models.TextField(blank=True, default="")
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    created_on = models.DateTimeField(auto_now_add=True)
+    started_on = models.DateTimeField(null=True, blank=True)
+    finished_on = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["created_on"], condition=Q(status="queued"), name="organisation_import_queued_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.file_name} ({self.status}), id={self.id}"
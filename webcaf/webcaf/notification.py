@@ -1,24 +1,217 @@
+"""
+GOV.UK Notify emails, sent through an outbox table.
+
+``queue_notify_email`` writes the email in the caller's transaction, so it is only sent when
+the change that triggered it is committed. The send_notify_emails command calls
+``send_due_emails`` to send them, retries temporary failures with exponential backoff and
+marks the emails that cannot be sent as failed, where they stay for inspection in the admin.
+"""
+
+import logging
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Any, Optional
+
 from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Min
+from django.utils import timezone
 from notifications_python_client import NotificationsAPIClient
+from notifications_python_client.errors import APIError
+
+from webcaf.webcaf.metrics import register_collector
+from webcaf.webcaf.utils.timing import timed
+
+if TYPE_CHECKING:
+    from webcaf.webcaf.models import NotifyEmail
+
+logger = logging.getLogger(__name__)
+
+# An email being sent is not picked up by another worker for this long, in case the worker sending it stops
+CLAIM_TIMEOUT = timedelta(minutes=5)
+
+_local = threading.local()
+
+
+class EmailExpired(Exception):
+    pass
+
+
+def get_notify_client() -> NotificationsAPIClient:
+    """
+    :return: The Notify client of the current thread. Each thread keeps its client, so the
+        HTTP connections are reused for the following emails.
+    """
+    config = (getattr(settings, "NOTIFY_API_KEY", ""), settings.NOTIFY_BASE_URL, settings.NOTIFY_TIMEOUT)
+    if getattr(_local, "config", None) != config:
+        _local.client = NotificationsAPIClient(config[0], base_url=config[1], timeout=config[2])
+        _local.config = config
+    return _local.client
 
 
-def send_notify_email(email_addresses: list[str], personalisation_data: dict[str, str], template_id: str | None = None):
+def queue_notify_email(
+    email_addresses: list[str],
+    personalisation_data: dict[str, str],
+    template_id: str,
+    expires_at: Optional[datetime] = None,
+) -> "NotifyEmail":
     """
-    Sends an email notification using the Gov Notify service with the specified
-    template and personalisation data. It utilizes the `NotificationsAPIClient`
-    to send the email to the designated recipient.
+    Queue an email to send with the Gov Notify service, in the current transaction.
+
+    When ``NOTIFY_WORKER_ENABLED`` is off the email is sent by this process once the
+    transaction commits, otherwise by the send_notify_emails command.
+
     :param email_addresses: A list of email addresses to send the notification to.
     :param personalisation_data: A dictionary containing key-value pairs for
         personalisation fields to be inserted into the email template.
     :param template_id: The ID of the email template to be used for the notification.
-        If not provided, a default template must be predefined or handled appropriately.
-    :return: None
-    :raises Exception: If an error occurs during the notification process.
-    """
-    notify_client = NotificationsAPIClient(settings.NOTIFY_API_KEY)
-    # Send the token using the Gov Notify template
-    notify_client.send_email_notification(
-        email_address=",".join(email_addresses),
-        template_id=template_id,
+    :param expires_at: When set, the email is not sent after this time.
+    :return: The queued email.
+    """
+    from webcaf.webcaf.models import NotifyEmail
+
+    email = NotifyEmail.objects.create(
+        email_addresses=email_addresses,
         personalisation=personalisation_data,
+        template_id=template_id,
+        expires_at=expires_at,
     )
+    if not settings.NOTIFY_WORKER_ENABLED:
+        transaction.on_commit(lambda: send_due_emails(ids=[email.pk]))
+    return email
+
+
+def send_due_emails(batch_size: int = 50, concurrency: int = 1, ids: Optional[list[int]] = None) -> dict[str, int]:
+    """
+    Send up to ``batch_size`` of the emails that are due, ``concurrency`` at a time.
+
+    :param ids: Only send the emails with these ids.
+    :return: The number of emails claimed, sent, to be retried and failed.
+    """
+    emails = claim_due_emails(batch_size, ids)
+    counts = {"claimed": len(emails), "sent": 0, "retried": 0, "failed": 0}
+    if concurrency > 1 and len(emails) > 1:
+        with ThreadPoolExecutor(max_workers=min(concurrency, len(emails))) as executor:
+            results = list(executor.map(deliver, emails))
+    else:
+        results = [deliver(email) for email in emails]
+    for email, (notification_id, error) in zip(emails, results):
+        counts[record_result(email, notification_id, error)] += 1
+    return counts
+
+
+def claim_due_emails(limit: int, ids: Optional[list[int]] = None) -> list["NotifyEmail"]:
+    """
+    Take the pending emails that are due, oldest first, and count the attempt. Emails being
+    sent by another worker are skipped, and are not due again until ``CLAIM_TIMEOUT`` has
+    passed, so the HTTP requests are made outside of any transaction.
+    """
+    from webcaf.webcaf.models import NotifyEmail
+
+    now = timezone.now()
+    with transaction.atomic():
+        queryset = NotifyEmail.objects.select_for_update(skip_locked=True).filter(
+            status="pending", next_attempt_at__lte=now
+        )
+        if ids is not None:
+            queryset = queryset.filter(pk__in=ids)
+        emails = list(queryset.order_by("next_attempt_at")[:limit])
+        NotifyEmail.objects.filter(pk__in=[email.pk for email in emails]).update(
+            attempts=F("attempts") + 1, next_attempt_at=now + CLAIM_TIMEOUT
+        )
+    for email in emails:
+        email.attempts += 1
+    return emails
+
+
+def deliver(email: "NotifyEmail") -> tuple[Optional[str], Optional[Exception]]:
+    """
+    Send one email. Makes no database queries, so it can run in any thread.
+
+    :return: The Notify id of the notification, or the error that prevented sending it.
+    """
+    if email.expires_at and email.expires_at <= timezone.now():
+        return None, EmailExpired("Expired before it could be sent")
+    try:
+        with timed("http"):
+            response = get_notify_client().send_email_notification(
+                email_address=",".join(email.email_addresses),
+                template_id=email.template_id,
+                personalisation=email.personalisation,
+                # Identifies the email in Notify, should it be sent twice
+                reference=f"webcaf-{email.pk}",
+            )
+    except Exception as error:
+        return None, error
+    return response.get("id"), None
+
+
+def is_retryable(error: Exception) -> bool:
+    """
+    Notify rejects invalid requests and API keys with a 400 or 403, these fail again when
+    retried. Rate limits, server errors and connection errors, reported as a 503, are temporary.
+    """
+    if isinstance(error, APIError):
+        return error.status_code == 429 or error.status_code >= 500
+    return not isinstance(error, EmailExpired)
+
+
+def retry_delay(attempts: int) -> float:
+    """
+    :return: Seconds to wait before the next attempt, doubled for each attempt made. The
+        jitter spreads out the retries of emails that failed together.
+    """
+    delay = min(settings.NOTIFY_RETRY_MAX_DELAY, settings.NOTIFY_RETRY_DELAY * 2 ** (attempts - 1))
+    return delay * random.uniform(0.75, 1.0)
+
+
+def record_result(email: "NotifyEmail", notification_id: Optional[str], error: Optional[Exception]) -> str:
+    """
+    Save the result of an attempt to send the email.
+
+    :return: ``sent``, ``retried`` or ``failed``.
+    """
+    from webcaf.webcaf.models import NotifyEmail
+
+    emails = NotifyEmail.objects.filter(pk=email.pk)
+    if error is None:
+        emails.update(
+            status="sent", sent_at=timezone.now(), notification_id=notification_id, personalisation={}, last_error=""
+        )
+        logger.info("GOV.UK Notify: Sent email %s with template %s", email.pk, email.template_id)
+        return "sent"
+    # Only a worker retries the emails, without one they are failed for the admin to retry
+    if settings.NOTIFY_WORKER_ENABLED and is_retryable(error) and email.attempts < settings.NOTIFY_MAX_ATTEMPTS:
+        delay = retry_delay(email.attempts)
+        emails.update(next_attempt_at=timezone.now() + timedelta(seconds=delay), last_error=str(error))
+        logger.warning(
+            "GOV.UK Notify: Failed to send email %s, attempt %s, retrying in %.0fs: %s",
+            email.pk,
+            email.attempts,
+            delay,
+            error,
+        )
+        return "retried"
+    emails.update(status="failed", last_error=str(error))
+    logger.error("GOV.UK Notify: Gave up sending email %s after %s attempts: %s", email.pk, email.attempts, error)
+    return "failed"
+
+
+def outbox_metrics() -> dict[str, Any]:
+    """
+    Size of the outbox. A growing ``oldest_pending_seconds`` means the emails are not
+    being sent.
+    """
+    from webcaf.webcaf.models import NotifyEmail
+
+    pending = NotifyEmail.objects.filter(status="pending").aggregate(count=Count("id"), oldest=Min("created_on"))
+    return {
+        "pending": pending["count"],
+        "oldest_pending_seconds": (timezone.now() - pending["oldest"]).total_seconds() if pending["oldest"] else 0.0,
+        "failed": NotifyEmail.objects.filter(status="failed").count(),
+    }
+
+
+register_collector("notify_outbox", outbox_metrics)
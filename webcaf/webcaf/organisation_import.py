@@ -0,0 +1,315 @@
+"""
+Import of organisations and their cyber advisors from the admin CSV.
+
+The existing organisations and users named in the file are read in a few bulk queries,
+the changes are worked out in memory, and then written in one transaction with bulk
+inserts, so a file is either imported completely or not at all. Small files are imported
+during the request, larger ones are queued as an ``OrganisationImport`` and run by the
+process_organisation_imports command, which records the rows read so far.
+"""
+
+import csv
+import logging
+from dataclasses import asdict, dataclass, field
+from datetime import timedelta
+from io import StringIO
+from typing import Callable, Iterable, Optional
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from webcaf.webcaf import cache
+from webcaf.webcaf.models import Organisation, OrganisationImport, UserProfile
+
+logger = logging.getLogger(__name__)
+
+CSV_HEADERS = [
+    "Organisation",
+    "Lead Government Department",
+    "Reference",
+    "Type",
+    "Email1",
+    "Email2",
+    "Email3",
+    "Email4",
+    "Email5",
+    "Email6",
+]
+EMAIL_COLUMNS = ["Email1", "Email2", "Email3", "Email4", "Email5", "Email6"]
+
+# Rows read between progress updates
+PROGRESS_INTERVAL = 500
+# Times an import is claimed before it is failed, should it never finish
+MAX_ATTEMPTS = 3
+
+
+class ImportFileError(ValueError):
+    pass
+
+
+class ImportReclaimed(Exception):
+    pass
+
+
+@dataclass
+class ImportSummary:
+    rows: int = 0
+    organisations_created: int = 0
+    users_created: int = 0
+    profiles_created: int = 0
+    profiles_existing: int = 0
+    parents_changed: int = 0
+
+    def message(self) -> str:
+        return (
+            f"Imported {self.rows} Organisations: created {self.organisations_created} organisations, "
+            f"{self.users_created} users and {self.profiles_created} cyber advisor profiles, "
+            f"changed {self.parents_changed} parent organisations."
+        )
+
+
+@dataclass
+class ImportPlan:
+    new_organisations: list[Organisation] = field(default_factory=list)
+    new_users: list[User] = field(default_factory=list)
+    # (user, organisation) of the cyber advisor profiles to create
+    new_profiles: list[tuple[User, Organisation]] = field(default_factory=list)
+    changed_organisations: dict[int, Organisation] = field(default_factory=dict)
+
+
+def read_csv(content: str) -> list[dict[str, str]]:
+    """
+    :param content: The uploaded file.
+    :return: The rows of the file.
+    :raises ImportFileError: When the header row is not the one of the template.
+    """
+    reader = csv.DictReader(StringIO(content))
+    if set(reader.fieldnames or []) != set(CSV_HEADERS):
+        raise ImportFileError(f"The CSV file is missing required headers {CSV_HEADERS}.")
+    return list(reader)
+
+
+class OrganisationImporter:
+    """
+    Imports the rows of an organisation CSV.
+
+    An organisation is found by its reference, then by its name, and created when neither
+    matches. A user is found by email and created when missing, and is made a cyber advisor
+    of the organisation. The "Lead Government Department" names the parent organisation,
+    an organisation named as its own lead department has no parent.
+
+    :param rows: The rows of the CSV, as read by ``read_csv``.
+    :param progress: Called with the number of rows read so far. The changes are then written
+        in one transaction, which reports no progress.
+    :param before_commit: Called at the end of the transaction writing the changes, raises to
+        roll them back.
+    """
+
+    def __init__(
+        self,
+        rows: list[dict[str, str]],
+        progress: Optional[Callable[[int], None]] = None,
+        before_commit: Optional[Callable[[], None]] = None,
+    ):
+        self.rows = [{key: (value or "").strip() for key, value in row.items() if key} for row in rows]
+        self.progress = progress or (lambda count: None)
+        self.before_commit = before_commit or (lambda: None)
+
+    def run(self) -> ImportSummary:
+        organisations_by_reference, organisations_by_name = self.existing_organisations()
+        users_by_email = self.existing_users()
+        plan = self.plan(organisations_by_reference, organisations_by_name, users_by_email)
+        summary = self.apply(plan)
+        summary.rows = len(self.rows)
+        logger.info(summary.message())
+        return summary
+
+    def existing_organisations(self) -> tuple[dict[str, Organisation], dict[str, Organisation]]:
+        references = {row["Reference"] for row in self.rows if row.get("Reference")}
+        names = {row[column] for row in self.rows for column in ("Organisation", "Lead Government Department")}
+        names.discard("")
+        by_reference: dict[str, Organisation] = {}
+        by_name: dict[str, Organisation] = {}
+        for organisation in Organisation.objects.filter(Q(reference__in=references) | Q(name__in=names)):
+            if organisation.reference in references:
+                by_reference[organisation.reference] = organisation
+            by_name[organisation.name] = organisation
+        return by_reference, by_name
+
+    def existing_users(self) -> dict[str, User]:
+        emails = {row[column] for row in self.rows for column in EMAIL_COLUMNS if row.get(column)}
+        users: dict[str, User] = {}
+        # The oldest user with an email is used, as the admin did before
+        for user in User.objects.filter(email__in=emails).order_by("pk"):
+            users.setdefault(user.email, user)
+        return users
+
+    def plan(
+        self,
+        organisations_by_reference: dict[str, Organisation],
+        organisations_by_name: dict[str, Organisation],
+        users_by_email: dict[str, User],
+    ) -> ImportPlan:
+        """
+        Work out the changes without writing anything. New organisations and users are added
+        to the lookups, so later rows naming them find them.
+        """
+        plan = ImportPlan()
+        row_organisations = []
+        for count, row in enumerate(self.rows, start=1):
+            organisation = organisations_by_reference.get(row.get("Reference", "")) or organisations_by_name.get(
+                row["Organisation"]
+            )
+            if not organisation:
+                logger.debug("Creating %s as not found in the database", row["Organisation"])
+                organisation = Organisation(
+                    name=row["Organisation"], organisation_type=Organisation.get_type_id(row.get("Type", ""))
+                )
+                organisations_by_name[organisation.name] = organisation
+                plan.new_organisations.append(organisation)
+            row_organisations.append(organisation)
+
+            for column in EMAIL_COLUMNS:
+                email = row.get(column, "")
+                if not email:
+                    continue
+                user = users_by_email.get(email)
+                if not user:
+                    user = User(username=User.normalize_username(email), email=User.objects.normalize_email(email))
+                    user.set_unusable_password()
+                    users_by_email[email] = user
+                    plan.new_users.append(user)
+                plan.new_profiles.append((user, organisation))
+            if count % PROGRESS_INTERVAL == 0:
+                self.progress(count)
+
+        for row, organisation in zip(self.rows, row_organisations):
+            parent = organisations_by_name.get(row.get("Lead Government Department", ""))
+            if not parent:
+                continue
+            # No parent if this is the parent organisation
+            parent = None if parent is organisation else parent
+            if organisation.parent_organisation != parent:
+                organisation.parent_organisation = parent
+                if organisation.pk:
+                    plan.changed_organisations[organisation.pk] = organisation
+        self.progress(len(self.rows))
+        return plan
+
+    def apply(self, plan: ImportPlan) -> ImportSummary:
+        summary = ImportSummary()
+        now = timezone.now()
+        with transaction.atomic():
+            # The primary keys are taken first, so the parents among the new organisations are set
+            # before the rows are inserted
+            Organisation.assign_references(plan.new_organisations)
+            for organisation in plan.new_organisations:
+                organisation.parent_organisation_id = getattr(organisation.parent_organisation, "pk", None)
+            Organisation.objects.bulk_create(plan.new_organisations)
+            Organisation.history.bulk_history_create(plan.new_organisations, default_date=now)
+            summary.organisations_created = len(plan.new_organisations)
+
+            changed = list(plan.changed_organisations.values())
+            Organisation.objects.bulk_update(changed, ["parent_organisation"])
+            Organisation.history.bulk_history_create(changed, update=True, default_date=now)
+            summary.parents_changed = len(changed)
+
+            User.objects.bulk_create(plan.new_users)
+            summary.users_created = len(plan.new_users)
+
+            profiles = self.new_profiles(plan.new_profiles)
+            UserProfile.objects.bulk_create(profiles)
+            UserProfile.history.bulk_history_create(profiles, default_date=now)
+            summary.profiles_created = len(profiles)
+            summary.profiles_existing = len({(user.pk, org.pk) for user, org in plan.new_profiles}) - len(profiles)
+
+            # bulk_create sends no signals, so the organisations are invalidated as saving the profiles would
+            for organisation_id in {profile.organisation_id for profile in profiles}:
+                cache.invalidate(organisation=organisation_id)
+                transaction.on_commit(lambda pk=organisation_id: cache.invalidate(organisation=pk))
+            self.before_commit()
+        return summary
+
+    @staticmethod
+    def new_profiles(pairs: Iterable[tuple[User, Organisation]]) -> list[UserProfile]:
+        """
+        :return: The cyber advisor profiles of the pairs that do not have one yet.
+        """
+        pairs = {(user.pk, organisation.pk) for user, organisation in pairs}
+        existing = set(
+            UserProfile.objects.filter(
+                user_id__in={user_id for user_id, _ in pairs},
+                organisation_id__in={organisation_id for _, organisation_id in pairs},
+                role="cyber_advisor",
+            ).values_list("user_id", "organisation_id")
+        )
+        return [
+            UserProfile(user_id=user_id, organisation_id=organisation_id, role="cyber_advisor")
+            for user_id, organisation_id in sorted(pairs - existing)
+        ]
+
+
+def queue_import(file_name: str, content: str, rows: int, user: Optional[User]) -> OrganisationImport:
+    return OrganisationImport.objects.create(file_name=file_name, csv_data=content, total_rows=rows, created_by=user)
+
+
+def claim_import() -> Optional[OrganisationImport]:
+    """
+    Take the oldest queued import. Imports being run by another worker are skipped, unless
+    they have been running for more than ``ORGANISATION_IMPORT_TIMEOUT`` seconds, when their
+    worker has most likely stopped. As the changes are written in one transaction, such an
+    import changed nothing and is run again, up to ``MAX_ATTEMPTS`` times before it is failed.
+    """
+    now = timezone.now()
+    stale = Q(status="running", started_on__lt=now - timedelta(seconds=settings.ORGANISATION_IMPORT_TIMEOUT))
+    with transaction.atomic():
+        OrganisationImport.objects.filter(stale, attempts__gte=MAX_ATTEMPTS).update(
+            status="failed", error=f"The import did not finish in {MAX_ATTEMPTS} attempts", finished_on=now
+        )
+        job = (
+            OrganisationImport.objects.select_for_update(skip_locked=True)
+            .filter(Q(status="queued") | stale)
+            .order_by("created_on")
+            .first()
+        )
+        if job:
+            if job.status == "running":
+                logger.warning("Organisation import %s did not finish, running it again", job.pk)
+            job.status = "running"
+            job.started_on = now
+            job.attempts += 1
+            job.save(update_fields=["status", "started_on", "attempts"])
+    return job
+
+
+def run_import(job: OrganisationImport) -> OrganisationImport:
+    """
+    Import the file of a claimed job, recording the rows read and the outcome on the job.
+    When another worker has taken the job in the meantime, the changes are rolled back and
+    the job is left to that worker.
+    """
+    # Only updates the job while this worker holds it
+    jobs = OrganisationImport.objects.filter(pk=job.pk, status="running", attempts=job.attempts)
+
+    def check_claimed():
+        if not jobs.select_for_update().exists():
+            raise ImportReclaimed(f"Organisation import {job.pk} was taken by another worker")
+
+    try:
+        rows = read_csv(job.csv_data)
+        summary = OrganisationImporter(
+            rows, progress=lambda count: jobs.update(processed_rows=count), before_commit=check_claimed
+        ).run()
+    except ImportReclaimed as error:
+        logger.warning("%s, its changes were rolled back", error)
+        return job
+    except Exception as error:
+        logger.exception("Organisation import %s failed", job.pk)
+        jobs.update(status="failed", error=str(error), finished_on=timezone.now())
+    else:
+        jobs.update(status="completed", summary=asdict(summary), finished_on=timezone.now(), csv_data="")
+    job.refresh_from_db()
+    return job
@@ -0,0 +1,57 @@
+"""
+Invalidate the application cache when the models it is derived from change.
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from webcaf.webcaf import cache
+from webcaf.webcaf.models import Assessment, Configuration, System, UserProfile
+
+
+def _invalidate(**scopes):
+    # Invalidate now, so the rest of the transaction reads fresh values, and again on commit,
+    # so values cached by other requests before the commit was visible are dropped too.
+    cache.invalidate(**scopes)
+    transaction.on_commit(lambda: cache.invalidate(**scopes))
+
+
+@receiver([post_save, post_delete], sender=Assessment)
+def assessment_changed(sender, instance: Assessment, raw=False, **kwargs):
+    if raw:
+        return
+    # The views rarely load the system with the assessment, so only its organisation is read when it is not loaded
+    system = instance._state.fields_cache.get("system")
+    if system is not None:
+        organisation_id = system.organisation_id
+    else:
+        organisation_id = System.objects.filter(pk=instance.system_id).values_list("organisation_id", flat=True).first()
+    scopes = {"assessment": instance.pk}
+    if organisation_id:
+        scopes["organisation"] = organisation_id
+    _invalidate(**scopes)
+
+
+@receiver([post_save, post_delete], sender=System)
+def system_changed(sender, instance: System, raw=False, **kwargs):
+    if raw or not instance.organisation_id:
+        return
+    _invalidate(organisation=instance.organisation_id)
+
+
+@receiver([post_save, post_delete], sender=UserProfile)
+def user_profile_changed(sender, instance: UserProfile, raw=False, **kwargs):
+    if raw:
+        return
+    scopes = {"user_profile": instance.pk}
+    if instance.organisation_id:
+        scopes["organisation"] = instance.organisation_id
+    _invalidate(**scopes)
+
+
+@receiver([post_save, post_delete], sender=Configuration)
+def configuration_changed(sender, instance: Configuration, raw=False, **kwargs):
+    if raw:
+        return
+    _invalidate(configuration="all")
@@ -0,0 +1,11 @@
+'use strict';
+{
+    // Apply a change list filter as soon as an object is chosen in its autocomplete box.
+    // select2 signals the choice with a jQuery event, so listen with the admin's jQuery.
+    const $ = django.jQuery;
+    $(function () {
+        $('.autocomplete-filter select').on('change', function () {
+            this.form.submit();
+        });
+    });
+}
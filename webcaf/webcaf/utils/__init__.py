@@ -1,4 +1,4 @@
 # webcaf/webcaf/utils/__init__.py
-from .email import mask_email
+from .email import mask_email, mask_emails_in
 
-__all__ = ["mask_email"]
+__all__ = ["mask_email", "mask_emails_in"]
@@ -76,5 +76,5 @@ class CafFormUtil:
             return fields_by_category[category].index(field_name) + 1
         except ValueError:
             # This shouldn't happen, but if it does, log an error and return a generic message
-            CafFormUtil.logger.error(f"Field {field_name} not found in category {category}")
+            CafFormUtil.logger.error("Field %s not found in category %s", field_name, category)
             return -1
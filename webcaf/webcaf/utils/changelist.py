@@ -0,0 +1,113 @@
+"""
+Admin change lists over tables that grow large: estimated counts for the unfiltered lists,
+large columns left out of the list queries, and filters on related objects that search for
+the object instead of listing every one.
+"""
+
+from django import forms
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.admin.views.main import ChangeList
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+
+
+def estimated_count(queryset: QuerySet) -> int:
+    """
+    :return: The planner's estimate of the number of rows in the table of the queryset,
+        -1 when the table has not been analysed yet.
+    """
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(
+            "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [queryset.model._meta.db_table]
+        )
+        row = cursor.fetchone()
+    return row[0] if row else -1
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Counts an unfiltered list with the table's row estimate once that is above
+    ``ADMIN_ESTIMATED_COUNT_THRESHOLD``, as an exact count reads the whole table. Filtered
+    lists, and small tables, are counted exactly.
+    """
+
+    @cached_property
+    def count(self) -> int:
+        if isinstance(self.object_list, QuerySet) and not self.object_list.query.where:
+            estimate = estimated_count(self.object_list)
+            if estimate >= settings.ADMIN_ESTIMATED_COUNT_THRESHOLD:
+                return estimate
+        return super().count
+
+
+class DeferredChangeList(ChangeList):
+    def get_queryset(self, request, exclude_parameters=None):
+        queryset = super().get_queryset(request, exclude_parameters)
+        return queryset.defer(*self.model_admin.changelist_defer)
+
+
+class LargeChangelistMixin:
+    """
+    Model admin mixin for tables that grow large. The list is counted once, with an
+    estimate when it is not filtered, and the fields in ``changelist_defer`` are only
+    loaded when an object is opened.
+    """
+
+    paginator = EstimatedCountPaginator
+    # The total shown next to the search box is a second count of the whole table
+    show_full_result_count = False
+    changelist_defer: list[str] = []
+
+    def get_changelist(self, request, **kwargs):
+        return DeferredChangeList
+
+    @property
+    def media(self):
+        media = super().media  # type: ignore
+        if any(isinstance(spec, tuple) and spec[1] is AutocompleteFilter for spec in self.list_filter):  # type: ignore
+            media += AutocompleteSelect(None, self.admin_site).media  # type: ignore
+            media += forms.Media(js=["webcaf/js/admin_autocomplete_filter.js"])
+        return media
+
+
+class AutocompleteFilter(admin.RelatedFieldListFilter):
+    """
+    Filter on a related object chosen with the admin's autocomplete search, instead of a
+    link for every object. Use it with ``list_filter = [("field__path", AutocompleteFilter)]``
+    in an admin with ``LargeChangelistMixin``, the admin of the related model needs
+    ``search_fields``.
+    """
+
+    template = "admin/webcaf/autocomplete_filter.html"
+
+    def field_choices(self, field, request, model_admin):
+        # Only the selected object is shown, by the widget
+        return []
+
+    def has_output(self):
+        return True
+
+    def choices(self, changelist):
+        remove = [self.lookup_kwarg, self.lookup_kwarg_isnull]
+        choice_field = forms.ModelChoiceField(
+            queryset=self.field.remote_field.model._default_manager.using(changelist.queryset.db),
+            to_field_name=self.field.target_field.name,
+            widget=AutocompleteSelect(self.field, changelist.model_admin.admin_site),
+            required=False,
+        )
+        yield {
+            "selected": self.lookup_val is None and not self.lookup_val_isnull,
+            "query_string": changelist.get_query_string(remove=remove),
+            # The other filters and the search, kept when the form is submitted
+            "hidden": [
+                (name, value)
+                for name, values in changelist.filter_params.items()
+                if name not in remove
+                for value in values
+            ],
+            "widget": choice_field.widget.render(self.lookup_kwarg, (self.lookup_val or [None])[-1]),
+        }
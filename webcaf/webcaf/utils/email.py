@@ -1,4 +1,5 @@
 import re
+from typing import Any
 
 EMAIL_RE = re.compile(r"([a-zA-Z0-9._%+-]+)@([a-zA-Z0-9.-]+\.[a-zA-Z]{2,})")
 
@@ -18,3 +19,29 @@ def mask_email(text: str):
     """
     """Replace email addresses with a masked version"""
     return EMAIL_RE.sub(lambda m: f"{m.group(1)[:2]}***@{m.group(2)}", text)
+
+
+def mask_emails_in(value: Any) -> Any:
+    """
+    Mask the email addresses in every string of a JSON-like value, such as an error
+    report, see ``mask_email``.
+
+    :param value: A string, or dictionaries and lists of them. Other values are kept.
+    :return: A copy of the value with the email addresses masked.
+    """
+    if isinstance(value, str):
+        return mask_email(value)
+    if isinstance(value, dict):
+        return {key: mask_emails_in(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [mask_emails_in(item) for item in value]
+    return value
+
+
+def mask_sentry_event(event: dict, hint: dict) -> dict:
+    """
+    ``before_send`` and ``before_breadcrumb`` hook for Sentry. The Sentry logging
+    integration reads log records before the handlers' ``MaskEmailFilter`` runs, so the
+    email addresses in the errors and breadcrumbs it sends are masked here.
+    """
+    return mask_emails_in(event)
@@ -0,0 +1,82 @@
+import copy
+from typing import Any
+
+
+def _escape(key: str) -> str:
+    return key.replace("~", "~0").replace("/", "~1")
+
+
+def _unescape(token: str) -> str:
+    return token.replace("~1", "/").replace("~0", "~")
+
+
+def make_patch(source: Any, target: Any, path: str = "") -> list[dict[str, Any]]:
+    """
+    Build a JSON patch (RFC 6902) that turns ``source`` into ``target``.
+
+    Only objects are diffed key by key. Any other value, including lists, is
+    replaced as a whole, which is enough for the nested dictionaries stored in
+    ``Assessment.assessments_data``.
+
+    :param source: The original JSON document.
+    :param target: The JSON document the patch should produce.
+    :param path: JSON pointer of the documents being compared, used when recursing.
+    :return: A list of ``add``, ``remove`` and ``replace`` operations.
+    :rtype: list[dict[str, Any]]
+    """
+    if isinstance(source, dict) and isinstance(target, dict):
+        operations: list[dict[str, Any]] = []
+        for key in source.keys() - target.keys():
+            operations.append({"op": "remove", "path": f"{path}/{_escape(key)}"})
+        for key, value in target.items():
+            key_path = f"{path}/{_escape(key)}"
+            if key not in source:
+                operations.append({"op": "add", "path": key_path, "value": value})
+            elif source[key] != value or type(source[key]) is not type(value):
+                operations.extend(make_patch(source[key], value, key_path))
+        return operations
+    if source == target and type(source) is type(target):
+        return []
+    return [{"op": "replace", "path": path, "value": target}]
+
+
+def apply_patch(document: Any, patch: list[dict[str, Any]], in_place: bool = False) -> Any:
+    """
+    Apply a JSON patch produced by ``make_patch`` to ``document``.
+
+    :param document: The JSON document to patch.
+    :param patch: The list of operations to apply, in order.
+    :param in_place: If True, modify ``document`` instead of patching a copy of it.
+        Useful when applying a chain of patches to a document that is already a copy.
+    :return: The patched document.
+    :raises ValueError: If an operation is not supported or its path does not exist.
+    """
+    result = document if in_place else copy.deepcopy(document)
+    for operation in patch:
+        op = operation["op"]
+        if operation["path"] == "":
+            if op not in ("add", "replace"):
+                raise ValueError(f"Cannot {op} the root of the document")
+            result = copy.deepcopy(operation["value"])
+            continue
+
+        *parents, last = [_unescape(token) for token in operation["path"].split("/")[1:]]
+        container = result
+        for token in parents:
+            if not isinstance(container, dict) or token not in container:
+                raise ValueError(f"Path {operation['path']} does not exist")
+            container = container[token]
+        if not isinstance(container, dict):
+            raise ValueError(f"Path {operation['path']} does not exist")
+
+        if op in ("add", "replace"):
+            if op == "replace" and last not in container:
+                raise ValueError(f"Path {operation['path']} does not exist")
+            container[last] = copy.deepcopy(operation["value"])
+        elif op == "remove":
+            if last not in container:
+                raise ValueError(f"Path {operation['path']} does not exist")
+            del container[last]
+        else:
+            raise ValueError(f"Unsupported operation {op}")
+    return result
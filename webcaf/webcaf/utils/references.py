@@ -1,5 +1,8 @@
+import math
 import string
 
+from django.db import connection
+
 CHAR_SET = string.digits + "".join([char for char in string.ascii_uppercase if char not in "AEIOUY"])
 
 PRIMES = {
@@ -43,3 +46,81 @@ def generate_reference(
     while len(reference_chars) < num_chars:
         reference_chars.append(char_set[0])
     return "".join(reference_chars)
+
+
+def reserve_ids(model, count: int) -> list[int]:
+    """
+    Take primary keys from the model's sequence, so the references of new rows can be
+    generated before they are inserted, and every row is written once.
+
+    Args:
+        model: The model to reserve primary keys for.
+        count: Number of primary keys.
+
+    Returns:
+        list[int]: The reserved primary keys.
+    """
+    if not count:
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT nextval(pg_get_serial_sequence(%s, %s)) FROM generate_series(1, %s)",
+            [model._meta.db_table, model._meta.pk.column, count],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def reference_ids(
+    reference: str, num_chars: int = 5, prime_set: str = "default", char_set: str = CHAR_SET
+) -> list[int]:
+    """
+    Invert generate_reference: find the primary keys that generate a reference. The first
+    prime of most sets is coprime with the number of references, and there is a single key.
+    Otherwise the keys repeat every len(char_set) ** num_chars / gcd(prime, len(char_set) ** num_chars).
+
+    Args:
+        reference: The reference to decode
+        num_chars: Number of characters in the reference (default: 5)
+        prime_set: Which set of primes the reference was generated with (default: "default")
+        char_set: The set of characters the reference was generated with
+
+    Returns:
+        list[int]: The primary keys, in ascending order, that generate the reference.
+
+    Raises:
+        ValueError: If the reference is not one that generate_reference returns.
+    """
+    len_char_set = len(char_set)
+    if len(reference) != num_chars or any(char not in char_set for char in reference):
+        raise ValueError(f"{reference!r} is not a {num_chars} character reference.")
+    size = len_char_set**num_chars
+    prime_1, prime_2 = PRIMES[prime_set]
+    # The characters are the base len(char_set) digits of the value, least significant first
+    reference_value = sum(char_set.index(char) * len_char_set**i for i, char in enumerate(reference))
+    target = (reference_value - len_char_set ** (num_chars - 1) - prime_2) % size
+    divisor = math.gcd(prime_1, size)
+    if target % divisor:
+        raise ValueError(f"{reference!r} is not generated by the {prime_set} prime set.")
+    # pk * prime_1 = target (mod size), divided through by the gcd
+    step = size // divisor
+    pk = (target // divisor) * pow(prime_1 // divisor, -1, step) % step
+    return list(range(pk, size, step))
+
+
+def decode_reference(reference: str, num_chars: int = 5, prime_set: str = "default", char_set: str = CHAR_SET) -> int:
+    """
+    Find the primary key of a reference, the inverse of generate_reference.
+
+    Args:
+        reference: The reference to decode
+        num_chars: Number of characters in the reference (default: 5)
+        prime_set: Which set of primes the reference was generated with (default: "default")
+        char_set: The set of characters the reference was generated with
+
+    Returns:
+        int: The smallest primary key that generates the reference.
+
+    Raises:
+        ValueError: If the reference is not one that generate_reference returns.
+    """
+    return reference_ids(reference, num_chars, prime_set, char_set)[0]
@@ -0,0 +1,149 @@
+"""
+Routing of read-only pages to a read replica.
+
+Views opt in with ``ReadOnlyViewMixin`` or ``read_only_view``. While such a view handles
+a GET or HEAD request, ``ReplicaRouter`` sends reads to the replica alias named by
+``settings.DATABASE_REPLICA_ALIAS``. All writes go to the primary.
+
+Replicas lag behind the primary, so a session that wrote something is kept on the
+primary for ``settings.REPLICA_STICKY_SECONDS`` afterwards. Reads also stay on the
+primary once the current request has written, so a user always sees their own changes.
+"""
+
+import contextvars
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+SAFE_METHODS = ("GET", "HEAD")
+# Session key holding the time until which the session reads from the primary
+PRIMARY_UNTIL_SESSION_KEY = "_db_primary_until"
+# Apps whose tables are always read from the primary
+PRIMARY_ONLY_APPS = {"sessions"}
+
+_read_only: contextvars.ContextVar[bool] = contextvars.ContextVar("replica_read_only", default=False)
+_use_primary: contextvars.ContextVar[bool] = contextvars.ContextVar("replica_use_primary", default=False)
+_has_written: contextvars.ContextVar[bool] = contextvars.ContextVar("replica_has_written", default=False)
+
+
+class ReplicaRouter:
+    """
+    Database router that reads from the replica inside read-only views and writes to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        replica = getattr(settings, "DATABASE_REPLICA_ALIAS", None)
+        if (
+            replica
+            and _read_only.get()
+            and not _use_primary.get()
+            and not _has_written.get()
+            and model._meta.app_label not in PRIMARY_ONLY_APPS
+        ):
+            return replica
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label not in PRIMARY_ONLY_APPS:
+            _has_written.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaStickinessMiddleware:
+    """
+    Keeps a session on the primary database for a short time after it writes, so pages
+    read from the replica never show data older than the user's last change.
+
+    Must come after ``SessionMiddleware``.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        session = getattr(request, "session", None)
+        primary_until = session.get(PRIMARY_UNTIL_SESSION_KEY, 0) if session is not None else 0
+        use_primary_token = _use_primary.set(primary_until > time.time())
+        has_written_token = _has_written.set(False)
+        try:
+            response = self.get_response(request)
+            # A logout flushes the session, do not start a new one just to hold the window
+            user = getattr(request, "user", None)
+            if _has_written.get() and session is not None and user is not None and user.is_authenticated:
+                session[PRIMARY_UNTIL_SESSION_KEY] = time.time() + settings.REPLICA_STICKY_SECONDS
+            return response
+        finally:
+            _use_primary.reset(use_primary_token)
+            _has_written.reset(has_written_token)
+
+
+@contextmanager
+def read_only(request):
+    """
+    Lets the reads of a GET or HEAD request made inside the block be served from the replica.
+
+    :param request: The request being handled, other methods always use the primary.
+    """
+    if request.method not in SAFE_METHODS:
+        yield
+        return
+    token = _read_only.set(True)
+    try:
+        yield
+    finally:
+        _read_only.reset(token)
+
+
+def render_response(response):
+    """
+    Template responses are rendered by the handler, after the view returns. Render them
+    straight away, so the template reads happen inside the read only block.
+    """
+    if hasattr(response, "render") and not getattr(response, "is_rendered", True):
+        response.render()
+    return response
+
+
+def read_only_view(view_func):
+    """
+    Decorator for function views whose GET and HEAD requests can be served from the replica.
+    """
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        with read_only(request):
+            return render_response(view_func(request, *args, **kwargs))
+
+    return wrapper
+
+
+class ReadOnlyViewMixin:
+    """
+    Class based view mixin, the GET and HEAD requests of the view can be served from the replica.
+    Must come first in the bases so the permission checks also read from the replica.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        with read_only(request):
+            return render_response(super().dispatch(request, *args, **kwargs))
+
+
+class ReadOnlyChangelistMixin:
+    """
+    Model admin mixin, the change list pages can be served from the replica.
+    Bulk actions are posted to the change list and keep using the primary.
+    """
+
+    def changelist_view(self, request, extra_context=None):
+        with read_only(request):
+            return render_response(super().changelist_view(request, extra_context))
@@ -31,7 +31,7 @@ class SessionUtil:
         try:
             return UserProfile.objects.get(id=user_profile_id)
         except Exception:  # type: ignore[catching-any]
-            SessionUtil.logger.error(f"Unable to retrieve user profile with id {user_profile_id}")
+            SessionUtil.logger.error("Unable to retrieve user profile with id %s", user_profile_id)
         return None
 
     @staticmethod
@@ -64,5 +64,5 @@ class SessionUtil:
                     )
                     return assessment
             except Exception:  # type: ignore[catching-any]
-                SessionUtil.logger.warning(f"Unable to retrieve assessment with id {id_} for user {request.user.pk}")
+                SessionUtil.logger.warning("Unable to retrieve assessment with id %s for user %s", id_, request.user.pk)
         return None
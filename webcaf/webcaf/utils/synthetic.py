@@ -0,0 +1,72 @@
+"""
+Synthetic CAF 3.2 answers, for benchmarks and generated test datasets.
+
+The answers have the shape the assessment pages save, and are the same for the same seed.
+"""
+
+import random
+
+from webcaf.webcaf.caf.util import IndicatorStatusChecker
+
+WORDS = (
+    "access control patch network supplier backup incident logging monitoring training policy risk "
+    "asset device identity review audit response recovery service data owner board process"
+).split()
+
+
+def caf32_outcomes() -> list[dict]:
+    """
+    :return: Every outcome of the CAF 3.2 framework, in framework order.
+    """
+    from webcaf.webcaf.frameworks import routers
+
+    return [
+        outcome | {"code": outcome_id}
+        for objective in routers["caf32"].get_sections()
+        for principle in objective["principles"].values()
+        for outcome_id, outcome in principle["outcomes"].items()
+    ]
+
+
+def synthetic_comment(rng: random.Random, max_words: int) -> str:
+    return " ".join(rng.choices(WORDS, k=rng.randint(0, max_words))).capitalize()
+
+
+def synthetic_assessments_data(
+    rng: random.Random,
+    completion: float,
+    max_comment_words: int = 60,
+    comment_share: float = 0.2,
+    outcomes: list[dict] | None = None,
+) -> dict:
+    """
+    Answers for the first outcomes of the framework.
+
+    :param rng: Source of the random answers and comments.
+    :param completion: Share of the outcomes answered and confirmed, from 0 to 1.
+    :param max_comment_words: Longest comment added to an answer.
+    :param comment_share: Share of the statements with a comment, the others have an empty one.
+    :param outcomes: The outcomes to answer from, ``caf32_outcomes()`` when not given.
+    :return: The ``assessments_data`` of an assessment.
+    """
+    outcomes = outcomes if outcomes is not None else caf32_outcomes()
+    assessments_data = {}
+    for outcome in outcomes[: round(len(outcomes) * completion)]:
+        indicators: dict[str, bool | str] = {}
+        for category, statements in outcome["indicators"].items():
+            for statement_id in statements:
+                key = f"{category}_{statement_id}"
+                indicators[key] = rng.random() < (0.8 if category == "achieved" else 0.2)
+                if category != "not-achieved":
+                    has_comment = rng.random() < comment_share
+                    indicators[f"{key}_comment"] = synthetic_comment(rng, max_comment_words) if has_comment else ""
+        status = IndicatorStatusChecker.get_status_for_indicator({"indicators": indicators})
+        assessments_data[outcome["code"]] = {
+            "indicators": indicators,
+            "confirmation": {
+                **status,
+                "confirm_outcome": "confirm",
+                "confirm_outcome_confirm_comment": synthetic_comment(rng, max_comment_words),
+            },
+        }
+    return assessments_data
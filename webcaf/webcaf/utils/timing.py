@@ -0,0 +1,240 @@
+"""
+Per-request timing of the database, templates, the view and slow dependencies.
+
+``ServerTimingMiddleware`` starts a ``RequestTimings`` for each request. Code that calls a
+slow dependency wraps the call in ``timed(<name>)``. The middleware then adds the totals to
+the request log, sends them in a ``Server-Timing`` header to staff users, and writes the
+query fingerprints of slow requests to the slow request log.
+"""
+
+import json
+import logging
+import re
+import time
+from collections import Counter, defaultdict
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.db import connections
+from django.template.backends.django import DjangoTemplates
+from django.template.backends.django import Template as DjangoTemplate
+
+from webcaf.middleware import log_context
+
+logger = logging.getLogger("webcaf.timing")
+slow_request_logger = logging.getLogger("webcaf.slow_requests")
+
+# Descriptions shown in the browser's developer tools
+TIMING_DESCRIPTIONS = {
+    "db": "Database",
+    "template": "Template rendering",
+    "view": "View, including the other timings",
+    "pdf": "PDF generation",
+    "xlsx": "Spreadsheet generation",
+    "http": "Outbound HTTP",
+    "total": "Total",
+}
+
+_current: ContextVar["RequestTimings | None"] = ContextVar("request_timings", default=None)
+
+
+@dataclass
+class RequestTimings:
+    """
+    Time spent on each kind of work during a request, in milliseconds, and the number
+    of times it was done.
+    """
+
+    durations: dict[str, float] = field(default_factory=lambda: defaultdict(float))
+    counts: Counter = field(default_factory=Counter)
+    queries: list[tuple[str, float]] = field(default_factory=list)
+
+    def add(self, name: str, duration_ms: float):
+        self.durations[name] += duration_ms
+        self.counts[name] += 1
+
+    def record_query(self, execute, sql, params, many, context):
+        """
+        ``execute_wrapper`` that times every statement run on a connection.
+        """
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration_ms = (time.perf_counter() - start) * 1000
+            self.add("db", duration_ms)
+            self.queries.append((sql, duration_ms))
+
+    def server_timing(self) -> str:
+        """
+        :return: The value of the ``Server-Timing`` header.
+        """
+        entries = []
+        for name, duration_ms in self.durations.items():
+            entry = f"{name};dur={duration_ms:.1f}"
+            if name in TIMING_DESCRIPTIONS:
+                entry += f';desc="{TIMING_DESCRIPTIONS[name]}"'
+            entries.append(entry)
+        return ", ".join(entries)
+
+    def as_dict(self) -> dict:
+        return {
+            name: {"ms": round(duration_ms, 1), "count": self.counts[name]}
+            for name, duration_ms in self.durations.items()
+        }
+
+    def query_fingerprints(self) -> list[dict]:
+        """
+        :return: The statements grouped by fingerprint, slowest total first.
+        """
+        grouped: dict[str, list[float]] = defaultdict(list)
+        for sql, duration_ms in self.queries:
+            grouped[fingerprint(sql)].append(duration_ms)
+        return sorted(
+            (
+                {"fingerprint": sql, "count": len(durations), "total_ms": round(sum(durations), 1)}
+                for sql, durations in grouped.items()
+            ),
+            key=lambda entry: entry["total_ms"],
+            reverse=True,
+        )
+
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PARAMETER_LIST_RE = re.compile(r"\((?:\s*(?:%s|\?)\s*,)+\s*(?:%s|\?)\s*\)")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def fingerprint(sql: str) -> str:
+    """
+    Replace the literals in a statement, so statements that differ only in their values
+    are grouped together.
+    """
+    sql = _STRING_RE.sub("?", sql)
+    sql = _NUMBER_RE.sub("?", sql)
+    sql = _PARAMETER_LIST_RE.sub("(...)", sql)
+    return _WHITESPACE_RE.sub(" ", sql).strip()
+
+
+@contextmanager
+def timed(name: str):
+    """
+    Add the time spent in the block to the current request's timings, if any.
+
+    :param name: The kind of work, e.g. ``pdf`` or ``http``.
+    """
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, (time.perf_counter() - start) * 1000)
+
+
+class ServerTimingMiddleware:
+    """
+    Times the request and every database statement it runs.
+
+    Place it before the session middleware so the session and authentication queries are
+    counted. The timings are logged for every request, sent in a ``Server-Timing`` header
+    when the user is staff or ``DEBUG`` is on, and requests slower than
+    ``SLOW_REQUEST_THRESHOLD_MS`` are written with their query fingerprints to the slow
+    request log.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.slow_request_threshold_ms = settings.SLOW_REQUEST_THRESHOLD_MS
+
+    def __call__(self, request):
+        timings = RequestTimings()
+        token = _current.set(timings)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(timings.record_query))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        timings.durations.setdefault("db", 0.0)
+        total_ms = (time.perf_counter() - start) * 1000
+        timings.add("total", total_ms)
+
+        # The request logging middleware has returned, log with the context it built
+        context_token = log_context.set(getattr(request, "log_context", {}))
+        try:
+            self.log(request, response, timings, total_ms)
+        finally:
+            log_context.reset(context_token)
+        if settings.DEBUG or self.is_staff(request):
+            response["Server-Timing"] = timings.server_timing()
+        return response
+
+    def log(self, request, response, timings: RequestTimings, total_ms: float):
+        logger.info(
+            "%s %s %s %.1fms %s queries",
+            request.method,
+            request.path,
+            response.status_code,
+            total_ms,
+            timings.counts["db"],
+            extra={"timings": timings.as_dict()},
+        )
+        if self.slow_request_threshold_ms and total_ms >= self.slow_request_threshold_ms:
+            slow_request_logger.warning(
+                json.dumps(
+                    {
+                        "method": request.method,
+                        "path": request.path,
+                        "status": response.status_code,
+                        "timings": timings.as_dict(),
+                        "queries": timings.query_fingerprints(),
+                    }
+                )
+            )
+
+    @staticmethod
+    def is_staff(request) -> bool:
+        user = getattr(request, "user", None)
+        return bool(user is not None and user.is_authenticated and user.is_staff)
+
+
+class ViewTimingMiddleware:
+    """
+    Times the view, including the rendering of its template response. Place it last,
+    so the time spent in the other middleware is not included.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with timed("view"):
+            return self.get_response(request)
+
+
+class TimedTemplate(DjangoTemplate):
+    def render(self, context=None, request=None):
+        with timed("template"):
+            return super().render(context, request)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """
+    Django template backend that adds the time spent rendering to the request's timings.
+    Templates included by a template are part of its render time.
+    """
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return TimedTemplate(template.template, self)
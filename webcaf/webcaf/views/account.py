@@ -5,9 +5,10 @@ from django.urls import reverse
 from django.views.generic import TemplateView
 
 from webcaf.webcaf.models import Assessment, System, UserProfile
+from webcaf.webcaf.utils.replica import ReadOnlyViewMixin
 
 
-class AccountView(LoginRequiredMixin, TemplateView):
+class AccountView(ReadOnlyViewMixin, LoginRequiredMixin, TemplateView):
     """
     Handles the user account view which provides user account management and displays specific
     profile-related data. It is accessible only to authenticated users and serves as an entry point
@@ -57,7 +58,8 @@ class AccountView(LoginRequiredMixin, TemplateView):
                     "last_updated",
                     "assessment_period",
                     "created_by__username",
-                    "assessments_data",
+                    "status",
+                    "framework",
                 )
                 .order_by("-last_updated")
             )
@@ -66,7 +68,7 @@ class AccountView(LoginRequiredMixin, TemplateView):
                 assessment for assessment in all_assessments if assessment.status == "submitted"
             ]
             data["completed_assessment_count"] = sum(
-                1 for draft_assessment in data["draft_assessments"] if draft_assessment.is_complete()
+                1 for draft_assessment in data["draft_assessments"] if draft_assessment.is_complete_cached()
             )
 
         return data
@@ -80,8 +82,10 @@ class AccountView(LoginRequiredMixin, TemplateView):
         :return:
         """
         data = self.get_context_data(**kwargs)
-        # Set a draft assessment as empty as we are starting a new flow
-        request.session["draft_assessment"] = {}
+        # Set a draft assessment as empty as we are starting a new flow, unless it already is
+        # so the session is not saved again for nothing
+        if request.session.get("draft_assessment") != {}:
+            request.session["draft_assessment"] = {}
         if "current_profile" not in data:
             return render(self.request, "user-pages/no-profile-setup.html", status=403)
         return super().get(request, *args, **kwargs)
@@ -118,7 +118,7 @@ class EditAssessmentView(LoginRequiredMixin, FormView):
             assessment.caf_profile = draft_assessment["caf_profile"]
 
             assessment.save()
-            self.logger.info(f"Assessment {assessment.id} changed by {self.request.user.pk}")
+            self.logger.info("Assessment %s changed by %s", assessment.id, self.request.user.pk)
             if self.form_class == AssessmentProfileForm and draft_assessment["caf_profile"] == "enhanced":
                 return redirect(
                     reverse("edit-draft-assessment-choose-review-type", kwargs={"assessment_id": assessment.id})
@@ -138,7 +138,7 @@ class EditAssessmentView(LoginRequiredMixin, FormView):
         curren_organisation = UserProfile.objects.get(id=self.request.session["current_profile_id"]).organisation
         if assessment_to_modify.system.id not in curren_organisation.systems.values_list("id", flat=True):
             self.logger.error(
-                f"The user {self.request.user} does not have access to this assessment {assessment_to_modify}"
+                "The user %s does not have access to this assessment %s", self.request.user, assessment_to_modify
             )
             raise PermissionError("You are not allowed to edit this assessment")
         kwargs["instance"] = assessment_to_modify
@@ -408,7 +408,7 @@ class CreateAssessmentView(LoginRequiredMixin, FormView):
             )
             draft_assessment["assessment_id"] = assessment.id
             draft_assessment["framework"] = assessment.framework
-            self.logger.info(f"Assessment {assessment.id} created by {self.request.user.pk}")
+            self.logger.info("Assessment %s created by %s", assessment.id, self.request.user.pk)
             # Forward to editing the draft now.
             if self.form_class == AssessmentProfileForm and draft_assessment["caf_profile"] == "enhanced":
                 return redirect(
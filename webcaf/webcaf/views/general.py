@@ -72,7 +72,7 @@ def logout_view(request):
     :param request:
     :return:
     """
-    logout_view_logger.info(f"Logging out user {request.user.pk}")
+    logout_view_logger.info("Logging out user %s", request.user.pk)
     # 1. Log out Django session
     django_logout(request)
     if settings.SSO_MODE.lower() == "none":
@@ -0,0 +1,24 @@
+import hmac
+
+from django.conf import settings
+from django.http import Http404, HttpResponseForbidden, JsonResponse
+from django.views.decorators.cache import never_cache
+from django.views.decorators.http import require_GET
+
+from webcaf.webcaf.metrics import collect_metrics
+
+
+@never_cache
+@require_GET
+def metrics(request):
+    """
+    Returns the metrics of the worker that handled the request as JSON.
+    The caller must send ``Authorization: Bearer <METRICS_TOKEN>``. The endpoint does not
+    exist when no token is configured.
+    """
+    token = settings.METRICS_TOKEN
+    if not token:
+        raise Http404()
+    if not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}"):
+        return HttpResponseForbidden()
+    return JsonResponse(collect_metrics())
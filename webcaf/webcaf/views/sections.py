@@ -6,6 +6,7 @@ from pathlib import Path
 from typing import Any
 
 from django.conf import settings
+from django.db import transaction
 from django.forms import Form
 from django.http import HttpResponse
 from django.shortcuts import redirect
@@ -14,11 +15,12 @@ from django.urls import reverse
 from django.views.generic import FormView, TemplateView
 from weasyprint import default_url_fetcher
 
-from webcaf.webcaf.models import Assessment, Configuration
-from webcaf.webcaf.notification import send_notify_email
-from webcaf.webcaf.utils import mask_email
+from webcaf.webcaf.models import ArchivedAssessment, Assessment, Configuration
+from webcaf.webcaf.notification import queue_notify_email
 from webcaf.webcaf.utils.permission import UserRoleCheckMixin
+from webcaf.webcaf.utils.replica import ReadOnlyViewMixin
 from webcaf.webcaf.utils.session import SessionUtil
+from webcaf.webcaf.utils.timing import timed
 
 
 class SectionConfirmationView(UserRoleCheckMixin, FormView):
@@ -76,20 +78,18 @@ class SectionConfirmationView(UserRoleCheckMixin, FormView):
                 if assessment.status == "draft":
                     assessment.last_updated_by = self.request.user
                     assessment.status = "submitted"
-                    assessment.save()
                     uk_tz = zoneinfo.ZoneInfo("Europe/London")
-                    self.logger.info(
-                        f"Assessment {assessment.id} reference {assessment.reference} submitted"
-                        f" at {datetime.now(tz=uk_tz).strftime('%Y-%m-%d %H:%M:%S')}"
-                    )
-                    if settings.NOTIFY_CONFIRMATION_TEMPLATE_ID:
-                        self.logger.info(
-                            mask_email(
-                                f"Sending confirmation email for {assessment.id} to {self.request.user.pk} {self.request.user.email}"
+                    # The confirmation email is only sent if the submission is saved
+                    with transaction.atomic():
+                        assessment.save()
+                        if settings.NOTIFY_CONFIRMATION_TEMPLATE_ID:
+                            self.logger.info(
+                                "Queueing confirmation email for %s to %s %s",
+                                assessment.id,
+                                self.request.user.pk,
+                                self.request.user.email,
                             )
-                        )
-                        try:
-                            send_notify_email(
+                            queue_notify_email(
                                 [self.request.user.email],
                                 {
                                     "first_name": self.request.user.first_name,
@@ -103,25 +103,24 @@ class SectionConfirmationView(UserRoleCheckMixin, FormView):
                                 },
                                 settings.NOTIFY_CONFIRMATION_TEMPLATE_ID,
                             )
-                        except Exception:  # type: ignore
-                            self.logger.exception(
-                                mask_email(
-                                    f"GOV.UK Notify: Failed to send confirmation email for {assessment.id} user {self.request.user.pk}"
-                                )
-                            )
-
+                    self.logger.info(
+                        "Assessment %s reference %s submitted at %s",
+                        assessment.id,
+                        assessment.reference,
+                        datetime.now(tz=uk_tz).strftime("%Y-%m-%d %H:%M:%S"),
+                    )
                 else:
-                    self.logger.info(f"Assessment {assessment.id} already submitted")
+                    self.logger.info("Assessment %s already submitted", assessment.id)
                 return redirect(reverse("show-submission-confirmation"))
             else:
                 # User has not completed all objectives and should not have reached this page
                 self.logger.error(
-                    mask_email(
-                        f"User {self.request.user.pk} has not completed all objectives, but tried to submit {assessment.id}"
-                    )
+                    "User %s has not completed all objectives, but tried to submit %s",
+                    self.request.user.pk,
+                    assessment.id,
                 )
         else:
-            self.logger.info(f"No assessment found in session {self.request.user.pk}")
+            self.logger.info("No assessment found in session %s", self.request.user.pk)
 
         return redirect(reverse("my-account"))
 
@@ -159,7 +158,7 @@ class ShowSubmissionConfirmationView(UserRoleCheckMixin, TemplateView):
         return {}
 
 
-class ViewSubmittedAssessmentsView(UserRoleCheckMixin, TemplateView):
+class ViewSubmittedAssessmentsView(ReadOnlyViewMixin, UserRoleCheckMixin, TemplateView):
     """
     Represents a view for displaying submitted assessments in the user's account.
 
@@ -183,39 +182,41 @@ class ViewSubmittedAssessmentsView(UserRoleCheckMixin, TemplateView):
 
     def get_context_data(self, **kwargs):
         data = super().get_context_data(**kwargs)
-        submitted_assessments = list(
+        organisation = SessionUtil.get_current_user_profile(self.request).organisation
+        submitted_assessments = (
             Assessment.objects.filter(
-                system__organisation=SessionUtil.get_current_user_profile(self.request).organisation,
+                system__organisation=organisation,
                 status__in=["submitted"],
             )
+            .select_related("system", "first_submitted_by")
             .only(
                 "id",
+                "reference",
                 "system__name",
-                "caf_profile",
-                "system__organisation__name",
-                "created_on",
-                "last_updated",
-                "assessment_period",
-                "created_by__username",
-                "assessments_data",
+                "first_submitted_at",
+                "first_submitted_by__email",
             )
             .all()
         )
+        # The submissions of closed periods are in the archive
+        archived_assessments = (
+            ArchivedAssessment.objects.filter(system__organisation=organisation, status="submitted")
+            .order_by("-id")
+            .assessments()
+        )
 
-        # Check the history table of the assessment to see when the status was changed to submitted
-        submitted_date_map = first_submitted_changes([assessment.id for assessment in submitted_assessments])
         data["submitted_assessments"] = []
-        for assessment in submitted_assessments:
-            if assessment.id in submitted_date_map:
-                data["submitted_assessments"].append((assessment, submitted_date_map[assessment.id]))
+        for assessment in [*submitted_assessments, *archived_assessments]:
+            if submitted_time := first_submitted(assessment):
+                data["submitted_assessments"].append((assessment, submitted_time))
             else:
-                self.logger.warning(f"Assessment {assessment.id} has no submitted date")
+                self.logger.warning("Assessment %s has no submitted date", assessment.id)
                 data["submitted_assessments"].append((assessment,))
         data["breadcrumbs"] = [{"url": reverse("my-account"), "text": "Back", "class": "govuk-back-link"}]
         return data
 
 
-class ViewSubmittedAssessment(UserRoleCheckMixin, TemplateView):
+class ViewSubmittedAssessment(ReadOnlyViewMixin, UserRoleCheckMixin, TemplateView):
     template_name = "caf/assessment/completed-assessment.html"
 
     def __init__(self, **kwargs):
@@ -232,20 +233,25 @@ class ViewSubmittedAssessment(UserRoleCheckMixin, TemplateView):
         user_profile = SessionUtil.get_current_user_profile(self.request)
         if not user_profile:
             raise PermissionError("You are not allowed to view this page")
-        assessment = Assessment.objects.get(
-            id=kwargs["assessment_id"], status="submitted", system__organisation=user_profile.organisation
-        )
-        submitted_changes = first_submitted_changes(
-            [
-                assessment.id,
-            ]
+        submitted = {
+            "id": kwargs["assessment_id"],
+            "status": "submitted",
+            "system__organisation": user_profile.organisation,
+        }
+        assessment = (
+            Assessment.objects.select_related("system__organisation", "first_submitted_by").filter(**submitted).first()
         )
-        first_submitted_on = submitted_changes[assessment.id] if assessment.id in submitted_changes else None
+        if assessment is None:
+            # A submission of a closed period, moved to the archive
+            archived = ArchivedAssessment.objects.filter(**submitted).assessments()
+            if not archived:
+                raise Assessment.DoesNotExist(f"No submitted assessment {kwargs['assessment_id']}")
+            assessment = archived[0]
         data: dict[str, Any] = {
             "assessment": assessment,
             "objectives": assessment.get_router().get_sections(),
             "breadcrumbs": [{"url": reverse("view-submitted-assessments"), "text": "Back", "class": "govuk-back-link"}],
-            "first_submitted": first_submitted_on,
+            "first_submitted": first_submitted(assessment),
         }
         return data
 
@@ -254,7 +260,7 @@ class DownloadSubmittedAssessmentPdf(ViewSubmittedAssessment):
     template_name = "caf/assessment/completed-assessment.html"
 
     def get(self, request, *args, **kwargs):
-        self.logger.info(f"Downloading assessment {kwargs['assessment_id']} for user {request.user.pk}")
+        self.logger.info("Downloading assessment %s for user %s", kwargs["assessment_id"], request.user.pk)
         # Local import to avoid crashing the app if the dependency is not installed
         # on the developer machines
         from django.conf import settings
@@ -274,7 +280,10 @@ class DownloadSubmittedAssessmentPdf(ViewSubmittedAssessment):
                 Path(settings.STATIC_ROOT + "/" + url.split("assets/")[-1]).as_uri(), timeout, ssl_context, http_headers
             )
 
-        pdf = HTML(string=html_string, url_fetcher=custom_url_fetcher, base_url=Path(settings.STATIC_ROOT)).write_pdf()
+        with timed("pdf"):
+            pdf = HTML(
+                string=html_string, url_fetcher=custom_url_fetcher, base_url=Path(settings.STATIC_ROOT)
+            ).write_pdf()
         pdf_file = pdf
 
         # Return as PDF response
@@ -288,41 +297,21 @@ class DownloadSubmittedAssessmentPdf(ViewSubmittedAssessment):
 SubmittedTime = namedtuple("SubmittedTime", ["date", "user"])
 
 
-def first_submitted_changes(assessment_ids: list[int]) -> dict[int, SubmittedTime]:
+def first_submitted(assessment: Assessment) -> SubmittedTime | None:
     """
-    Determines the earliest submission date for assessments that transitioned from
-    'draft' to 'submitted' within the given list of assessment IDs.
-
-    This function examines the historical records of assessments to identify the
-    first date when each assessment changed its status from 'draft' to 'submitted'.
-    The result is a dictionary mapping each assessment ID to this first occurrence
-    date.
-
-    :param assessment_ids: List of assessment IDs to analyze.
-    :type assessment_ids: list[int]
-    :return: A dictionary where the keys are assessment IDs and the values are
-        their respective first submission dates.
-    :rtype: dict[int, datetime]
+    Returns when, and by whom, the assessment was first sent for review.
+
+    The values are recorded on the assessment itself when it first moves to the
+    'submitted' status, so no history lookups are needed. The related user must
+    be loaded with ``select_related("first_submitted_by")`` to avoid an extra query.
+
+    :param assessment: The assessment to read the submission details from.
+    :type assessment: Assessment
+    :return: The first submission time and the email of the submitting user, or
+        None if the assessment has never been submitted.
+    :rtype: SubmittedTime | None
     """
-    results = {}
-    HistoricalAssessment = Assessment.history.model
-    # Get all history rows for those assessments, ordered by time
-    histories = (
-        HistoricalAssessment.objects.filter(id__in=assessment_ids)
-        .order_by("id", "history_date")
-        .only("id", "status", "history_date")
-    )
-
-    prev_status: dict[int, str] = {}
-    for h in histories:
-        aid = h.id
-        current = h.status
-        prev = prev_status.get(aid)
-
-        # detect transition draft -> submitted
-        if prev == "draft" and current == "submitted" and aid not in results:
-            results[aid] = SubmittedTime(h.history_date, h.last_updated_by.email)
-
-        prev_status[aid] = current
-
-    return results
+    if not assessment.first_submitted_at:
+        return None
+    submitted_by = assessment.first_submitted_by.email if assessment.first_submitted_by else None
+    return SubmittedTime(assessment.first_submitted_at, submitted_by)
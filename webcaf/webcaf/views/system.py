@@ -10,6 +10,7 @@ from django.views.generic import FormView, TemplateView, UpdateView
 from webcaf.webcaf.forms.general import NextActionForm
 from webcaf.webcaf.models import System, UserProfile
 from webcaf.webcaf.utils.permission import PermissionUtil, UserRoleCheckMixin
+from webcaf.webcaf.utils.replica import ReadOnlyViewMixin
 from webcaf.webcaf.utils.session import SessionUtil
 
 
@@ -138,7 +139,7 @@ class EditSystemView(SystemContextDataMixin, UserRoleCheckMixin, UpdateView):
         return HttpResponseRedirect(self.get_success_url())
 
 
-class ViewSystemsView(LoginRequiredMixin, TemplateView):
+class ViewSystemsView(ReadOnlyViewMixin, LoginRequiredMixin, TemplateView):
     template_name = "system/systems.html"
     login_url = settings.LOGIN_URL
     success_url = "/systems/"
@@ -1,17 +1,75 @@
 import logging
+import threading
+from collections import Counter
 
 from django import forms
+from django.conf import settings
+from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.shortcuts import redirect
 from django.urls import reverse_lazy
+from django.utils import timezone
 from django.views.generic.edit import FormView
 from django_otp import login as otp_login
 
+from webcaf.webcaf.cache import get_cache
+from webcaf.webcaf.metrics import register_collector
 from webcaf.webcaf.models import GovNotifyEmailDevice
-from webcaf.webcaf.utils import mask_email
 
 # Get an instance of a logger for this module
 logger = logging.getLogger(__name__)
 
+_counters: Counter = Counter()
+_counters_lock = threading.Lock()
+
+
+def _count(outcome: str):
+    with _counters_lock:
+        _counters[outcome] += 1
+
+
+def otp_metrics() -> dict[str, float]:
+    """
+    One-time codes sent, reused and refused in this worker, and the codes sent per
+    successful verification.
+    """
+    with _counters_lock:
+        counters = dict(_counters)
+    metrics = {
+        outcome: counters.get(outcome, 0)
+        for outcome in ["sent", "resent", "reused", "cooldown", "throttled", "verified", "rejected"]
+    }
+    sent = metrics["sent"] + metrics["resent"]
+    metrics["sends_per_login"] = round(sent / metrics["verified"], 2) if metrics["verified"] else 0.0
+    return metrics
+
+
+def reset_metrics():
+    with _counters_lock:
+        _counters.clear()
+
+
+register_collector("otp", otp_metrics)
+
+
+def over_send_limit(user) -> bool:
+    """
+    Count a code sent to the user, in a cache entry that expires ``OTP_SEND_WINDOW`` seconds
+    after the first one.
+
+    :return: True when the user has already been sent ``OTP_SEND_LIMIT`` codes in the window.
+    """
+    cache = get_cache()
+    key = f"otp-sends:{user.pk}"
+    cache.add(key, 0, timeout=settings.OTP_SEND_WINDOW)
+    try:
+        sends = cache.incr(key)
+    except ValueError:
+        # Expired between the two calls
+        cache.set(key, 1, timeout=settings.OTP_SEND_WINDOW)
+        sends = 1
+    return sends > settings.OTP_SEND_LIMIT
+
 
 class TokenForm(forms.Form):
     """
@@ -44,8 +102,9 @@ class Verify2FATokenView(LoginRequiredMixin, FormView):
     Handles the 2FA token verification process via email.
 
     This view uses the simple `TokenForm` to capture the OTP token.
-    The `dispatch` method is overridden to send a new token via email
-    every time the page is loaded (GET or POST).
+    A token is sent when the page is loaded and the user has no valid
+    token, so refreshing the page or opening it in another tab reuses
+    the token already sent. The "resend" button asks for a new one.
 
     The `form_valid` method handles the actual token verification.
     """
@@ -56,31 +115,71 @@ class Verify2FATokenView(LoginRequiredMixin, FormView):
 
     def get(self, request, *args, **kwargs):
         """
-        Overrides get to send an OTP token on every page load.
+        Overrides get to send an OTP token when the user has no valid one.
 
         This method ensures that a `GovNotifyEmailDevice` exists for the
-        user (creating one if necessary) and then calls
-        `device.generate_challenge()` to send a new token. This effectively
-        sends a new code every time the user visits or refreshes the page.
+        user (creating one if necessary), then sends a token unless the
+        token sent earlier has not expired yet.
         """
         try:
             device, created = GovNotifyEmailDevice.objects.get_or_create(user=request.user, email=request.user.email)
             if created:
-                logger.info(f"Created new GovNotifyEmailDevice for user {request.user.pk}")
+                logger.info("Created new GovNotifyEmailDevice for user %s", request.user.pk)
 
-            device.generate_challenge()
-            logger.info(f"Generated new 2FA token challenge for user {request.user.pk}")
+            if device.token and device.valid_until and device.valid_until > timezone.now():
+                _count("reused")
+                logger.debug("Reusing the 2FA token challenge of user %s", request.user.pk)
+            else:
+                self.send_challenge(device, "sent")
 
         except Exception as e:
             logger.error(
-                mask_email(
-                    f"Error in Verify2FATokenView.dispatch for user {request.user.pk} {request.user.email}: {e}"
-                ),
+                "Error in Verify2FATokenView.get for user %s %s: %s",
+                request.user.pk,
+                request.user.email,
+                e,
                 exc_info=True,
             )
 
         return super().get(request, *args, **kwargs)
 
+    def post(self, request, *args, **kwargs):
+        """
+        Sends a new token when the resend button is used, then shows the page again.
+        Otherwise verifies the submitted token.
+        """
+        if "resend" not in request.POST:
+            return super().post(request, *args, **kwargs)
+        device, _ = GovNotifyEmailDevice.objects.get_or_create(user=request.user, email=request.user.email)
+        if self.send_challenge(device, "resent"):
+            messages.success(request, "We have sent you a new code.")
+        return redirect("verify-2fa-token")
+
+    def send_challenge(self, device: GovNotifyEmailDevice, outcome: str) -> bool:
+        """
+        Send a new token, unless one was sent within the django-otp cooldown or the user has
+        reached the send limit. The user is told why no token was sent.
+
+        :param outcome: The metric counting the tokens sent, ``sent`` or ``resent``.
+        :return: True when a token was sent.
+        """
+        allowed, _ = device.generate_is_allowed()
+        if not allowed:
+            _count("cooldown")
+            messages.warning(self.request, "We have just sent you a code. Wait a minute before asking for another.")
+            return False
+        if over_send_limit(self.request.user):
+            _count("throttled")
+            logger.warning("2FA token send limit reached for user %s", self.request.user.pk)
+            messages.warning(
+                self.request, "You have asked for too many codes. Use the last code we sent or try again later."
+            )
+            return False
+        device.generate_challenge()
+        _count(outcome)
+        logger.info("Generated new 2FA token challenge for user %s", self.request.user.pk)
+        return True
+
     def form_invalid(self, form):
         """
         Handles invalid form submissions.
@@ -89,9 +188,7 @@ class Verify2FATokenView(LoginRequiredMixin, FormView):
         `form_valid` returns `self.form_invalid(form)`.
         """
         logger.warning(
-            mask_email(
-                f"Invalid 2FA form submission for user {self.request.user.pk}. " f"Errors: {form.errors.as_json()}"
-            )
+            "Invalid 2FA form submission for user %s. Errors: %s", self.request.user.pk, form.errors.as_json()
         )
         return super().form_invalid(form)
 
@@ -106,23 +203,27 @@ class Verify2FATokenView(LoginRequiredMixin, FormView):
         token = form.cleaned_data.get("otp_token")
         if not token:
             # Handle empty token submission as 'required=False'
-            logger.warning(f"Empty 2FA token submitted for user {self.request.user.pk}")
+            logger.warning("Empty 2FA token submitted for user %s", self.request.user.pk)
             form.add_error("otp_token", "Please enter your 6-digit code.")
             return self.form_invalid(form)
 
         try:
             device = GovNotifyEmailDevice.objects.get(user=self.request.user, email=self.request.user.email)
         except GovNotifyEmailDevice.DoesNotExist:
-            logger.error(f"CRITICAL: GovNotifyEmailDevice not found for user {self.request.user.pk} during form_valid.")
+            logger.error(
+                "CRITICAL: GovNotifyEmailDevice not found for user %s during form_valid.", self.request.user.pk
+            )
             form.add_error(None, "An unexpected error occurred. Please try again.")
             return self.form_invalid(form)
 
         allow_access = device.verify_token(token)
         if not allow_access:
-            logger.warning(f"Invalid 2FA token attempt for user {self.request.user.pk}")
+            _count("rejected")
+            logger.warning("Invalid 2FA token attempt for user %s", self.request.user.pk)
             form.add_error("otp_token", "Invalid token")
             return self.form_invalid(form)
 
-        logger.info(f"Successful 2FA verification for user {self.request.user.pk}")
+        _count("verified")
+        logger.info("Successful 2FA verification for user %s", self.request.user.pk)
         otp_login(self.request, device)
         return super().form_valid(form)
@@ -11,6 +11,7 @@ from webcaf.webcaf.forms.general import NextActionForm
 from webcaf.webcaf.forms.user_profile import UserProfileForm
 from webcaf.webcaf.models import UserProfile
 from webcaf.webcaf.utils.permission import PermissionUtil, UserRoleCheckMixin
+from webcaf.webcaf.utils.replica import ReadOnlyViewMixin
 from webcaf.webcaf.utils.session import SessionUtil
 
 
@@ -22,7 +23,7 @@ class AddNewUserForm(forms.Form):
     add_new_user = forms.ChoiceField(choices=[("yes", "Yes"), ("no", "No")], required=True, label="Add another user")
 
 
-class UserProfilesView(UserRoleCheckMixin, FormView):
+class UserProfilesView(ReadOnlyViewMixin, UserRoleCheckMixin, FormView):
     template_name = "users/users.html"
     login_url = settings.LOGIN_URL
     form_class = AddNewUserForm
@@ -191,17 +192,22 @@ class RemoveUserProfileView(UserRoleCheckMixin, FormView):
                 )
                 if profile_to_delete.organisation != current_user_profile.organisation:
                     self.logger.error(
-                        f"User {self.request.user.pk} is not allowed to delete this user profile {self.kwargs['user_profile_id']} in {profile_to_delete.organisation} organisation"
+                        "User %s is not allowed to delete this user profile %s in %s organisation",
+                        self.request.user.pk,
+                        self.kwargs["user_profile_id"],
+                        profile_to_delete.organisation,
                     )
                     raise PermissionError("You are not allowed to delete this user profile in a different organisation")
 
                 self.logger.info(
-                    f"Deleting user profile {self.kwargs['user_profile_id']} by user {self.request.user.pk}"
+                    "Deleting user profile %s by user %s", self.kwargs["user_profile_id"], self.request.user.pk
                 )
                 profile_to_delete.delete()
             else:
                 self.logger.error(
-                    f"User {self.request.user.pk} is not allowed to delete this user profile {self.kwargs['user_profile_id']}"
+                    "User %s is not allowed to delete this user profile %s",
+                    self.request.user.pk,
+                    self.kwargs["user_profile_id"],
                 )
                 raise PermissionError("You are not allowed to delete this user profile")
         return redirect(reverse("view-profiles"))